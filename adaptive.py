@@ -0,0 +1,166 @@
+# adaptive.py
+# Resizes the scheduler's lanes while a run is going, from what psutil sees:
+# - grow a lane by one worker while it has a backlog, CPU is underused and
+#   I/O wait is low
+# - shrink every lane (multiplicatively) when RSS nears the budget or writes to
+#   the destination slow down (an SMB share throttling us)
+# - otherwise hold
+import os
+import threading
+import time
+from pathlib import Path
+
+import psutil
+
+from utils import log_info
+
+# Seconds between decisions
+INTERVAL = 2.0
+
+# Grow only below these
+CPU_GROW_BELOW = 75.0
+IOWAIT_GROW_BELOW = 10.0
+
+# RSS (this process + PDF pool children) budget, MB; default 75% of RAM
+RSS_BUDGET = int(os.environ.get("OHHIMARKITDOWN_RSS_BUDGET_MB", "0")) * 1024 * 1024 \
+    or int(psutil.virtual_memory().total * 0.75)
+RSS_SHRINK_AT = 0.90
+RSS_GROW_BELOW = 0.70
+
+# A destination write is "slow" above max(floor, factor x the best average seen)
+LATENCY_FLOOR = 0.25
+LATENCY_FACTOR = 4.0
+LATENCY_SMOOTHING = 0.2
+
+SHRINK_FACTOR = 0.7
+
+
+class _TimedSink:
+    """Forwards to a sink and reports how long each write takes."""
+
+    def __init__(self, sink, controller):
+        self._sink = sink
+        self._controller = controller
+        # A DirectorySink times its own writes where they happen: with write-behind
+        # the calls below only queue them, so timing the call would see ~0 s
+        self._hooked = hasattr(sink, "on_write")
+        if self._hooked:
+            sink.on_write = controller.observe_write
+
+    def _timed(self, method, *args):
+        if self._hooked:
+            return method(*args)
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._controller.observe_write(time.perf_counter() - start)
+
+    def write_text(self, rel_path, text: str):
+        return self._timed(self._sink.write_text, rel_path, text)
+
+    def write_bytes(self, rel_path, data: bytes):
+        return self._timed(self._sink.write_bytes, rel_path, data)
+
+    def move_file(self, src, rel_path):
+        return self._timed(self._sink.move_file, src, rel_path)
+
+    def __getattr__(self, name):
+        return getattr(self._sink, name)
+
+
+class ConcurrencyController:
+
+    def __init__(self, scheduler, interval: float = INTERVAL, rss_budget: int = RSS_BUDGET,
+                 log_file=Path("logs") / "conversion.log"):
+        # Lane bounds live in scheduler.py next to the defaults
+        from scheduler import LANE_WORKERS_MAX, LANE_WORKERS_MIN
+
+        self.scheduler = scheduler
+        self.log_file = log_file
+        self.interval = interval
+        self.rss_budget = rss_budget
+        self.min_workers = LANE_WORKERS_MIN
+        self.max_workers = LANE_WORKERS_MAX
+        self.process = psutil.Process()
+        self.lock = threading.Lock()
+        self.latency = None        # smoothed seconds per write
+        self.best_latency = None
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="concurrency-controller", daemon=True)
+
+    # -- inputs ------------------------------------------------------------
+
+    def observe_write(self, seconds: float):
+        with self.lock:
+            if self.latency is None:
+                self.latency = seconds
+            else:
+                self.latency += LATENCY_SMOOTHING * (seconds - self.latency)
+
+    def timed(self, sink):
+        """Wrap the run's sink so destination latency feeds the controller."""
+        return _TimedSink(sink, self)
+
+    def rss(self) -> int:
+        total = self.process.memory_info().rss
+        for child in self.process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+
+    def _destination_slow(self) -> bool:
+        with self.lock:
+            latency = self.latency
+            if latency is None:
+                return False
+            if self.best_latency is None or latency < self.best_latency:
+                self.best_latency = latency
+            return latency > max(LATENCY_FLOOR, LATENCY_FACTOR * self.best_latency)
+
+    # -- control loop --------------------------------------------------------
+
+    def decide(self, cpu: float, iowait: float, rss: int, slow: bool) -> dict:
+        """New capacity per lane (only lanes that change)."""
+        changes = {}
+        for lane, limit in self.scheduler.limits.items():
+            current = limit.capacity
+            low, high = self.min_workers.get(lane, 1), self.max_workers.get(lane, current)
+            if rss > self.rss_budget * RSS_SHRINK_AT or slow:
+                target = max(low, int(current * SHRINK_FACTOR))
+            elif (limit.waiting and limit.active >= current and cpu < CPU_GROW_BELOW
+                  and iowait < IOWAIT_GROW_BELOW and rss < self.rss_budget * RSS_GROW_BELOW):
+                target = min(high, current + 1)
+            else:
+                target = current
+            if target != current:
+                changes[lane] = target
+        return changes
+
+    def _run(self):
+        psutil.cpu_percent(None)
+        psutil.cpu_times_percent(None)
+        while not self.stop_event.wait(self.interval):
+            cpu = psutil.cpu_percent(None)
+            iowait = getattr(psutil.cpu_times_percent(None), "iowait", 0.0)  # Linux only
+            rss = self.rss()
+            slow = self._destination_slow()
+            for lane, target in self.decide(cpu, iowait, rss, slow).items():
+                log_info(self.log_file,
+                         f"[adaptive] {lane} lane {self.scheduler.limits[lane].capacity} -> {target} workers "
+                         f"(cpu {cpu:.0f}%, iowait {iowait:.0f}%, rss {rss // (1024 * 1024)} MB, "
+                         f"write latency {(self.latency or 0) * 1000:.0f} ms)")
+                self.scheduler.limits[lane].resize(target)
+                # Judge the next interval on writes made at the new size
+                with self.lock:
+                    self.latency = None
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread.is_alive():
+            self.thread.join()
@@ -0,0 +1,238 @@
+# api.py
+# Programmatic API (no Tk). Submit a batch and consume per-document results as
+# each document finishes, while the rest of the batch is still converting:
+#
+#   job = api.submit_tree("export.zip", "kb/")
+#   for result in job:                      # or: async for result in job
+#       if result.ok:
+#           git_add(result.md_path)
+#
+#   job = api.submit(["a.docx", "b.pdf"], "kb/")
+#   job.futures[0].result()                 # futures are available immediately
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import nullcontext
+from pathlib import Path, PurePosixPath
+
+from converters import converter_for, may_convert
+from main import convert_file, conversion_log, image_warnings_log, image_processing_log, logs_dir
+from scheduler import Scheduler
+from sinks import open_sink
+from sources import SourceFile, open_sources
+from utils import log_warning
+import ids
+import ledger
+
+_DONE = object()
+
+
+class DocumentResult:
+    """Outcome of one document. `error` is set (and md_path None) when it failed or was skipped."""
+
+    def __init__(self, source: str, relative_path: PurePosixPath, md_path: PurePosixPath = None,
+                 uuid: str = None, images: int = 0, seconds: float = 0.0, warnings=None, error: str = None):
+        self.source = source
+        self.relative_path = relative_path
+        self.md_path = md_path
+        self.uuid = uuid
+        self.images = images
+        self.seconds = seconds
+        self.warnings = warnings or []
+        self.error = error
+        self.record = None      # the document's ledger record (bytes, stages, ...)
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self):
+        state = "ok" if self.ok else f"error={self.error!r}"
+        return f"<DocumentResult {self.relative_path} {state} images={self.images} {self.seconds:.2f}s>"
+
+
+def _convert_one(source: SourceFile, converter, sink, status_callback, run_ledger,
+                 id_registry: ids.IdRegistry = None) -> DocumentResult:
+    metrics = ledger.DocumentMetrics(str(source), source.relative_path)
+    try:
+        # Here on the worker: a content ID reads the whole file
+        file_uuid = id_registry.assign(source) if id_registry is not None else None
+        converted = convert_file(source, None, None, status_callback, conversion_log,
+                                 image_warnings_log, image_processing_log, converter=converter,
+                                 sink=sink, file_uuid=file_uuid, run_ledger=run_ledger, metrics=metrics)
+    except Exception as e:
+        log_warning(conversion_log, f"Conversion failed: {source}: {e}")
+        if str(e) not in metrics.errors:
+            metrics.errors.append(str(e))   # raised before convert_file recorded it
+            metrics.status = "failed"
+        converted = None
+    if converted:
+        error = None
+    elif metrics.status == "failed":
+        error = metrics.errors[-1] if metrics.errors else "no Markdown written"
+    else:
+        error = metrics.errors[-1] if metrics.errors else "skipped"
+    result = DocumentResult(str(source), source.relative_path, images=metrics.images,
+                            seconds=metrics.seconds, warnings=list(metrics.errors), error=error)
+    result.record = metrics.as_record()
+    if converted:
+        result.uuid, result.md_path = converted
+    return result
+
+
+class ConversionJob:
+    """
+    A running batch. Iterate it (sync or async) to get DocumentResults in completion
+    order; `futures` holds one Future per submitted document.
+    """
+
+    def __init__(self, pairs, source_opener, dest_root, sink=None, status_callback=None, futures=None):
+        self.futures = futures if futures is not None else []
+        self.dest_root = dest_root
+        self._results = queue.Queue()
+        self._pairs = pairs
+        self._source_opener = source_opener
+        self._sink = sink
+        self._owns_sink = sink is None
+        self._status_callback = status_callback
+        self.ledger = None
+        self.summary = None     # the run summary dict once the job is done
+        self._stop = threading.Event()
+        self._finished = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="conversion-job", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _should_run(self) -> bool:
+        cb = self._status_callback
+        return not self._stop.is_set() and not (cb and cb.should_stop())
+
+    def _deliver(self, future: Future, result: DocumentResult):
+        future.set_result(result)
+        self._results.put(result)
+
+    def _run(self):
+        logs_dir.mkdir(exist_ok=True)
+        sink = self._sink or open_sink(self.dest_root)
+        run_ledger = self.ledger = ledger.RunLedger(None, self.dest_root)
+        id_registry = ids.IdRegistry(log_file=conversion_log)
+        try:
+            with self._source_opener() as sources, Scheduler(adaptive=True) as scheduler:
+                task_sink = scheduler.controller.timed(sink)
+                for source, future in self._pairs(sources):
+                    if not future.set_running_or_notify_cancel():
+                        source.discard()
+                        continue
+                    converter = converter_for(source)
+                    if converter is None or not self._should_run():
+                        source.discard()
+                        reason = "unsupported format" if converter is None else "stopped"
+                        self._deliver(future, DocumentResult(str(source), source.relative_path, error=reason))
+                        continue
+                    task = scheduler.submit(converter, _convert_one, source, converter, task_sink,
+                                            self._status_callback, run_ledger, id_registry,
+                                            should_run=self._should_run)
+                    task.add_done_callback(lambda t, s=source, f=future: self._finish(t, s, f))
+        except Exception as e:
+            log_warning(conversion_log, f"Conversion job failed: {e}")
+        finally:
+            if self._owns_sink:
+                try:
+                    sink.close()
+                except Exception as e:
+                    # Documents already have their own results; the job must still finish
+                    log_warning(conversion_log, f"Closing {self.dest_root} failed: {e}")
+            # Anything never reached (error or stop) still resolves
+            for future in self.futures:
+                if not future.done() and future.set_running_or_notify_cancel():
+                    self._deliver(future, DocumentResult("", None, error="not converted"))
+            self.summary = run_ledger.close()
+            self._finished.set()
+            self._results.put(_DONE)
+
+    def _finish(self, task: Future, source: SourceFile, future: Future):
+        if task.cancelled() or task.exception() is not None:
+            source.discard()
+            error = "cancelled" if task.cancelled() else str(task.exception())
+            result = DocumentResult(str(source), source.relative_path, error=error)
+        elif task.result() is None:
+            # should_run() said no when the task started
+            source.discard()
+            result = DocumentResult(str(source), source.relative_path, error="stopped")
+        else:
+            result = task.result()
+            if not result.ok:
+                source.discard()
+        self._deliver(future, result)
+
+    # -- consuming results ---------------------------------------------------
+
+    def __iter__(self):
+        while True:
+            result = self._results.get()
+            if result is _DONE:
+                self._results.put(_DONE)  # keep later iterators from blocking
+                return
+            yield result
+
+    async def __aiter__(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            result = await loop.run_in_executor(None, self._results.get)
+            if result is _DONE:
+                self._results.put(_DONE)
+                return
+            yield result
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until every document has finished. Returns False on timeout."""
+        return self._finished.wait(timeout)
+
+    def results(self) -> list:
+        """Every DocumentResult, in submission order, once the batch is done."""
+        self.wait()
+        return [future.result() for future in self.futures]
+
+    def cancel(self):
+        """Stop after the documents already running; queued ones resolve as 'stopped'."""
+        self._stop.set()
+
+    @property
+    def done(self) -> bool:
+        return self._finished.is_set()
+
+
+def submit(paths, dest_root, source_root: Path = None, sink=None, status_callback=None) -> ConversionJob:
+    """
+    Convert specific files. Paths keep their folder structure relative to source_root
+    (default: each file lands at the top of dest_root). job.futures[i] belongs to paths[i].
+    """
+    sources = []
+    for path in paths:
+        path = Path(path)
+        if source_root is not None:
+            sources.append(SourceFile.from_path(path, source_root))
+        else:
+            sources.append(SourceFile(PurePosixPath(path.name), path=path))
+    # Futures exist before anything runs, so callers can hold them immediately
+    futures = [Future() for _ in sources]
+    return ConversionJob(lambda _: zip(sources, futures), lambda: nullcontext(None), dest_root,
+                         sink, status_callback, futures).start()
+
+
+def submit_tree(source_root: Path, dest_root, sink=None, status_callback=None) -> ConversionJob:
+    """Convert everything under a folder or .zip/.tar export (like main.convert_all)."""
+    futures = []
+
+    def pairs(sources):
+        for source in sources:
+            future = Future()
+            futures.append(future)
+            yield source, future
+
+    return ConversionJob(pairs, lambda: open_sources(source_root, keep=may_convert), dest_root,
+                         sink, status_callback, futures).start()
@@ -0,0 +1,146 @@
+# bundle.py
+# Offline provisioning bundle for air-gapped conversion hosts:
+# - build_bundle: wheelhouse (MarkItDown built from the pinned tag) -> one .tar.gz.
+#   The archive layout is deterministic (sorted members, no timestamps or owners),
+#   but wheels built from sdists need not be byte-identical between builds, so two
+#   bundles of the same inputs can differ; the manifest records what was shipped
+# - extract_bundle: verify and unpack a bundle so setup.py can install with no network
+
+import gzip
+import hashlib
+import json
+import shutil
+import tarfile
+import tempfile
+from pathlib import Path
+
+from utils import log_and_print, log_info, run_git, run_pip
+
+BUNDLE_MANIFEST = "bundle.json"
+BUNDLE_REQUIREMENTS = "requirements.txt"
+BUNDLE_WHEELHOUSE = "wheelhouse"
+
+# Wheels that are always shipped besides requirements.txt
+BUNDLE_EXTRAS = ["pip", "hatchling"]
+MARKITDOWN_EXTRAS = "docx,pptx,xlsx,outlook"
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _reset_tarinfo(info: tarfile.TarInfo) -> tarfile.TarInfo:
+    """Strip host-specific metadata so the same files give the same archive bytes."""
+    info.mtime = 0
+    info.uid = info.gid = 0
+    info.uname = info.gname = ""
+    info.mode = 0o755 if info.isdir() else 0o644
+    return info
+
+
+def _write_archive(staging: Path, bundle_path: Path):
+    members = sorted(staging.rglob("*"), key=lambda p: p.relative_to(staging).as_posix())
+    with open(bundle_path, "wb") as raw:
+        with gzip.GzipFile(filename="", fileobj=raw, mode="wb", mtime=0) as gz:
+            with tarfile.open(fileobj=gz, mode="w", format=tarfile.USTAR_FORMAT) as tar:
+                for member in members:
+                    arcname = member.relative_to(staging).as_posix()
+                    tar.add(member, arcname=arcname, recursive=False, filter=_reset_tarinfo)
+
+
+def build_bundle(pip_exe, bundle_path: Path, requirements: Path, markitdown_repo: Path,
+                 markitdown_version: str, setup_log: Path) -> dict:
+    """
+    Build an offline bundle: wheels for requirements.txt and MarkItDown (with format extras), the
+    latter built from the pinned tag. Returns the bundle manifest.
+    """
+    bundle_path = Path(bundle_path)
+    bundle_path.parent.mkdir(parents=True, exist_ok=True)
+
+    with tempfile.TemporaryDirectory(prefix="ohhimarkitdown_bundle_") as tmp:
+        staging = Path(tmp) / "bundle"
+        wheelhouse = staging / BUNDLE_WHEELHOUSE
+        wheelhouse.mkdir(parents=True)
+
+        # Pinned MarkItDown source via git archive (no .git, no local edits), outside the
+        # staging dir: only the wheel built from it is shipped
+        log_and_print(setup_log, f"[*] Exporting MarkItDown {markitdown_version} from {markitdown_repo}")
+        checkout_tar = Path(tmp) / "markitdown.tar"
+        run_git(["archive", "--format=tar", "--prefix=markitdown/",
+                 "-o", str(checkout_tar), markitdown_version], cwd=markitdown_repo)
+        with tarfile.open(checkout_tar) as tar:
+            tar.extractall(tmp)
+        commit = run_git(["rev-parse", f"{markitdown_version}^{{commit}}"], cwd=markitdown_repo).stdout.strip()
+
+        # Wheels for everything, resolved together
+        markitdown_pkg = Path(tmp) / "markitdown" / "packages" / "markitdown"
+        log_and_print(setup_log, "[*] Building bundle wheelhouse...")
+        run_pip(pip_exe, ["wheel", "--wheel-dir", str(wheelhouse), "-r", str(requirements)]
+                + BUNDLE_EXTRAS + [f"{markitdown_pkg}[{MARKITDOWN_EXTRAS}]"], setup_log)
+
+        shutil.copyfile(requirements, staging / BUNDLE_REQUIREMENTS)
+
+        manifest = {
+            "markitdown_version": markitdown_version,
+            "markitdown_commit": commit,
+            "files": {
+                p.relative_to(staging).as_posix(): _sha256(p)
+                for p in sorted(staging.rglob("*"))
+                if p.is_file()
+            },
+        }
+        (staging / BUNDLE_MANIFEST).write_text(
+            json.dumps(manifest, indent=2, sort_keys=True) + "\n", encoding="utf-8"
+        )
+
+        _write_archive(staging, bundle_path)
+
+    log_info(setup_log, f"Bundle written: {bundle_path} ({len(manifest['files'])} files, sha256 {_sha256(bundle_path)})")
+    return manifest
+
+
+def extract_bundle(bundle_path: Path, dest_dir: Path, setup_log: Path) -> dict:
+    """
+    Unpack a bundle into dest_dir and verify every file against the manifest.
+    Returns the manifest; raises ValueError on unsafe paths or hash mismatches.
+    """
+    bundle_path = Path(bundle_path)
+    dest_dir = Path(dest_dir)
+    if dest_dir.exists():
+        shutil.rmtree(dest_dir)
+    dest_dir.mkdir(parents=True)
+
+    log_and_print(setup_log, f"[*] Extracting bundle {bundle_path} -> {dest_dir}")
+    root = dest_dir.resolve()
+    with tarfile.open(bundle_path, "r:gz") as tar:
+        for member in tar.getmembers():
+            target = (root / member.name).resolve()
+            if root not in target.parents and target != root:
+                raise ValueError(f"Unsafe path in bundle: {member.name}")
+            if not (member.isfile() or member.isdir()):
+                raise ValueError(f"Unsupported member type in bundle: {member.name}")
+        tar.extractall(dest_dir)
+
+    manifest = json.loads((dest_dir / BUNDLE_MANIFEST).read_text(encoding="utf-8"))
+    for rel, expected in manifest["files"].items():
+        path = dest_dir / rel
+        if not path.is_file() or _sha256(path) != expected:
+            raise ValueError(f"Bundle file failed verification: {rel}")
+
+    log_info(setup_log, f"Bundle verified: MarkItDown {manifest['markitdown_version']} ({manifest['markitdown_commit'][:12]})")
+    return manifest
+
+
+def bundle_install_targets(bundle_dir: Path) -> list[str]:
+    """Package specs to install from an extracted bundle."""
+    with open(Path(bundle_dir) / BUNDLE_REQUIREMENTS, encoding="utf-8") as f:
+        packages = [
+            line.strip()
+            for line in f
+            if line.strip() and not line.startswith("#")
+        ]
+    return packages + [f"markitdown[{MARKITDOWN_EXTRAS}]"]
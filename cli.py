@@ -0,0 +1,154 @@
+# cli.py
+# Command-line runner (the GUI in app.py drives the same convert_all).
+#   python cli.py convert SOURCE DEST [--stage] [--staging-dir DIR] [--no-dedupe] [--link-duplicates]
+#                        [--fixed-workers] [--metrics-port P] [--metrics-textfile FILE]
+#                        [--profile] [--profile-slowest N] [--id-scheme path|content] [--id-length N]
+#                        [--git [--git-branch B] [--git-prefix DIR]] [--no-rewrite-links]
+#                        [--search-index FILE]
+#   python cli.py watch SOURCE DEST [--debounce S] [--poll S] [--force-polling]
+#                      [--metrics-port P] [--metrics-textfile FILE] [--search-index FILE]
+#   python cli.py serve [--host H] [--port P] [--workers N] [--queue N]
+# SOURCE: folder or .zip/.tar export. DEST: folder, .tar[.gz|.bz2|.xz], .zip, or "-"
+# for a tar stream on stdout.
+import argparse
+import sys
+import time
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+from ids import ID_LENGTH, ID_SCHEMES, MAX_ID_LENGTH, MIN_ID_LENGTH
+from main import convert_all
+from sinks import open_sink
+
+
+@contextmanager
+def metrics_outputs(args):
+    """Expose Prometheus metrics for the duration of the command, if asked to."""
+    import exporter
+    with ExitStack() as stack:
+        if args.metrics_port is not None:
+            server = exporter.start_http_server(args.metrics_port, args.metrics_host)
+            stack.callback(server.shutdown)
+            print(f"Metrics on http://{args.metrics_host}:{server.server_address[1]}/metrics", file=sys.stderr)
+        if args.metrics_textfile:
+            stack.enter_context(exporter.TextfileWriter(args.metrics_textfile))
+        yield
+
+
+def cmd_convert(args):
+    sink = open_sink(args.dest, staging_dir=args.staging_dir, stage=args.stage, git=args.git,
+                     git_branch=args.git_branch, git_prefix=args.git_prefix)
+    if args.dest == "-":
+        # stdout carries the tar stream; send log lines to stderr instead
+        sys.stdout = sys.stderr
+    start = time.time()
+    with sink, metrics_outputs(args):
+        count = convert_all(args.source, Path(args.dest), sink=sink, dedupe=not args.no_dedupe,
+                            link_duplicates=args.link_duplicates, adaptive=not args.fixed_workers,
+                            profile=args.profile or args.profile_slowest is not None,
+                            profile_keep=args.profile_slowest, id_scheme=args.id_scheme,
+                            id_length=args.id_length, rewrite_links=not args.no_rewrite_links,
+                            search_index=args.search_index)
+    print(f"{count} files converted in {int(time.time() - start)}s")
+    return 0
+
+
+def cmd_watch(args):
+    from watch import watch  # watchdog is optional; only needed here
+    with metrics_outputs(args):
+        watch(args.source, args.dest, debounce=args.debounce,
+              poll_interval=args.poll, force_polling=args.force_polling, search_index=args.search_index)
+    return 0
+
+
+def cmd_serve(args):
+    from service import serve
+    serve(args.host, args.port, workers=args.workers, queue_size=args.queue)
+    return 0
+
+
+def id_length(value: str) -> int:
+    length = int(value)
+    if not MIN_ID_LENGTH <= length <= MAX_ID_LENGTH:
+        raise argparse.ArgumentTypeError(f"must be between {MIN_ID_LENGTH} and {MAX_ID_LENGTH}")
+    return length
+
+
+def add_search_argument(parser):
+    parser.add_argument("--search-index", type=Path, metavar="FILE",
+                        help="keep a SQLite full-text index of the Markdown in FILE (only changed "
+                             "documents are reindexed)")
+
+
+def add_metrics_arguments(parser):
+    parser.add_argument("--metrics-port", type=int,
+                        help="serve Prometheus metrics on this port (GET /metrics)")
+    parser.add_argument("--metrics-host", default="127.0.0.1", help="metrics bind address (default 127.0.0.1)")
+    parser.add_argument("--metrics-textfile", type=Path,
+                        help="keep a .prom file updated for node_exporter's textfile collector")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="ohhimarkitdown", description="Convert documents to Markdown.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    convert = sub.add_parser("convert", help="convert a folder or archive once")
+    convert.add_argument("source", type=Path, help="source folder or .zip/.tar export")
+    convert.add_argument("dest", help='destination folder, archive (.tar/.tar.gz/.zip) or "-" for stdout')
+    convert.add_argument("--stage", action="store_true",
+                         help="write to a local temp folder and copy to DEST in bulk at the end")
+    convert.add_argument("--staging-dir", type=Path, help="local staging folder (implies --stage)")
+    convert.add_argument("--git", action="store_true",
+                         help="commit the output into the git repository at DEST (created if missing) in batches")
+    convert.add_argument("--git-branch", default="main", help="branch to commit to with --git (default main)")
+    convert.add_argument("--git-prefix", default="", help="folder inside the repository for the output (--git)")
+    convert.add_argument("--no-dedupe", action="store_true",
+                         help="convert byte-identical copies separately instead of reusing the first one's output")
+    convert.add_argument("--link-duplicates", action="store_true",
+                         help="hard-link the Markdown of duplicate documents instead of copying it")
+    convert.add_argument("--fixed-workers", action="store_true",
+                         help="keep the default worker counts instead of adapting them to CPU/memory/I/O")
+    convert.add_argument("--profile", action="store_true",
+                         help="write cProfile stats and collapsed stacks for every document to logs/runs/")
+    convert.add_argument("--profile-slowest", type=int, metavar="N",
+                         help="profile every document but keep files only for the N slowest (implies --profile)")
+    convert.add_argument("--no-rewrite-links", action="store_true",
+                         help="leave links between documents (SharePoint URLs, file names) as they are")
+    convert.add_argument("--id-scheme", choices=ID_SCHEMES,
+                         help="derive document IDs from the relative path (default) or the file's bytes")
+    convert.add_argument("--id-length", type=id_length, metavar="N",
+                         help=f"document ID length in hex characters, {MIN_ID_LENGTH}-{MAX_ID_LENGTH} (default {ID_LENGTH})")
+    add_search_argument(convert)
+    add_metrics_arguments(convert)
+    convert.set_defaults(func=cmd_convert)
+
+    watch = sub.add_parser("watch", help="convert a folder, then keep the output in sync as files change")
+    watch.add_argument("source", type=Path, help="source folder (e.g. a synced SharePoint library)")
+    watch.add_argument("dest", type=Path, help="destination folder")
+    watch.add_argument("--debounce", type=float, default=2.0,
+                       help="seconds a file must stay quiet before it is converted (default 2)")
+    watch.add_argument("--poll", type=float, default=5.0,
+                       help="polling interval in seconds when native notifications are unavailable (default 5)")
+    watch.add_argument("--force-polling", action="store_true",
+                       help="poll even if watchdog is installed (e.g. for network shares)")
+    add_search_argument(watch)
+    add_metrics_arguments(watch)
+    watch.set_defaults(func=cmd_watch)
+
+    serve = sub.add_parser("serve", help="run a local HTTP conversion service (POST /convert)")
+    serve.add_argument("--host", default="127.0.0.1", help="bind address (default 127.0.0.1)")
+    serve.add_argument("--port", type=int, default=8765, help="port (default 8765)")
+    serve.add_argument("--workers", type=int, default=4, help="pre-warmed conversion workers (default 4)")
+    serve.add_argument("--queue", type=int, default=16,
+                       help="jobs allowed to wait before new requests get 503 (default 16)")
+    serve.set_defaults(func=cmd_serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+# code_blocks.py
+# XML/HTML pasted into documents as ordinary paragraphs (unattended-install answer
+# files, Office Customization Tool XML, HTML snippets) comes out as raw tags that a
+# Markdown viewer renders instead of showing. CodeFencer reads the Markdown one
+# line at a time and wraps runs of code in fenced blocks:
+# - markup lines: starting with a tag, <?...?> or <!...> and ending in ">" (or mostly tags)
+# - lines the converter knows were set in a monospace font or code style (hint=True)
+# Prose between markup lines stays in the block while an element is still open, up
+# to MAX_GAP lines. Every line is looked at once and held back at most MAX_GAP
+# lines, so the pass is linear and runs on every document by default
+# (OHHIMARKITDOWN_FENCE_CODE=0 turns it off).
+import os
+import re
+from pathlib import Path
+
+import ledger
+from utils import log_info
+
+FENCE_CODE = os.environ.get("OHHIMARKITDOWN_FENCE_CODE", "1") != "0"
+
+MAX_GAP = 3
+
+TAG_RE = re.compile(r"<(/?)([A-Za-z_][\w:.-]*)(?:\s[^<>]*?)?(/?)>|<\?[^<>]*\?>|<!--.*?-->|<![A-Za-z][^<>]*>")
+FENCE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+BACKTICKS_RE = re.compile(r"`{3,}")
+# Backslash escapes markdownify adds to text (\_ \*); literal inside a fence
+ESCAPE_RE = re.compile(r"\\([!-/:-@\[-`{-~])")
+SPACE_RE = re.compile(r"\s+")
+
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param",
+             "source", "track", "wbr"}
+HTML_TAGS = VOID_TAGS | {
+    "a", "b", "body", "button", "code", "div", "em", "form", "h1", "h2", "h3", "h4", "h5", "h6",
+    "head", "html", "i", "iframe", "label", "li", "nav", "ol", "option", "p", "pre", "script",
+    "section", "select", "span", "strong", "style", "table", "tbody", "td", "textarea", "th",
+    "thead", "title", "tr", "u", "ul"}
+
+
+def _markup(line: str):
+    """(depth change, first element name) for a markup line, or None for anything else."""
+    text = line.strip()
+    if not text.startswith("<"):
+        return None
+    tags = list(TAG_RE.finditer(text))
+    if not tags or tags[0].start() != 0:
+        return None
+    if not text.endswith(">") and sum(m.end() - m.start() for m in tags) * 2 < len(text):
+        return None
+    depth, first = 0, None
+    for m in tags:
+        name = m.group(2)
+        if not name:
+            continue    # <?xml ...?>, <!-- -->, <!DOCTYPE>
+        first = first or name
+        if m.group(1):
+            depth -= 1
+        elif not m.group(3) and name.lower() not in VOID_TAGS:
+            depth += 1
+    return depth, first or text[:5]
+
+
+def normalize(line: str) -> str:
+    """Key for matching a Markdown line against a paragraph's plain text."""
+    return SPACE_RE.sub(" ", ESCAPE_RE.sub(r"\1", line)).strip()
+
+
+class CodeFencer:
+    """
+    Streaming: feed() each line (hint True = known code, False = never code, None =
+    detect) and write out what it returns, then whatever finish() returns.
+    """
+
+    def __init__(self, unescape: bool = True):
+        self.unescape = unescape
+        self.blocks = 0
+        self.fence = None       # marker of a fenced block already in the text
+        self._reset()
+
+    def _reset(self):
+        self.block = []         # lines of the open code block
+        self.pending = []       # (blank lines before, line): prose held while an element is open
+        self.blanks = 0         # blank lines since the last line taken
+        self.depth = 0
+        self.language = ""
+        self.ticks = 0
+
+    def feed(self, line: str, hint=None) -> list:
+        if self.fence is not None:
+            if line.strip().startswith(self.fence):
+                self.fence = None
+            return [line]
+        if not line.strip():
+            if self.block:
+                self.blanks += 1
+                return []
+            return [line]
+
+        markup = None if hint is False else _markup(line)
+        if hint is True or markup is not None:
+            for _, held in self.pending:
+                self._take(held)
+            self.pending = []
+            self.blanks = 0
+            if markup is not None:
+                change, first = markup
+                self.depth = max(0, self.depth + change)
+                if not self.language:
+                    self.language = "xml" if (line.lstrip().startswith("<?xml") or ":" in first
+                                              or first.lower() not in HTML_TAGS) else "html"
+            self._take(line)
+            return []
+
+        match = FENCE_RE.match(line) if hint is not False else None
+        if self.block and hint is None and not match and self.depth > 0 and len(self.pending) < MAX_GAP:
+            self.pending.append((self.blanks, line))
+            self.blanks = 0
+            return []
+        out = self._close()
+        if match:
+            self.fence = match.group(1)
+        out.append(line)
+        return out
+
+    def _take(self, line: str):
+        line = line.rstrip()
+        if self.unescape:
+            line = ESCAPE_RE.sub(r"\1", line)
+        for m in BACKTICKS_RE.finditer(line):
+            self.ticks = max(self.ticks, len(m.group(0)))
+        self.block.append(line)
+
+    def _close(self) -> list:
+        if not self.block:
+            return []
+        fence = "`" * max(3, self.ticks + 1)
+        out = [fence + self.language, *self.block, fence]
+        for blanks, line in self.pending:
+            out.extend([""] * blanks)
+            out.append(line)
+        out.extend([""] * self.blanks)
+        self.blocks += 1
+        self._reset()
+        return out
+
+    def finish(self) -> list:
+        return self._close()
+
+
+def fence_code(text: str, code_lines=None, unescape: bool = True) -> tuple:
+    """(text with code fenced, blocks fenced). code_lines: normalize()d monospace paragraphs."""
+    fencer = CodeFencer(unescape)
+    out = []
+    for line in text.split("\n"):
+        hint = True if code_lines and normalize(line) in code_lines else None
+        out.extend(fencer.feed(line, hint))
+    out.extend(fencer.finish())
+    return "\n".join(out), fencer.blocks
+
+
+def note_fenced(blocks: int, md_label, info_log: Path):
+    if blocks:
+        ledger.count("code_blocks", blocks)
+        log_info(info_log, f"{md_label}: fenced {blocks} code block(s)")
+
+
+def fence_markdown(text: str, md_label, info_log: Path, code_lines=None, unescape: bool = True) -> str:
+    """fence_code for a converter's finished Markdown, recorded in the ledger."""
+    if not FENCE_CODE:
+        return text
+    text, blocks = fence_code(text, code_lines, unescape)
+    note_fenced(blocks, md_label, info_log)
+    return text
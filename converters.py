@@ -0,0 +1,114 @@
+# converters.py
+# Converter registry: one entry per source format, looked up by extension and,
+# for files without a usable extension, by sniffing magic bytes.
+# Each converter declares a cost class (which scheduler lane it runs in) and a
+# concurrency limit of its own.
+import threading
+import zipfile
+
+from extract_docx import docx_worker_slots, process_docx
+from extract_pdf import process_pdf
+from extract_markitdown import process_markitdown
+
+# Cost classes / scheduler lanes
+CHEAP = "cheap"
+EXPENSIVE = "expensive"
+
+# Suffixes that are worth opening to sniff; everything else is judged by extension only
+SNIFF_SUFFIXES = {"", ".bin", ".dat", ".tmp"}
+SNIFF_BYTES = 512
+
+ZIP_MAGIC = b"PK\x03\x04"
+PDF_MAGIC = b"%PDF-"
+OLE_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+
+# Top-level OOXML part folder -> format name
+OOXML_PARTS = {"word/": "docx", "ppt/": "pptx", "xl/": "xlsx"}
+
+
+class Converter:
+    """A source format: how to convert it and how the scheduler should treat it."""
+
+    def __init__(self, name: str, handler, extensions, cost: str = CHEAP, max_concurrency: int = 8):
+        self.name = name
+        self.handler = handler
+        self.extensions = {ext.lower() for ext in extensions}
+        self.cost = cost
+        self.max_concurrency = max_concurrency
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+
+    def __repr__(self):
+        return f"Converter({self.name}, {self.cost}, max_concurrency={self.max_concurrency})"
+
+
+_by_name = {}
+_by_extension = {}
+
+
+def register_converter(converter: Converter):
+    _by_name[converter.name] = converter
+    for ext in converter.extensions:
+        _by_extension[ext] = converter
+
+
+def get_converter(name: str):
+    return _by_name.get(name)
+
+
+def sniff_format(head: bytes, path=None):
+    """
+    Guess a format name from the first bytes of a file (and its ZIP directory).
+    path may be a Path or a sources.SourceFile.
+    """
+    if head.startswith(PDF_MAGIC):
+        return "pdf"
+    if head.startswith(OLE_MAGIC):
+        # Compound File; of the OLE formats we convert, only Outlook messages
+        return "msg"
+    if head.startswith(ZIP_MAGIC) and path is not None:
+        try:
+            with path.open("rb") as f, zipfile.ZipFile(f) as zf:
+                for name in zf.namelist():
+                    for prefix, fmt in OOXML_PARTS.items():
+                        if name.startswith(prefix):
+                            return fmt
+        except zipfile.BadZipFile:
+            return None
+        return None
+    text = head.lstrip(b"\xef\xbb\xbf \t\r\n").lower()
+    if text.startswith((b"<!doctype html", b"<html")):
+        return "html"
+    return None
+
+
+def may_convert(path) -> bool:
+    """Cheap name-only check: could this file be a supported document?"""
+    suffix = path.suffix.lower()
+    return suffix in _by_extension or suffix in SNIFF_SUFFIXES
+
+
+def converter_for(path):
+    """
+    Return the Converter for a file, or None if it is not a supported document.
+    path may be a Path or a sources.SourceFile.
+    """
+    suffix = path.suffix.lower()
+    if suffix in _by_extension:
+        return _by_extension[suffix]
+    if suffix not in SNIFF_SUFFIXES or not path.is_file():
+        return None
+    try:
+        with path.open("rb") as f:
+            head = f.read(SNIFF_BYTES)
+    except OSError:
+        return None
+    return _by_name.get(sniff_format(head, path))
+
+
+# DOCX concurrency is capped by how many per-worker memory budgets fit in free RAM
+register_converter(Converter("docx", process_docx, [".docx"], CHEAP, max_concurrency=docx_worker_slots()))
+register_converter(Converter("pdf", process_pdf, [".pdf"], EXPENSIVE, max_concurrency=2))
+register_converter(Converter("pptx", process_markitdown, [".pptx"], CHEAP, max_concurrency=4))
+register_converter(Converter("xlsx", process_markitdown, [".xlsx"], EXPENSIVE, max_concurrency=2))
+register_converter(Converter("html", process_markitdown, [".html", ".htm"], CHEAP, max_concurrency=8))
+register_converter(Converter("msg", process_markitdown, [".msg"], CHEAP, max_concurrency=8))
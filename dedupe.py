@@ -0,0 +1,91 @@
+# dedupe.py
+# Byte-identical source documents (the same DOCX copied into several SharePoint
+# folders) are converted once. Sources are hashed in parallel as they stream past;
+# later copies get the first copy's Markdown, which links to its /.media/<UUID>
+# images. Those links are root-relative, so the copied .md works unchanged in
+# any folder.
+import hashlib
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+HASH_CHUNK = 1024 * 1024
+HASH_WORKERS = 8
+# Sources hashed ahead of the one being handed out; bounds temp files held for TAR sources
+HASH_AHEAD = 32
+
+
+def content_digest(source) -> str:
+    """blake2b of the file's bytes, read in chunks."""
+    digest = hashlib.blake2b(digest_size=20)
+    with source.open("rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_sources(sources, workers: int = HASH_WORKERS, ahead: int = HASH_AHEAD):
+    """
+    Yield (source, digest) in the original order while hashing up to `ahead`
+    sources in parallel. digest is None when the file couldn't be read.
+    """
+    def result(item):
+        source, future = item
+        try:
+            return source, future.result()
+        except OSError:
+            return source, None
+
+    window = deque()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hash") as pool:
+        try:
+            for source in sources:
+                window.append((source, pool.submit(content_digest, source)))
+                if len(window) >= ahead:
+                    yield result(window.popleft())
+            while window:
+                yield result(window.popleft())
+        finally:
+            # Consumer stopped early: drop spooled temp files nobody will convert
+            for source, future in window:
+                future.cancel()
+                source.discard()
+
+
+class DuplicateTracker:
+    """Remembers the first source seen for each digest and the copies that follow it."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.originals = {}     # digest -> source
+        self.seconds = {}       # digest -> conversion time of the original
+        self.duplicates = []    # (source, digest)
+
+    def claim(self, source, digest) -> bool:
+        """True if source is the first with this content (convert it), False for a copy."""
+        if digest is None:
+            return True
+        with self.lock:
+            if digest in self.originals:
+                self.duplicates.append((source, digest))
+                return False
+            self.originals[digest] = source
+            return True
+
+    def timed(self, digest, fn, *args, **kwargs):
+        """Run the original's conversion, recording how long it took."""
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            if digest is not None:
+                with self.lock:
+                    self.seconds[digest] = time.perf_counter() - start
+
+    def summary(self, materialized: list, bytes_saved: int) -> str:
+        """materialized: digest of every copy that reused its original's output."""
+        seconds = sum(self.seconds.get(digest, 0.0) for digest in materialized)
+        return (f"Duplicates: {len(self.duplicates)} copies of {len({d for _, d in self.duplicates})} "
+                f"documents; {len(materialized)} materialized from existing output, saving "
+                f"{bytes_saved / (1024 * 1024):.1f} MB of input and ~{seconds:.1f}s of conversion")
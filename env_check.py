@@ -7,8 +7,7 @@ from utils import check_gpu_available, log_and_print, log_info, log_warning
 ESSENTIAL_IMPORTS = [
     "bs4",            # beautifulsoup4
     "markdownify",
-    "docx2txt",
-    "fitz",           # PyMuPDF
+    "pymupdf",        # PyMuPDF
     "pygments",
     "requests",
     "markitdown",
@@ -0,0 +1,270 @@
+# exporter.py
+# Prometheus metrics for long-running conversions, in the plain-text exposition
+# format (no client library needed):
+#   start_http_server(port)   serves GET /metrics from a background thread
+#   TextfileWriter(path)      rewrites a .prom file for node_exporter's textfile collector
+# convert_file reports each finished document through observe_document(); live
+# Schedulers are registered with track_scheduler() so queue depth and lane
+# utilization are read at scrape time.
+import os
+import threading
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+PREFIX = "ohhimarkitdown_"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers a small HTML file up to a multi-thousand-page PDF
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900)
+
+TEXTFILE_INTERVAL = 15.0
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help_text: str, labels=()):
+        self.name = PREFIX + name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels=()):
+        super().__init__(name, help_text, labels)
+        if not self.label_names:
+            self.values[()] = 0
+
+    def inc(self, amount=1, *labels):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        with self.lock:
+            values = dict(self.values)
+        return self.header() + [f"{self.name}{_labels(self.label_names, key)} {_number(value)}"
+                                for key, value in sorted(values.items())]
+
+
+class Gauge(_Metric):
+    """A gauge whose samples come from a callback returning {label values: value}."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels=(), collect=None):
+        super().__init__(name, help_text, labels)
+        self.collect = collect
+
+    def render(self) -> list[str]:
+        values = self.collect() if self.collect else {}
+        return self.header() + [f"{self.name}{_labels(self.label_names, key)} {_number(value)}"
+                                for key, value in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets) + (float("inf"),)
+
+    def observe(self, value: float, *labels):
+        with self.lock:
+            counts, total = self.values.get(labels) or ([0] * len(self.buckets), 0.0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self.values[labels] = (counts, total + value)
+
+    def render(self) -> list[str]:
+        with self.lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self.values.items()}
+        lines = self.header()
+        for key, (counts, total) in sorted(values.items()):
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_labels(self.label_names + ('le',), key + (_number(bound),))} "
+                             f"{count}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {counts[-1]}")
+        return lines
+
+
+class Registry:
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# -- instruments ---------------------------------------------------------------
+
+_schedulers = weakref.WeakSet()
+
+
+def track_scheduler(scheduler):
+    """Report this scheduler's lanes until untrack_scheduler() (or garbage collection)."""
+    _schedulers.add(scheduler)
+
+
+def untrack_scheduler(scheduler):
+    _schedulers.discard(scheduler)
+
+
+def _lane_samples(attribute: str) -> dict:
+    samples = {}
+    for scheduler in list(_schedulers):
+        for lane, limit in scheduler.limits.items():
+            samples[(lane,)] = samples.get((lane,), 0) + getattr(limit, attribute)
+    return samples
+
+
+def _queued() -> dict:
+    samples = {}
+    for scheduler in list(_schedulers):
+        for lane, queued in scheduler.queued.items():
+            samples[(lane,)] = samples.get((lane,), 0) + queued
+    return samples
+
+
+DOCUMENTS = REGISTRY.register(Counter(
+    "documents_total", "Documents finished, by status (ok, failed, duplicate) and converter.",
+    ("status", "converter")))
+DOCUMENT_SECONDS = REGISTRY.register(Histogram(
+    "document_seconds", "Wall time per converted document.", ("converter",)))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "stage_seconds", "Wall time per conversion stage (fetch, markitdown, pages, images, write, ...).",
+    ("stage",)))
+BYTES_IN = REGISTRY.register(Counter("bytes_in_total", "Source bytes read."))
+BYTES_OUT = REGISTRY.register(Counter("bytes_out_total", "Markdown and media bytes written."))
+IMAGES = REGISTRY.register(Counter("images_saved_total", "Images written to .media."))
+IMAGES_SKIPPED = REGISTRY.register(Counter(
+    "images_skipped_total", "Images not written: blank (solid colour) or missing from the package.",
+    ("reason",)))
+REGISTRY.register(Gauge(
+    "queue_depth", "Conversions submitted but not yet running, per lane.", ("lane",), _queued))
+REGISTRY.register(Gauge(
+    "workers_busy", "Conversions running, per lane.", ("lane",), lambda: _lane_samples("active")))
+REGISTRY.register(Gauge(
+    "workers_capacity", "Workers a lane may run (changes with adaptive concurrency).", ("lane",),
+    lambda: _lane_samples("capacity")))
+
+
+def observe_document(metrics):
+    """Fold one finished ledger.DocumentMetrics into the exported totals."""
+    converter = metrics.converter or "unknown"
+    DOCUMENTS.inc(1, metrics.status, converter)
+    if metrics.status == "duplicate":
+        return
+    DOCUMENT_SECONDS.observe(metrics.seconds, converter)
+    for name, seconds in metrics.stages.items():
+        STAGE_SECONDS.observe(seconds, name)
+    BYTES_IN.inc(metrics.bytes_in or 0)
+    BYTES_OUT.inc(metrics.bytes_out)
+    IMAGES.inc(metrics.images)
+    if metrics.skipped_blank:
+        IMAGES_SKIPPED.inc(metrics.skipped_blank, "blank")
+    if metrics.missing_images:
+        IMAGES_SKIPPED.inc(metrics.missing_images, "missing")
+
+
+# -- outputs -------------------------------------------------------------------
+
+class _Handler(BaseHTTPRequestHandler):
+    registry: Registry = REGISTRY
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_http_server(port: int, host: str = "127.0.0.1", registry: Registry = REGISTRY) -> ThreadingHTTPServer:
+    """Serve /metrics on a daemon thread; call shutdown() on the result to stop."""
+    handler = type("Handler", (_Handler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+class TextfileWriter:
+    """Rewrites `path` every `interval` seconds (and on stop) for the textfile collector."""
+
+    def __init__(self, path, interval: float = TEXTFILE_INTERVAL, registry: Registry = REGISTRY):
+        self.path = Path(path)
+        self.interval = interval
+        self.registry = registry
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="metrics-textfile", daemon=True)
+
+    def write(self):
+        # Write-then-rename so the collector never reads a half-written file
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        tmp.write_text(self.registry.render(), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.write()
+
+    def start(self):
+        self.write()
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        self.write()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
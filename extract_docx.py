@@ -1,58 +1,245 @@
 # extract_docx.py
-import os, docx2txt, shutil
-from pathlib import Path
-from markitdown import MarkItDown
+import io, os, re, shutil, tempfile, zipfile
+import xml.etree.ElementTree as ET
+import psutil
+from pathlib import Path, PurePosixPath
+from code_blocks import FENCE_CODE, fence_markdown, normalize
+from extract_docx_stream import (DOCUMENT_PART, COPY_CHUNK, MONOSPACE_FONT_RE, W, _read_code_styles,
+                                 _read_rels, is_code_paragraph, stream_docx)
+from extract_markitdown import get_markitdown
 from utils import log_info, log_warning
-from image_utils import save_and_rename_images, rewrite_markdown_images
+from image_utils import save_images, rewrite_markdown_images
+import ledger
 
-def process_docx(docx_path: Path, media_dir: Path, uuid: str,
-                 md_path: Path, warn_log: Path, info_log: Path):
+# RSS one DOCX worker may use (env OHHIMARKITDOWN_DOCX_RSS_MB). Documents whose
+# MarkItDown conversion is estimated to need more take the streaming path instead.
+DOCX_RSS_BUDGET = int(os.environ.get("OHHIMARKITDOWN_DOCX_RSS_MB", "1024")) * 1024 * 1024
+
+# Rough peak of the MarkItDown path (measured: 13.5 MB of XML + 29 MB of images
+# peaked ~650 MB above baseline): the parsed XML tree, HTML and Markdown copies
+# of the text, and every image held base64-encoded in those strings
+XML_PEAK_FACTOR = 40
+MEDIA_PEAK_FACTOR = 4
+
+# Documents with at least this many tables (env OHHIMARKITDOWN_DOCX_STREAM_TABLES, 0 = off)
+# take the streaming path too: its table extractor handles merged cells, and
+# MarkItDown's DOCX -> HTML -> Markdown round trip is slowest on large tables
+DOCX_STREAM_TABLES = int(os.environ.get("OHHIMARKITDOWN_DOCX_STREAM_TABLES", "50"))
+
+MAX_DOCX_WORKERS = 8
+
+# The tags scan_document() looks at, found in one pass over document.xml:
+# tables, image references (DrawingML blips and legacy VML imagedata), paragraph and
+# run styles, run fonts, and mc:Choice (mc:AlternateContent carries the same drawing
+# twice; MarkItDown renders the Fallback, so references inside Choice don't count)
+SCAN_TAG_RE = re.compile(rb"<(/?mc:Choice|w:tbl|a:blip|v:imagedata|w:pStyle|w:rStyle|w:rFonts)[\s>/]")
+REL_ID_RE = re.compile(rb'\br:(?:embed|id)="([^"]+)"')
+VAL_RE = re.compile(rb'\bw:val="([^"]*)"')
+FONT_ATTR_RE = re.compile(rb'w:(?:ascii|hAnsi)="([^"]+)"')
+
+
+def estimate_docx_peak(docx_path: Path) -> int:
+    """Estimated RSS (bytes) of converting this DOCX in memory, from its ZIP directory."""
+    xml = media = 0
+    with zipfile.ZipFile(docx_path) as zf:
+        for info in zf.infolist():
+            if info.filename.startswith("word/media/"):
+                media += info.file_size
+            elif info.filename.endswith(".xml"):
+                xml += info.file_size
+    return xml * XML_PEAK_FACTOR + media * MEDIA_PEAK_FACTOR
+
+
+class DocxScan:
+    """What one bytes pass over document.xml tells the DOCX path before MarkItDown runs."""
+
+    def __init__(self):
+        self.tables = 0             # w:tbl, nested included
+        self.image_rids = []        # relationship ID of each image reference, in order
+        self.styles = set()         # paragraph and run style IDs used in the body
+        self.fonts = set()          # fonts set directly on runs
+
+
+def scan_document(xml: bytes) -> DocxScan:
+    """Scan document.xml once, without building an XML tree."""
+    scan = DocxScan()
+    in_choice = 0
+    for m in SCAN_TAG_RE.finditer(xml):
+        tag = m.group(1)
+        if tag == b"w:tbl":
+            scan.tables += 1
+            continue
+        if tag == b"mc:Choice":
+            in_choice += 1
+            continue
+        if tag == b"/mc:Choice":
+            in_choice = max(0, in_choice - 1)
+            continue
+        attrs = xml[m.end() - 1:xml.find(b">", m.end() - 1)]
+        if tag in (b"a:blip", b"v:imagedata"):
+            rid = REL_ID_RE.search(attrs)
+            if rid and not in_choice:
+                scan.image_rids.append(rid.group(1).decode("utf-8", "replace"))
+        elif tag == b"w:rFonts":
+            scan.fonts.update(font.decode("utf-8", "replace") for font in FONT_ATTR_RE.findall(attrs))
+        else:
+            val = VAL_RE.search(attrs)
+            if val:
+                scan.styles.add(val.group(1).decode("utf-8", "replace"))
+    return scan
+
+
+def scan_docx(docx_path: Path) -> DocxScan:
+    with zipfile.ZipFile(docx_path) as zf:
+        return scan_document(zf.read(DOCUMENT_PART))
+
+
+def docx_image_refs(zf: zipfile.ZipFile, image_rids: list) -> list:
+    """
+    The media part behind each image reference in the body, in document order
+    (None where the relationship is missing, external or points nowhere).
+    """
+    rels = _read_rels(zf)
+    names = set(zf.namelist())
+    refs = []
+    for rid in image_rids:
+        target, external = rels.get(rid, (None, True))
+        refs.append(target if not external and target in names else None)
+    return refs
+
+
+def docx_code_lines(docx_path: Path, scan: DocxScan) -> set:
+    """
+    normalize()d text of the body paragraphs set in a monospace font, to tell the
+    code fencer which Markdown lines are code. Documents whose scan shows no
+    monospace font or code style in use skip the XML parse.
+    """
+    with zipfile.ZipFile(docx_path) as zf:
+        # Default templates define code styles whether or not the body uses them
+        code_styles = _read_code_styles(zf)
+        if not code_styles & scan.styles and not any(MONOSPACE_FONT_RE.search(f) for f in scan.fonts):
+            return set()
+        xml = zf.read(DOCUMENT_PART)
+    lines = set()
+    for _, elem in ET.iterparse(io.BytesIO(xml)):
+        if elem.tag == W + "p":
+            if is_code_paragraph(elem, code_styles):
+                text = "".join(t.text or "" for t in elem.iter(W + "t"))
+                lines.add(normalize(text))
+            elem.clear()
+    lines.discard("")
+    return lines
 
-    log_info(info_log, f"Starting DOCX processing: {docx_path}")
 
-    # media_dir = /output/media/<UUID>
-    media_root = media_dir.parent  # /output/media
+def extract_docx_images(docx_path: Path, image_rids: list, temp_dir: Path, sink, uuid: str, md_label,
+                        info_log: Path, warn_log: Path) -> list:
+    """
+    Save the images the body references and return the link for each reference,
+    in document order, for rewrite_markdown_images.
+    When references and media parts match one-to-one (the usual case) the saved
+    links line up with the references as they are; otherwise every reference is
+    resolved through its relationship to the media part it shows.
+    """
+    with zipfile.ZipFile(docx_path) as zf:
+        refs = docx_image_refs(zf, image_rids)
+        media = [name for name in zf.namelist() if name.startswith("word/media/")]
+        # Each referenced part once, numbered by first appearance
+        parts = list(dict.fromkeys(ref for ref in refs if ref))
+        files = []
+        for i, part in enumerate(parts, 1):
+            dest = temp_dir / f"{i:04d}{PurePosixPath(part).suffix.lower()}"
+            with zf.open(part) as src, open(dest, "wb") as dst:
+                shutil.copyfileobj(src, dst, COPY_CHUNK)
+            files.append(dest)
 
-    temp_dir = media_root / f"{uuid}_tmp"
-    os.makedirs(temp_dir, exist_ok=True)
+    ledger.count("image_refs", len(refs))
+    links = save_images(files, sink, uuid, md_label, info_log, warn_log)
+    if len(refs) == len(parts) == len(media):
+        ledger.note("image_mapping", "positional")
+        return links
 
-    log_info(info_log, f"Media directory will be: {media_dir}")
+    ledger.note("image_mapping", "by_reference")
+    log_info(info_log, f"{md_label}: {len(refs)} image references, {len(media)} media parts "
+                       f"({len(refs) - len(parts) - refs.count(None)} repeated, {refs.count(None)} broken, "
+                       f"{len(set(media) - set(parts))} unused); mapping by relationship")
+    by_part = dict(zip(parts, links))
+    return [by_part[ref] if ref else None for ref in refs]
+
+
+def docx_worker_slots(budget: int = DOCX_RSS_BUDGET) -> int:
+    """How many DOCX conversions fit in the memory available right now."""
+    available = psutil.virtual_memory().available
+    return max(1, min(MAX_DOCX_WORKERS, available // max(budget, 1)))
+
+def process_docx(docx_path: Path, sink, uuid: str,
+                 md_path, warn_log: Path, info_log: Path):
+
+    try:
+        peak = estimate_docx_peak(docx_path)
+    except (OSError, zipfile.BadZipFile):
+        peak = 0  # let MarkItDown report what's wrong with it
+    if peak > DOCX_RSS_BUDGET:
+        log_info(info_log, f"{docx_path}: estimated {peak // (1024 * 1024)} MB in memory exceeds the "
+                           f"{DOCX_RSS_BUDGET // (1024 * 1024)} MB budget; streaming instead")
+        stream_docx(docx_path, sink, uuid, md_path, warn_log, info_log)
+        return
+
+    # One pass over document.xml for tables, image references and code formatting
+    try:
+        with ledger.stage("scan"):
+            scan = scan_docx(docx_path)
+    except (OSError, KeyError, zipfile.BadZipFile):
+        scan = DocxScan()  # MarkItDown reports what's wrong with it
+    if DOCX_STREAM_TABLES and scan.tables >= DOCX_STREAM_TABLES:
+        log_info(info_log, f"{docx_path}: {scan.tables} tables; streaming instead")
+        stream_docx(docx_path, sink, uuid, md_path, warn_log, info_log)
+        return
+
+    log_info(info_log, f"Starting DOCX processing: {docx_path}")
+
+    # Images are extracted to a local temp dir, then handed to the sink as /.media/<UUID>/...
+    temp_dir = Path(tempfile.mkdtemp(prefix=f"{uuid}_tmp_"))
+    md_label = sink.describe(md_path)
 
     # Step 1: Run MarkItDown for text
     try:
-        md = MarkItDown(enable_plugins=False)
-        result = md.convert(str(docx_path))
+        with ledger.stage("markitdown"):
+            result = get_markitdown().convert(str(docx_path))
         markdown_text = result.text_content
-        md_path.write_text(markdown_text, encoding="utf-8")
-        log_info(info_log, f"Markdown written to: {md_path}")
     except Exception as e:
         log_warning(warn_log, f"MarkItDown failed for {docx_path}: {e}")
+        shutil.rmtree(temp_dir, ignore_errors=True)
         return
 
-    # Step 2: Extract images using docx2txt
+    # Step 2: Extract the referenced images straight from the package
     rel_paths = []
     try:
-        docx2txt.process(str(docx_path), str(temp_dir))
-        log_info(info_log, f"docx2txt processed images to temp dir: {temp_dir}")
-
-        # Pass media_root, not media_dir
-        rel_paths = save_and_rename_images(
-            temp_dir,
-            media_root,
-            uuid,
-            md_path,
-            info_log,
-            warn_log
-        )
-
+        with ledger.stage("images"):
+            rel_paths = extract_docx_images(docx_path, scan.image_rids, temp_dir, sink, uuid, md_label,
+                                            info_log, warn_log)
     except Exception as e:
-        log_warning(warn_log, f"{docx_path} docx2txt error: {e}")
+        log_warning(warn_log, f"{docx_path} image extraction error: {e}")
     finally:
         shutil.rmtree(temp_dir, ignore_errors=True)
 
-    # Step 3: Rewrite Markdown image links
-    try:
-        rewrite_markdown_images(md_path, rel_paths, info_log, warn_log)
-    except Exception as e:
-        log_warning(warn_log, f"{md_path} inline injection error: {e}")
-        log_info(info_log, f"Failed image injection: {e}")
+    # Step 3: Rewrite Markdown image links (in memory; the file is written once).
+    # No image references in the body: no links to rewrite, so no pass over the Markdown
+    if scan.image_rids:
+        try:
+            with ledger.stage("rewrite"):
+                markdown_text = rewrite_markdown_images(markdown_text, rel_paths, md_label, info_log, warn_log)
+        except Exception as e:
+            log_warning(warn_log, f"{md_label} inline injection error: {e}")
+            log_info(info_log, f"Failed image injection: {e}")
+
+    # Step 4: Fence XML/HTML and monospace paragraphs so they show as code
+    if FENCE_CODE:
+        try:
+            with ledger.stage("fence"):
+                markdown_text = fence_markdown(markdown_text, md_label, info_log, docx_code_lines(docx_path, scan))
+        except Exception as e:
+            log_warning(warn_log, f"{md_label} code fencing error: {e}")
+
+    with ledger.stage("write"):
+        sink.write_text(md_path, markdown_text)
+    log_info(info_log, f"Markdown written to: {md_label}")
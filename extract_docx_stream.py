@@ -0,0 +1,435 @@
+# extract_docx_stream.py
+# Memory-bounded DOCX -> Markdown for documents too large for the MarkItDown path.
+# word/document.xml is parsed with iterparse and each finished paragraph is written
+# out and dropped; table rows are reduced to their cell text as they finish and the
+# table is written when it ends (see extract_docx_tables.py). Images are copied
+# straight from word/media into the sink, and the Markdown goes to a temp file that
+# the sink takes over at the end. Memory stays at roughly one paragraph (or one
+# table's text) plus I/O buffers, whatever the size of the document.
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+import xml.etree.ElementTree as ET
+import zipfile
+from pathlib import Path, PurePosixPath
+
+import ledger
+from code_blocks import FENCE_CODE, CodeFencer, note_fenced
+from extract_docx_tables import TableBuilder
+from image_utils import is_solid_color
+from sinks import media_link, media_path
+from utils import log_info, log_warning
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+R = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+V = "{urn:schemas-microsoft-com:vml}"
+PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+DOCUMENT_PART = "word/document.xml"
+COPY_CHUNK = 1024 * 1024
+
+HEADING_RE = re.compile(r"^heading\s*(\d)$")
+
+# Paragraphs set entirely in these fonts (or code styles) are fenced as code
+MONOSPACE_FONT_RE = re.compile(r"courier|consolas|lucida (?:console|sans typewriter)|monaco|menlo|"
+                               r"mono\b|monospace|inconsolata|cascadia|source code|fira code|ocr a", re.I)
+CODE_STYLE_RE = re.compile(r"code|preformatted|plain text|macro text", re.I)
+
+# Run/paragraph children that never carry visible text
+SKIP_TAGS = {W + "pPr", W + "rPr", W + "del", W + "moveFrom", W + "proofErr", W + "bookmarkStart",
+             W + "bookmarkEnd", W + "commentRangeStart", W + "commentRangeEnd", W + "instrText"}
+
+
+def _flag(rpr, name: str) -> bool:
+    """w:b / w:i style toggles: present and not switched off."""
+    if rpr is None:
+        return False
+    el = rpr.find(W + name)
+    return el is not None and el.get(W + "val", "true").lower() not in ("0", "false", "none")
+
+
+def _read_rels(zf: zipfile.ZipFile) -> dict:
+    """rId -> (target, external) for document.xml."""
+    rels = {}
+    try:
+        root = ET.fromstring(zf.read("word/_rels/document.xml.rels"))
+    except KeyError:
+        return rels
+    for rel in root.iter(PKG_REL + "Relationship"):
+        external = rel.get("TargetMode") == "External"
+        target = rel.get("Target", "")
+        if not external:
+            target = posixpath.normpath(posixpath.join("word", target)) if not target.startswith("/") else target[1:]
+        rels[rel.get("Id")] = (target, external)
+    return rels
+
+
+def _num_pr(ppr):
+    """(numId, ilvl) from a w:pPr's w:numPr, or None."""
+    numpr = ppr.find(W + "numPr") if ppr is not None else None
+    if numpr is None:
+        return None
+    ilvl_el, num_el = numpr.find(W + "ilvl"), numpr.find(W + "numId")
+    return (num_el.get(W + "val") if num_el is not None else None,
+            ilvl_el.get(W + "val", "0") if ilvl_el is not None else "0")
+
+
+def _read_styles(zf: zipfile.ZipFile):
+    """
+    For paragraph styles: styleId -> heading level (0 for Title), and
+    styleId -> (numId, ilvl) for list styles such as "List Bullet".
+    """
+    levels, numbering = {}, {}
+    try:
+        root = ET.fromstring(zf.read("word/styles.xml"))
+    except KeyError:
+        return levels, numbering
+    for style in root.iter(W + "style"):
+        style_id = style.get(W + "styleId")
+        name_el = style.find(W + "name")
+        name = (name_el.get(W + "val") if name_el is not None else style_id or "").strip().lower()
+        match = HEADING_RE.match(name)
+        if match:
+            levels[style_id] = int(match.group(1))
+        elif name == "title":
+            levels[style_id] = 0
+        num = _num_pr(style.find(W + "pPr"))
+        if num is not None:
+            numbering[style_id] = num
+    return levels, numbering
+
+
+def _run_font(rpr):
+    """The font a w:rPr sets for Latin text, or None."""
+    fonts = rpr.find(W + "rFonts") if rpr is not None else None
+    if fonts is None:
+        return None
+    return fonts.get(W + "ascii") or fonts.get(W + "hAnsi")
+
+
+def _read_code_styles(zf: zipfile.ZipFile) -> set:
+    """Style IDs (paragraph and character) that set a monospace font or are named like code."""
+    try:
+        root = ET.fromstring(zf.read("word/styles.xml"))
+    except KeyError:
+        return set()
+    based_on, code = {}, {}
+    for style in root.iter(W + "style"):
+        style_id = style.get(W + "styleId")
+        name_el = style.find(W + "name")
+        name = name_el.get(W + "val", "") if name_el is not None else ""
+        font = _run_font(style.find(W + "rPr"))
+        if font is not None:
+            code[style_id] = bool(MONOSPACE_FONT_RE.search(font))
+        elif CODE_STYLE_RE.search(name):
+            code[style_id] = True
+        parent = style.find(W + "basedOn")
+        if parent is not None:
+            based_on[style_id] = parent.get(W + "val")
+
+    def resolve(style_id, seen=()):
+        if style_id in code:
+            return code[style_id]
+        parent = based_on.get(style_id)
+        return parent is not None and parent not in seen and resolve(parent, seen + (style_id,))
+
+    return {style_id for style_id in set(code) | set(based_on) if resolve(style_id)}
+
+
+def is_code_paragraph(p, code_styles: set) -> bool:
+    """Every run with text in p is in a monospace font (directly or through its styles)."""
+    ppr = p.find(W + "pPr")
+    style = ppr.find(W + "pStyle") if ppr is not None else None
+    paragraph_code = style is not None and style.get(W + "val") in code_styles
+    has_text = False
+    for r in p.iter(W + "r"):
+        if not any(t.text and t.text.strip() for t in r.iter(W + "t")):
+            continue
+        has_text = True
+        rpr = r.find(W + "rPr")
+        font = _run_font(rpr)
+        if font is not None:
+            code = bool(MONOSPACE_FONT_RE.search(font))
+        else:
+            rstyle = rpr.find(W + "rStyle") if rpr is not None else None
+            code = paragraph_code or (rstyle is not None and rstyle.get(W + "val") in code_styles)
+        if not code:
+            return False
+    return has_text
+
+
+def _read_numbering(zf: zipfile.ZipFile) -> dict:
+    """(numId, ilvl) -> True for ordered (decimal-like) list levels."""
+    ordered = {}
+    try:
+        root = ET.fromstring(zf.read("word/numbering.xml"))
+    except KeyError:
+        return ordered
+    abstract = {}
+    for an in root.iter(W + "abstractNum"):
+        levels = {}
+        for lvl in an.iter(W + "lvl"):
+            fmt = lvl.find(W + "numFmt")
+            value = fmt.get(W + "val") if fmt is not None else "bullet"
+            levels[lvl.get(W + "ilvl", "0")] = value not in ("bullet", "none")
+        abstract[an.get(W + "abstractNumId")] = levels
+    for num in root.iter(W + "num"):
+        ref = num.find(W + "abstractNumId")
+        if ref is None:
+            continue
+        for ilvl, is_ordered in abstract.get(ref.get(W + "val"), {}).items():
+            ordered[(num.get(W + "numId"), ilvl)] = is_ordered
+    return ordered
+
+
+class _DocxStreamWriter:
+
+    def __init__(self, zf, out, sink, uuid, md_label, warn_log, info_log):
+        self.zf = zf
+        self.out = out
+        self.sink = sink
+        self.uuid = uuid
+        self.md_label = md_label
+        self.warn_log = warn_log
+        self.info_log = info_log
+        self.rels = _read_rels(zf)
+        self.headings, self.style_numbering = _read_styles(zf)
+        self.ordered = _read_numbering(zf)
+        self.code_styles = _read_code_styles(zf)
+        self.fencer = CodeFencer(unescape=False) if FENCE_CODE else None
+        self.images = {}        # rId -> Markdown link (same picture used twice)
+        self.counter = 1
+        self.last_block = None
+        self.table = None
+
+    # -- images ------------------------------------------------------------
+
+    def image(self, rid: str) -> str:
+        if rid in self.images:
+            return self.images[rid]
+        target, external = self.rels.get(rid, (None, False))
+        link = ""
+        if target and external:
+            link = f"![]({target})"
+        elif target:
+            link = self._store_image(target)
+        self.images[rid] = link
+        return link
+
+    def _store_image(self, member: str) -> str:
+        ext = PurePosixPath(member).suffix.lower() or ".jpg"
+        fd, tmp = tempfile.mkstemp(prefix=f"{self.uuid}_img_", suffix=ext)
+        try:
+            with os.fdopen(fd, "wb") as out, self.zf.open(member) as src:
+                shutil.copyfileobj(src, out, COPY_CHUNK)
+            try:
+                if is_solid_color(tmp):
+                    log_info(self.info_log, f"Skipped solid color image: {member}")
+                    ledger.count("skipped_blank")
+                    return ""
+            except Exception:
+                pass  # not something PIL can read (EMF/WMF); keep it as-is
+            name = f"{self.uuid}-{self.counter:03d}{ext}"
+            self.sink.move_file(tmp, media_path(self.uuid, name))
+            tmp = None
+            log_info(self.info_log, f"Saved image {self.counter}: {self.sink.describe(media_path(self.uuid, name))}")
+            self.counter += 1
+            return f"![]({media_link(self.uuid, name)})"
+        except KeyError:
+            log_warning(self.warn_log, f"{self.md_label} — image part missing: {member}")
+            ledger.count("missing_images")
+            return "[[IMAGE MISSING]]"
+        finally:
+            if tmp is not None and os.path.exists(tmp):
+                os.unlink(tmp)
+
+    # -- inline content ----------------------------------------------------
+
+    def inline(self, elem, segments, in_table=False):
+        """Append (text, bold, italic) segments for a paragraph's content, in order."""
+        for child in elem:
+            tag = child.tag
+            if tag in SKIP_TAGS:
+                continue
+            if tag == W + "r":
+                self.run(child, segments, in_table)
+            elif tag == W + "hyperlink":
+                inner = []
+                self.inline(child, inner, in_table)
+                text = _render(inner)
+                target, _ = self.rels.get(child.get(R + "id"), (None, False))
+                if target and text.strip():
+                    anchor = child.get(W + "anchor")
+                    href = target + (f"#{anchor}" if anchor else "")
+                    segments.append((f"[{text}]({href})", False, False))
+                else:
+                    segments.extend(inner)
+            else:
+                # ins, smartTag, sdt/sdtContent, fldSimple, ...
+                self.inline(child, segments, in_table)
+
+    def run(self, r, segments, in_table):
+        rpr = r.find(W + "rPr")
+        bold, italic = _flag(rpr, "b"), _flag(rpr, "i")
+        for child in r:
+            tag = child.tag
+            if tag == W + "t":
+                segments.append((child.text or "", bold, italic))
+            elif tag == W + "tab":
+                segments.append(("\t", False, False))
+            elif tag in (W + "br", W + "cr"):
+                segments.append((" " if in_table else "\n", False, False))
+            elif tag in (W + "drawing", W + "pict", W + "object"):
+                for blip in child.iter(A + "blip"):
+                    rid = blip.get(R + "embed") or blip.get(R + "link")
+                    if rid:
+                        segments.append((self.image(rid), False, False))
+                for data in child.iter(V + "imagedata"):
+                    rid = data.get(R + "id")
+                    if rid:
+                        segments.append((self.image(rid), False, False))
+
+    # -- blocks ------------------------------------------------------------
+
+    def write_line(self, line: str, code=None):
+        # Through the code fencer (see code_blocks.py): code=True is known code, False never code
+        for out in self.fencer.feed(line, code) if self.fencer else (line,):
+            self.out.write(out + "\n")
+
+    def write_block(self, text: str, kind: str, code=None):
+        if self.last_block is not None and not (kind.startswith("list") and kind == self.last_block):
+            # Items of the same list stay together; everything else is separated by a blank line
+            self.write_line("")
+        for line in text.split("\n"):
+            self.write_line(line, code)
+        self.last_block = kind
+
+    def paragraph(self, p):
+        segments = []
+        self.inline(p, segments)
+        text = _render(segments).rstrip()
+        if not text.strip():
+            return
+        if self.fencer and is_code_paragraph(p, self.code_styles):
+            # Code keeps its indentation
+            self.write_block(text, "code", code=True)
+            return
+        text = text.strip()
+        ppr = p.find(W + "pPr")
+        style = ppr.find(W + "pStyle") if ppr is not None else None
+        style_id = style.get(W + "val") if style is not None else None
+        level = self.headings.get(style_id)
+        num = _num_pr(ppr) or self.style_numbering.get(style_id)
+        if level is not None:
+            self.write_block("#" * max(1, level) + " " + text.replace("\n", " "), "heading", code=False)
+        elif num is not None and num[0] != "0":
+            num_id, ilvl = num
+            marker = "1." if self.ordered.get((num_id, ilvl)) else "*"
+            indent = "\t" * int(ilvl) if ilvl.isdigit() else ""
+            self.write_block(f"{indent}{marker} {text}", f"list{num_id}")
+        else:
+            self.write_block(text, "text")
+
+    def table_cell(self, tc) -> str:
+        """A cell's paragraphs (nested tables' included), one line each."""
+        parts = []
+        for p in tc.iter(W + "p"):
+            segments = []
+            self.inline(p, segments, in_table=True)
+            text = _render(segments).strip()
+            if text:
+                parts.append(text)
+        return "\n".join(parts)
+
+    def end_table(self):
+        text = self.table.render()
+        if text:
+            self.write_block(text, "table", code=False)
+        self.table = None
+
+    # -- driver ------------------------------------------------------------
+
+    def convert(self):
+        stack = []
+        table_depth = 0
+        with self.zf.open(DOCUMENT_PART) as xml:
+            for event, elem in ET.iterparse(xml, events=("start", "end")):
+                if event == "start":
+                    stack.append(elem)
+                    if elem.tag == W + "tbl":
+                        table_depth += 1
+                        if table_depth == 1:
+                            self.table = TableBuilder()
+                    continue
+
+                stack.pop()
+                tag = elem.tag
+                done = False
+                if tag == W + "p" and table_depth == 0:
+                    self.paragraph(elem)
+                    done = True
+                elif tag == W + "tr" and table_depth == 1:
+                    self.table.add_row(elem, self.table_cell)
+                    done = True
+                elif tag == W + "tbl":
+                    table_depth -= 1
+                    done = table_depth == 0
+                    if done:
+                        self.end_table()
+                elif tag == W + "sectPr" and table_depth == 0:
+                    done = True
+
+                # Drop finished blocks so the tree never grows past the current one
+                if done and stack:
+                    stack[-1].remove(elem)
+        if self.fencer:
+            for out in self.fencer.finish():
+                self.out.write(out + "\n")
+
+
+def _render(segments) -> str:
+    """Merge runs with the same formatting, then apply ** / * around non-blank text."""
+    merged = []
+    for text, bold, italic in segments:
+        if merged and merged[-1][1:] == (bold, italic):
+            merged[-1] = (merged[-1][0] + text, bold, italic)
+        else:
+            merged.append((text, bold, italic))
+    out = []
+    for text, bold, italic in merged:
+        core = text.strip()
+        if not core or not (bold or italic):
+            out.append(text)
+            continue
+        mark = ("**" if bold else "") + ("*" if italic else "")
+        lead = text[:len(text) - len(text.lstrip())]
+        trail = text[len(text.rstrip()):]
+        out.append(f"{lead}{mark}{core}{mark[::-1]}{trail}")
+    return "".join(out)
+
+
+def stream_docx(docx_path: Path, sink, uuid: str, md_path, warn_log: Path, info_log: Path):
+    """Convert a DOCX without holding the document (or its Markdown) in memory."""
+    md_label = sink.describe(md_path)
+    log_info(info_log, f"Streaming DOCX conversion: {docx_path}")
+
+    fd, tmp = tempfile.mkstemp(prefix=f"{uuid}_", suffix=".md")
+    try:
+        with zipfile.ZipFile(docx_path) as zf, os.fdopen(fd, "w", encoding="utf-8", newline="\n") as out:
+            writer = _DocxStreamWriter(zf, out, sink, uuid, md_label, warn_log, info_log)
+            with ledger.stage("stream"):
+                writer.convert()
+            if writer.fencer:
+                note_fenced(writer.fencer.blocks, md_label, info_log)
+        with ledger.stage("write"):
+            sink.move_file(tmp, md_path)
+        tmp = None
+        log_info(info_log, f"Markdown written to: {md_label} ({writer.counter - 1} images)")
+    except Exception as e:
+        log_warning(warn_log, f"Streaming DOCX conversion failed for {docx_path}: {e}")
+    finally:
+        if tmp is not None and os.path.exists(tmp):
+            os.unlink(tmp)
@@ -0,0 +1,127 @@
+# extract_docx_tables.py
+# Word tables (w:tbl) for the streaming DOCX path. Rows are added as iterparse
+# finishes them; merged cells are resolved on the table grid:
+#   w:gridSpan          cell covers several grid columns (colspan)
+#   w:vMerge restart /  cell continues the one above it (rowspan)
+#   w:vMerge (continue)
+#   w:gridBefore/After  grid columns skipped at the start / end of a row
+# A table without merges becomes a GFM pipe table; one with merges (which GFM
+# can't express) becomes an HTML <table> with colspan / rowspan.
+import html
+import re
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+# Our own inline Markdown (see extract_docx_stream._render), turned into HTML for cells
+_IMAGE_RE = re.compile(r"!\[([^\]]*)\]\(([^)\s]+)\)")
+_LINK_RE = re.compile(r"\[([^\]]+)\]\(([^)\s]+)\)")
+_STRONG_RE = re.compile(r"\*\*(\S(?:.*?\S)?)\*\*")
+_EM_RE = re.compile(r"(?<![*\w])\*(\S(?:.*?\S)?)\*(?![*\w])")
+
+
+def _val(parent, name: str, default=None):
+    el = parent.find(W + name) if parent is not None else None
+    if el is None:
+        return None
+    return el.get(W + "val", default)
+
+
+def _int(value, default: int = 1) -> int:
+    try:
+        return max(default, int(value))
+    except (TypeError, ValueError):
+        return default
+
+
+class _Cell:
+    __slots__ = ("text", "colspan", "rowspan")
+
+    def __init__(self, text: str, colspan: int = 1):
+        self.text = text
+        self.colspan = colspan
+        self.rowspan = 1
+
+
+class TableBuilder:
+    """One table's rows on its grid. Only cell text is kept, not the XML."""
+
+    def __init__(self):
+        self.rows = []          # per row: {grid column: _Cell} for the cells that start there
+        self.width = 0
+        self.merged = False
+        self._above = {}        # grid column -> _Cell covering it in the previous row
+
+    def add_row(self, tr, cell_text):
+        """Add a finished w:tr; cell_text(tc) returns a cell's inline Markdown."""
+        trpr = tr.find(W + "trPr")
+        col = _int(_val(trpr, "gridBefore"), 0)
+        cells, above = {}, {}
+        for tc in tr.findall(W + "tc"):
+            tcpr = tc.find(W + "tcPr")
+            span = _int(_val(tcpr, "gridSpan"))
+            vmerge = _val(tcpr, "vMerge", "continue")
+            origin = self._above.get(col)
+            if vmerge == "continue" and origin is not None and origin.colspan == span:
+                origin.rowspan += 1
+                self.merged = True
+                cell = origin
+            else:
+                cell = cells[col] = _Cell(cell_text(tc), span)
+                if span > 1:
+                    self.merged = True
+            for c in range(col, col + span):
+                above[c] = cell
+            col += span
+        if not cells and not above:
+            return
+        self.width = max(self.width, col + _int(_val(trpr, "gridAfter"), 0))
+        self._above = above
+        self.rows.append(cells)
+
+    def render(self) -> str:
+        if not self.rows:
+            return ""
+        return self._html() if self.merged else self._gfm()
+
+    def _gfm(self) -> str:
+        lines = []
+        for i, cells in enumerate(self.rows):
+            texts = [_gfm_cell(cells[c].text) if c in cells else "" for c in range(self.width)]
+            lines.append("| " + " | ".join(texts) + " |")
+            if i == 0:
+                lines.append("|" + " --- |" * self.width)
+        return "\n".join(lines)
+
+    def _html(self) -> str:
+        lines = ["<table>"]
+        for i, cells in enumerate(self.rows):
+            tag = "th" if i == 0 else "td"
+            parts = []
+            for c in sorted(cells):
+                cell = cells[c]
+                attrs = (f' colspan="{cell.colspan}"' if cell.colspan > 1 else "") + \
+                        (f' rowspan="{cell.rowspan}"' if cell.rowspan > 1 else "")
+                parts.append(f"<{tag}{attrs}>{_html_cell(cell.text)}</{tag}>")
+            lines.append("<tr>" + "".join(parts) + "</tr>")
+        lines.append("</table>")
+        return "\n".join(lines)
+
+
+def _gfm_cell(text: str) -> str:
+    return text.replace("|", "\\|").replace("\n", "<br>")
+
+
+def _html_cell(text: str) -> str:
+    # Markdown isn't rendered inside an HTML block, so images, links and emphasis become tags
+    text = html.escape(text, quote=False)
+    text = _IMAGE_RE.sub(lambda m: f'<img src="{_attr(m.group(2))}" alt="{_attr(m.group(1))}">', text)
+    text = _LINK_RE.sub(lambda m: f'<a href="{_attr(m.group(2))}">{m.group(1)}</a>', text)
+    text = _STRONG_RE.sub(r"<strong>\1</strong>", text)
+    text = _EM_RE.sub(r"<em>\1</em>", text)
+    return text.replace("\n", "<br>")
+
+
+def _attr(value: str) -> str:
+    # Already escaped apart from quotes
+    return value.replace('"', "&quot;")
+
@@ -0,0 +1,39 @@
+# extract_markitdown.py
+# Text-only MarkItDown path for formats without a dedicated image pipeline
+# (PPTX, XLSX, HTML, MSG).
+import threading
+from pathlib import Path
+from markitdown import MarkItDown
+from utils import log_info, log_warning
+from code_blocks import fence_markdown
+import ledger
+
+_local = threading.local()
+
+
+def get_markitdown() -> MarkItDown:
+    """
+    One MarkItDown per thread, created on first use. Construction registers every
+    converter (and loads the file-type model), so it is not repeated per document.
+    """
+    md = getattr(_local, "markitdown", None)
+    if md is None:
+        md = _local.markitdown = MarkItDown(enable_plugins=False)
+    return md
+
+
+def process_markitdown(src_path: Path, sink, uuid: str,
+                       md_path, warn_log: Path, info_log: Path):
+
+    log_info(info_log, f"Starting MarkItDown processing: {src_path}")
+
+    try:
+        with ledger.stage("markitdown"):
+            result = get_markitdown().convert(str(src_path))
+        with ledger.stage("fence"):
+            markdown_text = fence_markdown(result.text_content, sink.describe(md_path), info_log)
+        with ledger.stage("write"):
+            sink.write_text(md_path, markdown_text)
+        log_info(info_log, f"Markdown written to: {sink.describe(md_path)}")
+    except Exception as e:
+        log_warning(warn_log, f"MarkItDown failed for {src_path}: {e}")
@@ -0,0 +1,234 @@
+# extract_pdf.py
+# Fast PDF path: PyMuPDF text-with-layout extraction, no ML models.
+import os
+import shutil
+import tempfile
+import pymupdf  # PyMuPDF
+import multiprocessing
+import models
+import ledger
+import profiler
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from utils import log_info, log_warning
+from code_blocks import fence_markdown
+from sinks import media_link, media_path
+
+# Images smaller than this are spacers, bullets and rules rather than content
+MIN_IMAGE_BYTES = 1000
+
+# Join hyphenated line breaks and keep ligatures as single characters
+TEXT_FLAGS = pymupdf.TEXT_DEHYPHENATE | pymupdf.TEXT_PRESERVE_LIGATURES | pymupdf.TEXT_MEDIABOX_CLIP
+
+
+# Documents with at least this many pages are split into page ranges and
+# converted in parallel worker processes, each with its own document handle
+PARALLEL_MIN_PAGES = 64
+MIN_PAGES_PER_RANGE = 16
+MAX_PDF_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+# Image-only (scanned) pages go to the "ocr" model when one is registered
+OCR_MODEL = "ocr"
+OCR_DPI = 150
+
+_pool = None
+
+
+def number_images(doc) -> dict:
+    """
+    Number every image xref by first appearance in the document (1-based).
+    Only reads page resources, no image decoding, so it is cheap even for huge files.
+    """
+    numbering = {}
+    for page_num in range(len(doc)):
+        for img in doc.get_page_images(page_num):
+            numbering.setdefault(img[0], len(numbering) + 1)
+    return numbering
+
+
+def page_text_blocks(page) -> list[tuple]:
+    """Return the page's text blocks in reading order as (bbox, paragraph) pairs."""
+    paragraphs = []
+    for block in page.get_text("blocks", flags=TEXT_FLAGS, sort=True):
+        # (x0, y0, x1, y1, text, block_no, block_type); type 1 is an image block
+        if block[6] != 0:
+            continue
+        text = " ".join(line.strip() for line in block[4].splitlines() if line.strip())
+        if text:
+            paragraphs.append((block[:4], text))
+    return paragraphs
+
+
+def save_image(doc, xref: int, number: int, media_dir: Path, uuid: str, saved: dict,
+               pdf_path: Path, page_num: int, info_log: Path, warn_log: Path):
+    """
+    Stream one image straight into media_dir as <UUID>-NNN.<ext>.
+    `saved` maps xref -> rel path (None if skipped) so repeated images are handled once.
+    Workers may race on the same image; the first one to create the file wins.
+    """
+    if xref in saved:
+        return saved[xref]
+    saved[xref] = None
+    try:
+        image = doc.extract_image(xref)
+        data = image["image"]
+        if len(data) < MIN_IMAGE_BYTES:
+            log_info(info_log, f"Skipped small image on page {page_num + 1}: {pdf_path}")
+            return None
+        dest = media_dir / f"{uuid}-{number:03d}.{image['ext']}"
+        try:
+            with open(dest, "xb") as f:
+                f.write(data)
+            log_info(info_log, f"Saved image {number}: {dest}")
+        except FileExistsError:
+            pass
+        saved[xref] = media_link(uuid, dest.name)
+    except Exception as e:
+        log_warning(warn_log, f"{pdf_path} p{page_num + 1} — error extracting image: {e}")
+    return saved[xref]
+
+
+def convert_page(doc, page, media_dir: Path, uuid: str, numbering: dict, saved: dict,
+                 pdf_path: Path, info_log: Path, warn_log: Path) -> list:
+    """
+    Render one page to Markdown parts, placing each image before the first block below
+    its top edge. A page with no text layer gets an OCR Future when a model is registered.
+    """
+    try:
+        blocks = page_text_blocks(page)
+    except Exception as e:
+        log_warning(warn_log, f"{pdf_path} p{page.number + 1} — text extraction error: {e}")
+        blocks = []
+
+    if not blocks and models.has_model(OCR_MODEL):
+        png = page.get_pixmap(dpi=OCR_DPI).tobytes("png")
+        blocks = [((0, 0, 0, 0), models.get_batcher(OCR_MODEL).submit(png))]
+
+    placed = []
+    for info in page.get_image_info(xrefs=True):
+        xref = info.get("xref", 0)
+        if not xref or xref not in numbering:
+            continue
+        rel = save_image(doc, xref, numbering[xref], media_dir, uuid, saved,
+                         pdf_path, page.number, info_log, warn_log)
+        if rel:
+            x0, y0 = info["bbox"][:2]
+            placed.append((y0, x0, f"![]({rel})"))
+    placed.sort()
+
+    # Merge images into the text flow by vertical position
+    parts = []
+    i = 0
+    for bbox, text in blocks:
+        while i < len(placed) and placed[i][0] <= bbox[1]:
+            parts.append(placed[i][2])
+            i += 1
+        parts.append(text)
+    parts.extend(item[2] for item in placed[i:])
+    return parts
+
+
+def resolve_parts(parts: list, pdf_path: Path, page_num: int, warn_log: Path) -> str:
+    text = []
+    for part in parts:
+        if isinstance(part, Future):
+            try:
+                part = part.result()
+            except Exception as e:
+                log_warning(warn_log, f"{pdf_path} p{page_num + 1} — OCR failed: {e}")
+                continue
+        if part:
+            text.append(part)
+    return "\n\n".join(text)
+
+
+def convert_page_range(pdf_path: Path, start: int, stop: int, media_dir: Path, uuid: str,
+                       numbering: dict, info_log: Path, warn_log: Path) -> list[str]:
+    """Worker entry point: open a private handle and convert pages [start, stop)."""
+    saved = {}
+    with pymupdf.open(pdf_path) as doc:
+        # Submit every page first so OCR requests for the range are batched together
+        pages = [
+            convert_page(doc, doc[page_num], media_dir, uuid, numbering, saved,
+                         pdf_path, info_log, warn_log)
+            for page_num in range(start, stop)
+        ]
+    return [resolve_parts(parts, pdf_path, start + i, warn_log) for i, parts in enumerate(pages)]
+
+
+def page_ranges(page_count: int, workers: int) -> list[tuple]:
+    """Split pages into roughly 2 ranges per worker so stragglers even out."""
+    size = max(MIN_PAGES_PER_RANGE, -(-page_count // (workers * 2)))
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        names = [OCR_MODEL] if models.has_model(OCR_MODEL) else []
+        if names and multiprocessing.get_start_method() == "fork":
+            # Load before forking so every worker shares the weights copy-on-write
+            models.preload_models(names)
+        _pool = ProcessPoolExecutor(max_workers=MAX_PDF_WORKERS,
+                                    initializer=models.worker_initializer, initargs=(names,))
+    return _pool
+
+
+def reset_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+
+
+def process_pdf(pdf_path: Path, sink, uuid: str,
+                md_path, warn_log: Path, info_log: Path):
+
+    log_info(info_log, f"Starting PDF processing: {pdf_path}")
+
+    try:
+        with pymupdf.open(pdf_path) as doc:
+            page_count = len(doc)
+            numbering = number_images(doc)
+    except Exception as e:
+        log_warning(warn_log, f"PyMuPDF failed to open {pdf_path}: {e}")
+        return
+
+    # Workers write images to a local temp dir; they are handed to the sink afterwards
+    media_dir = Path(tempfile.mkdtemp(prefix=f"{uuid}_tmp_"))
+    try:
+        pages = None
+        with ledger.stage("pages"):
+            if page_count >= PARALLEL_MIN_PAGES and MAX_PDF_WORKERS > 1:
+                ranges = page_ranges(page_count, MAX_PDF_WORKERS)
+                try:
+                    futures = [
+                        profiler.submit(get_pool(), convert_page_range, pdf_path, start, stop,
+                                        media_dir, uuid, numbering, info_log, warn_log)
+                        for start, stop in ranges
+                    ]
+                    # Stitch ranges back together in page order
+                    pages = [page for future in futures for page in future.result()]
+                    log_info(info_log, f"Converted {page_count} pages in {len(ranges)} parallel ranges: {pdf_path}")
+                except BrokenProcessPool as e:
+                    reset_pool()
+                    log_warning(warn_log, f"{pdf_path} — PDF worker pool failed ({e}); converting serially")
+
+            if pages is None:
+                pages = convert_page_range(pdf_path, 0, page_count, media_dir, uuid,
+                                           numbering, info_log, warn_log)
+
+        with ledger.stage("images"):
+            images = sorted(media_dir.iterdir())
+            for image in images:
+                sink.move_file(image, media_path(uuid, image.name))
+    finally:
+        shutil.rmtree(media_dir, ignore_errors=True)
+
+    markdown_text = "\n\n".join(p for p in pages if p) + "\n"
+    with ledger.stage("fence"):
+        markdown_text = fence_markdown(markdown_text, sink.describe(md_path), info_log, unescape=False)
+    with ledger.stage("write"):
+        sink.write_text(md_path, markdown_text)
+    log_info(info_log, f"Markdown written to: {sink.describe(md_path)} ({page_count} pages, {len(images)} images)")
@@ -0,0 +1,101 @@
+# ids.py
+# Document IDs (the <UUID> in .media/<UUID>/ and in image names). They are derived
+# rather than random, so converting the same input again gives byte-identical
+# Markdown and media:
+#   path     blake2b of the source's path relative to the source root (default);
+#            survives edits, so links into .media/<UUID> stay valid after re-conversion
+#   content  blake2b of the file's bytes; identical files get the same ID
+# IDs are ID_LENGTH lowercase hex characters (env OHHIMARKITDOWN_ID_LENGTH, default
+# 12 = 48 bits, about a 1 in 350,000 chance of any collision among 40k documents).
+# IdRegistry detects collisions within a run and lengthens the later ID. With the
+# content scheme, a second file with identical bytes at another path (converted
+# because dedupe is off, or can't copy into the sink) gets "<ID>-2", "<ID>-3", ...
+# so the two never write into the same .media/<ID> folder.
+import hashlib
+import os
+import threading
+from pathlib import PurePosixPath
+
+from dedupe import content_digest
+from utils import log_warning
+
+ID_SCHEMES = ("path", "content")
+ID_SCHEME = os.environ.get("OHHIMARKITDOWN_ID_SCHEME", "path")
+ID_LENGTH = int(os.environ.get("OHHIMARKITDOWN_ID_LENGTH", "12"))
+MIN_ID_LENGTH = 6
+MAX_ID_LENGTH = 32
+
+
+def _check(scheme: str, length: int):
+    if scheme not in ID_SCHEMES:
+        raise ValueError(f"Unknown ID scheme {scheme!r} (expected one of {', '.join(ID_SCHEMES)})")
+    if not MIN_ID_LENGTH <= length <= MAX_ID_LENGTH:
+        raise ValueError(f"ID length must be between {MIN_ID_LENGTH} and {MAX_ID_LENGTH}, got {length}")
+
+
+def full_hash(source, scheme: str = None, digest: str = None) -> str:
+    """
+    The MAX_ID_LENGTH-character hash an ID is a prefix of. `digest` is the
+    source's dedupe.content_digest when the caller already has it.
+    """
+    scheme = scheme or ID_SCHEME
+    if scheme == "content":
+        return (digest or content_digest(source))[:MAX_ID_LENGTH]
+    path = PurePosixPath(source.relative_path).as_posix()
+    return hashlib.blake2b(path.encode("utf-8"), digest_size=MAX_ID_LENGTH // 2).hexdigest()
+
+
+def document_id(source, scheme: str = None, length: int = None, digest: str = None) -> str:
+    """ID for one SourceFile, without collision checks (see IdRegistry)."""
+    scheme, length = scheme or ID_SCHEME, length or ID_LENGTH
+    _check(scheme, length)
+    return full_hash(source, scheme, digest)[:length]
+
+
+class IdRegistry:
+    """Hands out one run's IDs and resolves the (rare) prefix collisions."""
+
+    def __init__(self, scheme: str = None, length: int = None, log_file=None):
+        self.scheme = scheme or ID_SCHEME
+        self.length = length or ID_LENGTH
+        _check(self.scheme, self.length)
+        self.log_file = log_file
+        self.lock = threading.Lock()
+        self.owners = {}       # ID -> full hash it was cut from
+        self.collisions = 0
+
+    def reserve(self, file_id: str, owner: str):
+        """Mark an ID handed out earlier (e.g. one kept in watch mode's manifest) as taken."""
+        with self.lock:
+            self.owners.setdefault(file_id, owner)
+
+    def release(self, file_id: str):
+        with self.lock:
+            self.owners.pop(file_id, None)
+
+    def assign(self, source, digest: str = None) -> str:
+        full = full_hash(source, self.scheme, digest)
+        # Who an ID belongs to: the path hash is already per document, content isn't
+        owner_key = full if self.scheme == "path" else f"{full} {PurePosixPath(source.relative_path).as_posix()}"
+        with self.lock:
+            for length in range(self.length, MAX_ID_LENGTH + 1):
+                candidate = full[:length]
+                owner = self.owners.setdefault(candidate, owner_key)
+                if owner == owner_key:
+                    # Free, or the same document again
+                    if length > self.length:
+                        self.collisions += 1
+                        if self.log_file:
+                            log_warning(self.log_file, f"ID collision on {full[:self.length]} for {source}; "
+                                                       f"using {candidate}")
+                    return candidate
+                if owner.split(" ", 1)[0] == full:
+                    return self._copy_id(candidate, owner_key)
+        raise ValueError(f"Could not assign a unique ID to {source}")
+
+    def _copy_id(self, base: str, owner_key: str) -> str:
+        # Caller holds the lock. Identical bytes at another path: its own media folder
+        n = 2
+        while self.owners.setdefault(f"{base}-{n}", owner_key) != owner_key:
+            n += 1
+        return f"{base}-{n}"
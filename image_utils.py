@@ -1,8 +1,10 @@
 # image_utils.py
-import os, shutil, re
+import re
 from pathlib import Path
 from PIL import Image
 from utils import log_info, log_warning
+import ledger
+from sinks import media_path, media_link
 
 # Match inline base64 images
 DATA_IMG_RE = re.compile(r'!\[[^\]]*\]\(data:image/[^)]+\)', re.IGNORECASE)
@@ -12,79 +14,87 @@ LOCAL_DOCX_IMG_RE = re.compile(r'!\[[^\]]*\]\(\s*(?:\.?/)?(?:image\d+\.(?:png|jp
     re.IGNORECASE
 )
 
-def save_and_rename_images(src_dir: Path, media_root: Path, uuid: str, md_path: Path, info_log: Path, warn_log: Path):
+# Either of the above, so both are replaced in document order in one pass
+IMAGE_LINK_RE = re.compile(f"{DATA_IMG_RE.pattern}|{LOCAL_DOCX_IMG_RE.pattern}", re.IGNORECASE)
+
+def is_solid_color(src: Path) -> bool:
+    """True for single-colour images (spacers, blank thumbnails), which are not worth keeping."""
+    with Image.open(src) as img:
+        img = img.convert("RGB")
+        width, height = img.size
+    return len(img.getcolors(width * height)) == 1
+
+
+def save_images(files, sink, uuid: str, md_path, info_log: Path, warn_log: Path) -> list:
     """
-    Save images into /media/<UUID>/ with UUID-based filenames.
-    Returns a list of relative paths for Markdown injection.
+    Save each file into /.media/<UUID>/ (through the output sink) as <UUID>-NNN<ext>,
+    numbered in the order given. Returns one entry per file: its link, "" for a
+    skipped solid-colour image, or None if it could not be saved.
     """
-    media_dir = media_root / uuid
-    media_dir.mkdir(parents=True, exist_ok=True)
-
-    rel_paths = []
+    links = []
     counter = 1
 
-    for img_path in sorted(Path(src_dir).iterdir()):
-        src = Path(src_dir) / img_path
+    for src in files:
+        src = Path(src)
         try:
-            with Image.open(src) as img:
-                img = img.convert("RGB")
-                width, height = img.size
-
             # Skip solid-color images
-            if len(img.getcolors(width * height)) == 1:
+            if is_solid_color(src):
                 log_info(info_log, f"Skipped solid color image: {src}")
+                ledger.count("skipped_blank")
+                links.append("")
                 continue
 
             ext = src.suffix or ".jpg"
-            dest = media_dir / f"{uuid}-{counter:03d}{ext}"
-            shutil.move(str(src), dest)
+            name = f"{uuid}-{counter:03d}{ext}"
+            sink.move_file(src, media_path(uuid, name))
 
-            # Correct relative path: media/<UUID>/<UUID>-001.jpg
-            rel_path = f"/.media/{uuid}/{dest.name}"
-            rel_paths.append(rel_path)
+            # Correct relative path: /.media/<UUID>/<UUID>-001.jpg
+            links.append(media_link(uuid, name))
 
-            log_info(info_log, f"Saved image {counter}: {dest}")
+            log_info(info_log, f"Saved image {counter}: {sink.describe(media_path(uuid, name))}")
             counter += 1
 
         except Exception as e:
             log_warning(warn_log, f"{md_path} — error processing image {src}: {e}")
+            links.append(None)
 
-    return rel_paths
+    return links
 
 
-def rewrite_markdown_images(md_path: Path, rel_paths: list, info_log: Path, warn_log: Path):
+def save_and_rename_images(src_dir: Path, sink, uuid: str, md_path, info_log: Path, warn_log: Path):
     """
-    Replace Markdown image links with our saved /media/UUID/... paths.
-    - First pass: inline data:image blobs
-    - Second pass: DOCX-style local filenames (image1.png, image2.jpg)
+    Save every image in src_dir (sorted by name) into /.media/<UUID>/.
+    Returns a list of relative paths for Markdown injection.
     """
-    try:
-        text = Path(md_path).read_text(encoding="utf-8")
-    except Exception as e:
-        log_warning(warn_log, f"{md_path} — could not read for image rewrite: {e}")
-        return
+    files = sorted(Path(src_dir).iterdir())
+    return [link for link in save_images(files, sink, uuid, md_path, info_log, warn_log) if link]
+
 
+def rewrite_markdown_images(text: str, rel_paths: list, md_path, info_log: Path, warn_log: Path) -> str:
+    """
+    Replace the Markdown image links (inline data:image blobs and DOCX-style local
+    filenames such as image1.png), in document order and in a single pass, with
+    rel_paths. An entry of "" drops that image; None, or running out of entries,
+    leaves an [[IMAGE MISSING]] placeholder.
+    """
     idx = 0
+    missing = 0
 
     def repl(_match):
-        nonlocal idx
-        if idx < len(rel_paths):
-            out = f"![]({rel_paths[idx]})"
-            log_info(info_log, f"Injected image link {idx+1}: {rel_paths[idx]}")
-            idx += 1
-            return out
-        else:
-            log_warning(warn_log, f"{md_path} — Not enough extracted images while rewriting")
+        nonlocal idx, missing
+        link = rel_paths[idx] if idx < len(rel_paths) else None
+        idx += 1
+        if link is None:
+            missing += 1
             return "[[IMAGE MISSING]]"
+        return f"![]({link})" if link else ""
 
-    # Pass 1: replace inline base64 images
-    text = DATA_IMG_RE.sub(repl, text)
-
-    # Pass 2: replace DOCX-style image placeholders
-    text = LOCAL_DOCX_IMG_RE.sub(repl, text)
+    text = IMAGE_LINK_RE.sub(repl, text)
 
-    try:
-        Path(md_path).write_text(text, encoding="utf-8")
-        log_info(info_log, f"Completed image injection for: {md_path} (used {idx}/{len(rel_paths)} images)")
-    except Exception as e:
-        log_warning(warn_log, f"{md_path} — failed to write rewritten markdown: {e}")
+    if missing:
+        log_warning(warn_log, f"{md_path} — {missing} image(s) missing while rewriting")
+        ledger.count("missing_images", missing)
+    if idx < len(rel_paths):
+        log_warning(warn_log, f"{md_path} — {len(rel_paths) - idx} extracted image(s) had no link in the Markdown")
+    log_info(info_log, f"Completed image injection for: {md_path} (used {min(idx, len(rel_paths))}/{len(rel_paths)} images)")
+    return text
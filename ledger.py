@@ -0,0 +1,213 @@
+# ledger.py
+# Machine-readable run records next to the free-text logs:
+#   logs/runs/<run id>.jsonl         one JSON object per document
+#   logs/runs/<run id>.summary.json  totals for the run
+#   logs/runs.jsonl                  one summary line per run (throughput over time)
+# Converters report into the current document's DocumentMetrics through the
+# module-level helpers (count, stage), which are no-ops outside a tracked document.
+import json
+import os
+import threading
+import time
+import uuid as uuid_lib
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path, PurePosixPath
+
+from sinks import MEDIA_ROOT
+
+RUNS_DIR = Path("logs") / "runs"
+
+_local = threading.local()
+
+
+class DocumentMetrics:
+    """Everything recorded about one document's conversion."""
+
+    def __init__(self, source: str, relative_path, converter: str = None, bytes_in: int = None):
+        self.source = source
+        self.relative_path = PurePosixPath(relative_path) if relative_path is not None else None
+        self.converter = converter
+        self.uuid = None
+        self.md_path = None
+        self.status = "pending"
+        self.bytes_in = bytes_in
+        self.bytes_out = 0
+        self.images = 0
+        self.skipped_blank = 0
+        self.missing_images = 0
+        self.image_refs = 0
+        self.image_mapping = None
+        self.links_rewritten = 0
+        self.code_blocks = 0
+        self.stages = {}
+        self.errors = []
+        self.started = time.time()
+        self.seconds = 0.0
+        self.written = set()
+        self.duplicate_of = None
+
+    def as_record(self) -> dict:
+        record = {
+            "source": self.source,
+            "relative_path": self.relative_path.as_posix() if self.relative_path is not None else None,
+            "converter": self.converter,
+            "uuid": self.uuid,
+            "md_path": self.md_path.as_posix() if self.md_path is not None else None,
+            "status": self.status,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "images": self.images,
+            "skipped_blank_images": self.skipped_blank,
+            "missing_image_placeholders": self.missing_images,
+            "image_refs": self.image_refs,
+            "links_rewritten": self.links_rewritten,
+            "code_blocks": self.code_blocks,
+            "stages": {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            "seconds": round(self.seconds, 4),
+            "started": datetime.fromtimestamp(self.started, timezone.utc).isoformat(timespec="seconds"),
+            "errors": self.errors,
+        }
+        if self.image_mapping:
+            record["image_mapping"] = self.image_mapping
+        if self.duplicate_of:
+            record["duplicate_of"] = self.duplicate_of
+        return record
+
+
+@contextmanager
+def track_document(metrics: DocumentMetrics):
+    """Make metrics the current document for count()/stage() on this thread."""
+    previous = getattr(_local, "metrics", None)
+    _local.metrics = metrics
+    try:
+        yield metrics
+    finally:
+        _local.metrics = previous
+
+
+def current() -> DocumentMetrics:
+    return getattr(_local, "metrics", None)
+
+
+def count(field: str, amount: int = 1):
+    metrics = current()
+    if metrics is not None:
+        setattr(metrics, field, getattr(metrics, field) + amount)
+
+
+def note(field: str, value):
+    metrics = current()
+    if metrics is not None:
+        setattr(metrics, field, value)
+
+
+@contextmanager
+def stage(name: str):
+    """Add the block's wall time to the current document's stage `name`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = current()
+        if metrics is not None:
+            metrics.stages[name] = metrics.stages.get(name, 0.0) + time.perf_counter() - start
+
+
+class MeteredSink:
+    """Forwards to a sink and records bytes and media files written for one document."""
+
+    def __init__(self, sink, metrics: DocumentMetrics):
+        self._sink = sink
+        self._metrics = metrics
+
+    def _record(self, rel_path, size: int):
+        rel_path = PurePosixPath(rel_path)
+        self._metrics.written.add(rel_path)
+        self._metrics.bytes_out += size
+        if rel_path.parts[:1] == (MEDIA_ROOT,):
+            self._metrics.images += 1
+
+    def write_text(self, rel_path, text: str):
+        self._sink.write_text(rel_path, text)
+        self._record(rel_path, len(text.encode("utf-8")))
+
+    def write_bytes(self, rel_path, data: bytes):
+        self._sink.write_bytes(rel_path, data)
+        self._record(rel_path, len(data))
+
+    def move_file(self, src, rel_path):
+        size = os.path.getsize(src)
+        self._sink.move_file(src, rel_path)
+        self._record(rel_path, size)
+
+    def __getattr__(self, name):
+        return getattr(self._sink, name)
+
+
+class RunLedger:
+    """Appends one JSON line per document; close() writes the run summary."""
+
+    def __init__(self, source_root=None, dest_root=None, runs_dir: Path = RUNS_DIR):
+        self.run_id = datetime.now().strftime("%Y%m%d-%H%M%S-") + uuid_lib.uuid4().hex[:6]
+        self.runs_dir = Path(runs_dir)
+        self.runs_dir.mkdir(parents=True, exist_ok=True)
+        self.path = self.runs_dir / f"{self.run_id}.jsonl"
+        self.source_root = str(source_root) if source_root is not None else None
+        self.dest_root = str(dest_root) if dest_root is not None else None
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.totals = {"documents": 0, "bytes_in": 0, "bytes_out": 0, "images": 0,
+                       "skipped_blank_images": 0, "missing_image_placeholders": 0, "seconds": 0.0}
+        self.by_status = {}
+        self.by_converter = {}
+        self.slowest = []
+
+    def add(self, metrics: DocumentMetrics):
+        record = metrics.as_record()
+        line = json.dumps(record, ensure_ascii=False)
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+            self.totals["documents"] += 1
+            for key in ("bytes_out", "images", "skipped_blank_images", "missing_image_placeholders"):
+                self.totals[key] += record[key]
+            self.totals["bytes_in"] += record["bytes_in"] or 0
+            self.totals["seconds"] += record["seconds"]
+            self.by_status[record["status"]] = self.by_status.get(record["status"], 0) + 1
+            conv = self.by_converter.setdefault(record["converter"] or "unknown", {"documents": 0, "seconds": 0.0})
+            conv["documents"] += 1
+            conv["seconds"] += record["seconds"]
+            self.slowest.append((record["seconds"], record["source"]))
+            self.slowest = sorted(self.slowest, reverse=True)[:10]
+
+    def summary(self) -> dict:
+        elapsed = time.time() - self.started
+        with self.lock:
+            totals = dict(self.totals)
+            return {
+                "run_id": self.run_id,
+                "source_root": self.source_root,
+                "dest_root": self.dest_root,
+                "started": datetime.fromtimestamp(self.started, timezone.utc).isoformat(timespec="seconds"),
+                "elapsed_seconds": round(elapsed, 3),
+                "documents_per_second": round(totals["documents"] / elapsed, 3) if elapsed else None,
+                "mb_in_per_second": round(totals["bytes_in"] / elapsed / (1024 * 1024), 3) if elapsed else None,
+                "totals": {**totals, "seconds": round(totals["seconds"], 3)},
+                "by_status": dict(self.by_status),
+                "by_converter": {name: {"documents": c["documents"], "seconds": round(c["seconds"], 3)}
+                                 for name, c in self.by_converter.items()},
+                "slowest": [{"source": source, "seconds": round(seconds, 3)} for seconds, source in self.slowest],
+                "ledger": str(self.path),
+            }
+
+    def close(self, **extra) -> dict:
+        summary = {**self.summary(), **extra}
+        with self.lock:
+            self.file.close()
+        (self.runs_dir / f"{self.run_id}.summary.json").write_text(
+            json.dumps(summary, indent=2, ensure_ascii=False), encoding="utf-8")
+        with open(self.runs_dir.parent / "runs.jsonl", "a", encoding="utf-8") as index:
+            index.write(json.dumps(summary, ensure_ascii=False) + "\n")
+        return summary
@@ -0,0 +1,179 @@
+# links.py
+# Cross-document links. Word documents link to each other by SharePoint URL,
+# UNC/drive path or bare file name; once converted, those links point nowhere.
+# LinkIndex maps every source document to its output .md (exact relative path, and
+# lowercase file name for URLs and paths from elsewhere), so each link is resolved
+# with dict lookups. LinkRewriter wraps a document's sink and rewrites the links in
+# its Markdown in the one pass that writes it. Rewritten links are root-relative
+# like the /.media/ image links, so copies of a document (dedupe) stay valid.
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+import threading
+from pathlib import PurePosixPath
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+import ledger
+
+# [text](target "title") but not ![image](...); the target may contain spaces
+LINK_RE = re.compile(r'(?<!!)\[((?:[^\[\]]|\[[^\]]*\])*)\]\(\s*<?([^)"<>]*?)>?(\s+"[^"]*")?\s*\)')
+
+# SharePoint web-viewer links carry the file name in a query parameter
+# (…/_layouts/15/Doc.aspx?sourcedoc={guid}&file=Report.docx&action=default)
+FILE_QUERY_KEYS = ("file", "FileName")
+
+# http(s) links are only matched on these hosts: SharePoint Online plus any on-prem
+# hosts listed in OHHIMARKITDOWN_LINK_HOSTS (comma-separated)
+LINK_HOST_SUFFIXES = (".sharepoint.com",) + tuple(
+    host.strip().lower() for host in os.environ.get("OHHIMARKITDOWN_LINK_HOSTS", "").split(",") if host.strip())
+
+
+class LinkIndex:
+    """Source relative path -> output .md path, looked up by path or by file name."""
+
+    def __init__(self, md_path_for, keep=None):
+        self.md_path_for = md_path_for
+        self.keep = keep
+        self.lock = threading.Lock()
+        self.by_path = {}      # lowercase relative path -> md path
+        self.by_name = {}      # lowercase file name -> [relative paths]
+
+    @classmethod
+    def build(cls, paths, md_path_for, keep=None) -> "LinkIndex":
+        index = cls(md_path_for, keep)
+        for rel in paths or ():
+            index.add(rel)
+        return index
+
+    def add(self, relative_path):
+        rel = PurePosixPath(relative_path)
+        key = rel.as_posix().lower()
+        with self.lock:
+            if key in self.by_path:
+                return
+            self.by_path[key] = self.md_path_for(rel)
+            self.by_name.setdefault(rel.name.lower(), []).append(rel)
+
+    def __len__(self):
+        return len(self.by_path)
+
+    def resolve(self, target: str, from_path) -> PurePosixPath:
+        """The .md path a link target refers to, or None if it isn't one of our documents."""
+        relative, path, name = _link_path(target)
+        if not name or (self.keep is not None and not self.keep(PurePosixPath(name))):
+            return None
+        if relative:
+            # Relative to the linking document, as a folder source would have it
+            joined = posixpath.normpath(posixpath.join(PurePosixPath(from_path).parent.as_posix(), path))
+            md = self.by_path.get(joined.lower())
+            if md is not None:
+                return md
+        candidates = self.by_name.get(name.lower(), ())
+        if len(candidates) == 1:
+            return self.by_path[candidates[0].as_posix().lower()]
+        if candidates:
+            # Same name in several folders: take the one sharing the longest path suffix
+            wanted = [part.lower() for part in (path or name).replace("\\", "/").split("/") if part]
+            best, best_score, tied = None, -1, False
+            for rel in candidates:
+                score = _common_suffix(wanted, [part.lower() for part in rel.parts])
+                if score > best_score:
+                    best, best_score, tied = rel, score, False
+                elif score == best_score:
+                    tied = True
+            if not tied:
+                return self.by_path[best.as_posix().lower()]
+        return None
+
+    def rewrite(self, text: str, from_path) -> str:
+        """Point every link to a converted document at its .md, in one pass."""
+        rewritten = 0
+
+        def repl(match):
+            nonlocal rewritten
+            md = self.resolve(match.group(2), from_path)
+            if md is None:
+                return match.group(0)
+            rewritten += 1
+            return f"[{match.group(1)}](/{quote(md.as_posix())}{match.group(3) or ''})"
+
+        text = LINK_RE.sub(repl, text)
+        if rewritten:
+            ledger.count("links_rewritten", rewritten)
+        return text
+
+
+def _common_suffix(a: list, b: list) -> int:
+    n = 0
+    while n < len(a) and n < len(b) and a[-1 - n] == b[-1 - n]:
+        n += 1
+    return n
+
+
+def _link_path(target: str):
+    """
+    (is relative, path, file name) for a link target, or a blank name when it can't
+    be one of our documents. Relative paths are resolved against the linking
+    document; SharePoint URLs, UNC and drive paths by file name and path suffix.
+    """
+    target = target.strip()
+    if not target or target.startswith(("#", "/.media/")):
+        return False, None, None
+    parts = urlsplit(target)
+    if parts.scheme in ("http", "https"):
+        host = (parts.hostname or "").lower()
+        if not any(host == suffix.lstrip(".") or host.endswith(suffix) for suffix in LINK_HOST_SUFFIXES):
+            return False, None, None
+        query = parse_qs(parts.query)
+        for key in FILE_QUERY_KEYS:
+            if query.get(key):
+                name = posixpath.basename(unquote(query[key][0]))
+                return False, name, name
+        path = unquote(parts.path)
+        return False, path, posixpath.basename(path)
+    if parts.scheme == "file" or len(parts.scheme) == 1 or target.startswith("\\\\"):
+        # file:// URLs, C:\... and \\server\share\... paths
+        path = unquote(parts.path if parts.scheme == "file" else target).replace("\\", "/")
+        return False, path, posixpath.basename(path)
+    if parts.scheme or parts.netloc:
+        return False, None, None    # mailto:, tel:, other schemes
+    path = unquote(parts.path).replace("\\", "/")
+    return True, path, posixpath.basename(path)
+
+
+class LinkRewriter:
+    """
+    Forwards to a sink and rewrites cross-document links in one document's Markdown
+    as it is written (write_text, or move_file of a streamed .md, line by line).
+    """
+
+    def __init__(self, sink, index: LinkIndex, md_path, from_path):
+        self._sink = sink
+        self._index = index
+        self._md_path = PurePosixPath(md_path)
+        self._from_path = from_path
+
+    def write_text(self, rel_path, text: str):
+        if PurePosixPath(rel_path) == self._md_path:
+            text = self._index.rewrite(text, self._from_path)
+        self._sink.write_text(rel_path, text)
+
+    def move_file(self, src, rel_path):
+        if PurePosixPath(rel_path) != self._md_path:
+            return self._sink.move_file(src, rel_path)
+        fd, tmp = tempfile.mkstemp(prefix="ohhimarkitdown_links_", suffix=".md")
+        try:
+            with open(src, encoding="utf-8", newline="") as f, \
+                    os.fdopen(fd, "w", encoding="utf-8", newline="") as out:
+                for line in f:
+                    out.write(self._index.rewrite(line, self._from_path) if "](" in line else line)
+            shutil.move(tmp, src)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self._sink.move_file(src, rel_path)
+
+    def __getattr__(self, name):
+        return getattr(self._sink, name)
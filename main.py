@@ -1,8 +1,22 @@
 # main.py
-from pathlib import Path
-from extract_docx import process_docx
-from utils import log_info
-import uuid
+from contextlib import ExitStack, closing
+from pathlib import Path, PurePosixPath
+from extract_pdf import OCR_MODEL
+from converters import converter_for, may_convert
+from sources import SourceFile, list_relative_paths, open_sources
+from sinks import DirectorySink, open_sink
+from scheduler import Scheduler
+from dedupe import DuplicateTracker, hash_sources
+from netio import read_ahead
+from utils import capture_warnings, log_info, log_warning
+import exporter
+import ids
+import ledger
+import links
+import models
+import profiler
+import search
+import time
 
 # Centralize log configuration
 logs_dir = Path("logs")
@@ -10,55 +24,321 @@ conversion_log = logs_dir / "conversion.log"
 image_warnings_log = logs_dir / "image_warnings.log"
 image_processing_log = logs_dir / "image_processing.log"
 
-def convert_all(source_root: Path, dest_root: Path, status_callback=None):
+def convert_all(source_root: Path, dest_root: Path, status_callback=None, sink=None,
+                dedupe: bool = True, link_duplicates: bool = False, adaptive: bool = True,
+                profile: bool = False, profile_keep: int = None, id_scheme: str = None,
+                id_length: int = None, rewrite_links: bool = True, search_index: Path = None):
+    """
+    Convert every supported document under source_root into dest_root.
+    source_root may be a folder or a .zip/.tar export; archive members are read in place.
+    dest_root may be a folder or an archive path (see sinks.open_sink); pass `sink`
+    to write somewhere else entirely. A sink opened here is closed when the run ends.
+    With dedupe, byte-identical copies are converted once and the other copies get
+    a copy (or hard link, with link_duplicates) of the first one's Markdown.
+    adaptive lets the worker count follow CPU, memory and destination pressure.
+    Every run writes a per-document JSON ledger and a summary (see ledger.py).
+    profile writes per-document cProfile stats and collapsed stacks next to the
+    ledger (see profiler.py); profile_keep limits them to the N slowest documents.
+    Document IDs come from each file's relative path (or, with id_scheme="content",
+    its bytes), id_length hex characters long; see ids.py.
+    rewrite_links points links between documents at their converted .md (links.py).
+    search_index names a SQLite full-text index updated as documents are written;
+    on re-runs only changed documents are reindexed (see search.py).
+    """
     logs_dir.mkdir(exist_ok=True)
+    id_registry = ids.IdRegistry(id_scheme, id_length, conversion_log)
+    link_index = None
+    if rewrite_links:
+        # Listed up front so links to documents later in the walk resolve too; TAR
+        # sources can't be listed without reading them, so their index fills as they stream
+        link_index = links.LinkIndex.build(list_relative_paths(source_root, keep=may_convert),
+                                           markdown_path_for, keep=may_convert)
     count = 0
+    run_ledger = ledger.RunLedger(source_root, dest_root)
+    run_profiler = None
+    if profile:
+        run_profiler = profiler.RunProfiler(run_ledger.runs_dir / f"{run_ledger.run_id}.profile",
+                                            keep=profile_keep).start()
+    text_index = search.SearchIndex(search_index, search.index_root(dest_root)) if search_index else None
+    seen_md = set()
 
-    for file in source_root.rglob("*"):
-        # DOCX-only pipeline
-        if file.suffix.lower() != ".docx":
-            continue
+    owns_sink = sink is None
+    if owns_sink:
+        sink = open_sink(dest_root)
+
+    # Load heavy models in the background while the first documents convert
+    if models.has_model(OCR_MODEL):
+        models.warm_up([OCR_MODEL], image_processing_log)
+
+    def should_run():
+        return not (status_callback and status_callback.should_stop())
+
+    tracker = DuplicateTracker() if dedupe else None
+
+    try:
+        # The source stays open until duplicates are handled, which may reread them
+        with open_sources(source_root, keep=may_convert) as sources:
+            # On a network share the next files are copied locally while these convert
+            sources = read_ahead(sources, source_root)
+            futures = []
+            # Content IDs reuse the digest, hashed in parallel ahead of the walk like dedupe's
+            hashed = dedupe or id_registry.scheme == "content"
+            with Scheduler(adaptive=adaptive) as scheduler, \
+                    closing(sources), \
+                    closing(hash_sources(sources) if hashed else ((s, None) for s in sources)) as stream:
+                task_sink = scheduler.controller.timed(sink) if scheduler.controller else sink
+                for source, digest in stream:
+                    converter = converter_for(source)
+                    if converter is None:
+                        source.discard()
+                        continue
+                    if link_index is not None:
+                        link_index.add(source.relative_path)
+                    seen_md.add(markdown_path_for(source.relative_path))
+
+                    if not should_run():
+                        source.discard()
+                        log_info(Path("logs") / "setup.log", "Conversion stopped by user.")
+                        break
+
+                    # Later copies wait for the original and reuse its output
+                    if tracker and not tracker.claim(source, digest):
+                        continue
+
+                    task = (convert_file,) if tracker is None else (tracker.timed, digest, convert_file)
+                    future = scheduler.submit(
+                        converter,
+                        *task,
+                        file_path=source,
+                        file_uuid=id_registry.assign(source, digest),
+                        source_root=source_root,
+                        dest_root=dest_root,
+                        status_callback=status_callback,
+                        sink=task_sink,
+                        conv_log=conversion_log,
+                        warn_log=image_warnings_log,
+                        proc_log=image_processing_log,
+                        converter=converter,
+                        run_ledger=run_ledger,
+                        link_index=link_index,
+                        search_index=text_index,
+                        should_run=should_run,
+                    )
+                    futures.append((source, digest, future))
+
+            outputs = {}
+            for source, digest, future in futures:
+                if future.cancelled():
+                    source.discard()
+                    continue
+                error = future.exception()
+                if error is not None:
+                    log_warning(conversion_log, f"Conversion failed: {source}: {error}")
+                elif future.result():
+                    count += 1
+                    if digest is not None:
+                        outputs[digest] = future.result()
+                else:
+                    source.discard()
+
+            if tracker and tracker.duplicates and should_run():
+                count += _materialize_duplicates(tracker, outputs, sink, source_root, dest_root,
+                                                 status_callback, link_duplicates, should_run, run_ledger,
+                                                 id_registry, link_index, text_index)
+            elif tracker:
+                for source, _ in tracker.duplicates:
+                    source.discard()
+
+            # Only a complete run knows which documents are gone
+            if text_index is not None and should_run():
+                text_index.prune(seen_md)
+    finally:
+        sink_error = None
+        try:
+            if owns_sink:
+                # Waits for writes still queued on the sink's I/O threads
+                sink.close()
+        except Exception as e:
+            sink_error = e
+            log_warning(conversion_log, f"Closing {dest_root} failed: {e}")
+            raise
+        finally:
+            extra = {"id_collisions": id_registry.collisions}
+            if sink_error is not None:
+                extra["sink_error"] = str(sink_error)
+            if text_index is not None:
+                text_index.close(conversion_log)
+                extra["search_index"] = {"path": str(text_index.db_path), "indexed": text_index.indexed,
+                                         "unchanged": text_index.unchanged, "removed": text_index.removed}
+            if run_profiler is not None:
+                extra["profile"] = str(run_profiler.close())
+            summary = run_ledger.close(converted=count, **extra)
+            log_info(conversion_log, f"Run {summary['run_id']}: {summary['totals']['documents']} documents "
+                                     f"({summary['by_status']}) in {summary['elapsed_seconds']}s; "
+                                     f"ledger: {summary['ledger']}")
+
+    return count
 
-        if status_callback and status_callback.should_stop():
-            log_info(Path("logs") / "setup.log", "Conversion stopped by user.")
-            break
-
-        convert_file(
-            file_path=file,
-            source_root=source_root,
-            dest_root=dest_root,
-            status_callback=status_callback,
-            conv_log=conversion_log,
-            warn_log=image_warnings_log,
-            proc_log=image_processing_log,
-        )
+
+def _source_size(source) -> int:
+    if source.size is not None:
+        return source.size
+    try:
+        return source.path.stat().st_size
+    except (AttributeError, OSError):
+        return 0
+
+
+def _materialize_duplicates(tracker, outputs, sink, source_root, dest_root, status_callback,
+                            link, should_run, run_ledger=None, id_registry=None, link_index=None,
+                            search_index=None) -> int:
+    """Give each duplicate its original's Markdown; convert the rest normally. Returns files written."""
+    count = 0
+    bytes_saved = 0
+    materialized = []
+    fallback = []
+    for source, digest in tracker.duplicates:
+        original = outputs.get(digest)
+        md_path = markdown_path_for(source.relative_path)
+        if original is None:
+            fallback.append((source, digest))
+            continue
+        file_uuid, original_md = original
+        if original_md != md_path and not _copy_output(sink, original_md, md_path, link):
+            fallback.append((source, digest))
+            continue
+        log_info(conversion_log, f"[{file_uuid}] Duplicate of {tracker.originals[digest]}: "
+                                 f"{source} -> {sink.describe(md_path)}")
+        if search_index is not None and original_md != md_path:
+            search_index.copy(original_md, md_path, source.relative_path)
+        source.discard()
+        materialized.append(digest)
+        bytes_saved += _source_size(source)
         count += 1
+        if run_ledger is not None:
+            metrics = ledger.DocumentMetrics(str(source), source.relative_path, converter_for(source).name,
+                                             bytes_in=_source_size(source))
+            metrics.uuid, metrics.md_path = file_uuid, md_path
+            metrics.status = "duplicate"
+            metrics.duplicate_of = str(tracker.originals[digest])
+            run_ledger.add(metrics)
+            exporter.observe_document(metrics)
+
+    # The sink can't copy (ZIP) or the original failed: convert these the usual way
+    if fallback:
+        with Scheduler() as scheduler:
+            futures = []
+            for source, digest in fallback:
+                converter = converter_for(source)
+                futures.append((source, scheduler.submit(
+                    converter, convert_file, source, source_root, dest_root, status_callback,
+                    conversion_log, image_warnings_log, image_processing_log,
+                    converter=converter, sink=sink, run_ledger=run_ledger, link_index=link_index,
+                    search_index=search_index, should_run=should_run,
+                    file_uuid=id_registry.assign(source, digest) if id_registry else None)))
+        for source, future in futures:
+            error = None if future.cancelled() else future.exception()
+            if error is not None:
+                log_warning(conversion_log, f"Conversion failed: {source}: {error}")
+            elif not future.cancelled() and future.result():
+                count += 1
+            source.discard()
 
+    log_info(conversion_log, tracker.summary(materialized, bytes_saved))
     return count
 
 
+def _copy_output(sink, src_md, dst_md, link: bool) -> bool:
+    """Copy a converted .md through the sink and wait for it; False means convert instead."""
+    try:
+        if not sink.copy_file(src_md, dst_md, link=link):
+            return False
+        sink.flush([dst_md])
+        return True
+    except OSError as e:
+        log_warning(conversion_log, f"Copying {sink.describe(src_md)} to {sink.describe(dst_md)} failed: {e}")
+        return False
+
+
+def markdown_path_for(relative_path) -> PurePosixPath:
+    """Sink path of the .md for a source file's path relative to the source root."""
+    relative_path = PurePosixPath(relative_path)
+    base_name = relative_path.stem.lower().replace(" ", "-")
+    return relative_path.parent / f"{base_name}.md"
+
+
 def convert_file(file_path: Path, source_root: Path, dest_root: Path, status_callback,
-                 conv_log: Path, warn_log: Path, proc_log: Path):
+                 conv_log: Path, warn_log: Path, proc_log: Path, converter=None, sink=None,
+                 file_uuid: str = None, run_ledger=None, metrics=None, link_index=None,
+                 search_index=None):
+    """
+    Convert one document. Pass file_uuid to reuse an existing document's UUID.
+    Returns (file_uuid, md_path) with md_path relative to dest_root, or None if skipped
+    or failed (converters that log their own failure and write nothing count as failed).
+    The document's ledger.DocumentMetrics go to run_ledger (if given) and fill
+    `metrics` when the caller passes one in. With a links.LinkIndex, links to other
+    documents are rewritten as the Markdown is written; with a search.SearchIndex,
+    the Markdown is indexed on its way to the sink.
+    """
+
+    # file_path is a Path under source_root, or a SourceFile (e.g. an archive member)
+    source = file_path if isinstance(file_path, SourceFile) else SourceFile.from_path(file_path, source_root)
 
-    # Recreate folder structure
-    relative_path = file_path.parent.relative_to(source_root)
-    dest_dir = dest_root / relative_path
-    dest_dir.mkdir(parents=True, exist_ok=True)
+    converter = converter or converter_for(source)
+    if converter is None:
+        log_warning(conv_log, f"No converter for: {source}")
+        source.discard()
+        return None
 
-    # Markdown output path
-    base_name = file_path.stem.lower().replace(" ", "-")
-    md_path = dest_dir / f"{base_name}.md"
+    sink = sink or DirectorySink(dest_root)
 
-    # UUID for this DOCX
-    file_uuid = uuid.uuid4().hex[:6].lower()
+    # Markdown output path; recreates the folder structure (sink paths are relative to dest_root)
+    md_path = markdown_path_for(source.relative_path)
 
-    # /media/<UUID>
-    media_dir = dest_root / ".media" / file_uuid
+    # ID for this document (see ids.py); images go to /.media/<UUID>
+    file_uuid = file_uuid or ids.document_id(source)
 
     if status_callback:
-        status_callback.set(f"Converting: {file_path.name}")
+        status_callback.set(f"Converting: {source.name}")
+
+    if metrics is None:
+        metrics = ledger.DocumentMetrics(str(source), source.relative_path)
+    metrics.converter = converter.name
+    metrics.bytes_in = _source_size(source)
+    metrics.uuid, metrics.md_path = file_uuid, md_path
+    start = time.perf_counter()
 
-    # DOCX-only
-    process_docx(file_path, media_dir, file_uuid, md_path, warn_log, proc_log)
+    with ledger.track_document(metrics), capture_warnings() as warnings:
+        try:
+            with ExitStack() as stack:
+                stack.enter_context(profiler.document(str(source)))
+                # Archive members are spooled to a temp file here
+                with ledger.stage("fetch"):
+                    local_path = stack.enter_context(source.local_path())
+                doc_sink = ledger.MeteredSink(sink, metrics)
+                if search_index is not None:
+                    doc_sink = search_index.sink(doc_sink, md_path, source.relative_path, file_uuid)
+                if link_index is not None:
+                    doc_sink = links.LinkRewriter(doc_sink, link_index, md_path, source.relative_path)
+                converter.handler(local_path, doc_sink, file_uuid, md_path, warn_log, proc_log)
+                # Write-behind sinks: not done (or ok) until its files are on disk
+                with ledger.stage("flush"):
+                    sink.flush(metrics.written)
+        except Exception as e:
+            metrics.errors.append(str(e))
+            metrics.status = "failed"
+            raise
+        finally:
+            metrics.seconds = time.perf_counter() - start
+            metrics.errors.extend(warnings)
+            if metrics.status == "pending":
+                # Converters log their own failures and return without writing
+                metrics.status = "ok" if md_path in metrics.written else "failed"
+            if run_ledger is not None:
+                run_ledger.add(metrics)
+            exporter.observe_document(metrics)
 
-    log_info(conv_log, f"[{file_uuid}] Converted: {file_path} -> {md_path}")
\ No newline at end of file
+    if metrics.status != "ok":
+        return None
+    log_info(conv_log, f"[{file_uuid}] Converted: {source} -> {sink.describe(md_path)}")
+    return file_uuid, md_path
\ No newline at end of file
@@ -0,0 +1,178 @@
+# models.py
+# Registry for heavy ML models (OCR for scanned PDF pages). CPU-only.
+# - Each model is loaded at most once per process and then shared read-only
+# - preload_models() before a pool forks lets workers share weights copy-on-write
+# - warm_up() loads in a background thread so loading never lands on a document
+# - PageBatcher groups per-page requests made in this process into one inference
+#   call; in practice a batch holds one page range's pages, plus pages from other
+#   documents converting on other threads within the fill window
+
+import importlib
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from utils import log_info, log_warning
+
+# "package.module:factory" returning a callable(list[bytes PNG]) -> list[str]
+OCR_MODEL_ENV = "OHHIMARKITDOWN_OCR_MODEL"
+
+_loaders = {}
+_models = {}
+_loading = {}
+_batchers = {}
+_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    # Loaded models survive a fork (copy-on-write); threads and locks do not
+    global _lock
+    _lock = threading.Lock()
+    _loading.clear()
+    _batchers.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def register_model(name: str, loader):
+    """Register a zero-argument loader. Nothing is loaded until first use or warm-up."""
+    with _lock:
+        _loaders[name] = loader
+
+
+def has_model(name: str) -> bool:
+    return name in _loaders
+
+
+def get_model(name: str):
+    """Return the process-wide instance, loading it (once) if needed."""
+    with _lock:
+        if name in _models:
+            return _models[name]
+        if name not in _loaders:
+            raise KeyError(f"No model registered as '{name}'")
+        event = _loading.get(name)
+        owner = event is None
+        if owner:
+            event = _loading[name] = threading.Event()
+
+    if not owner:
+        # Someone else (usually warm-up) is loading it; wait instead of loading twice
+        event.wait()
+        with _lock:
+            if name in _models:
+                return _models[name]
+        raise RuntimeError(f"Model '{name}' failed to load")
+
+    try:
+        model = _loaders[name]()
+        with _lock:
+            _models[name] = model
+        return model
+    finally:
+        with _lock:
+            del _loading[name]
+        event.set()
+
+
+def preload_models(names=None, log_file=None):
+    """Load synchronously. Call in the parent before a fork-based pool starts."""
+    for name in names if names is not None else list(_loaders):
+        try:
+            get_model(name)
+            if log_file:
+                log_info(log_file, f"Model loaded: {name} (pid {os.getpid()})")
+        except Exception as e:
+            if log_file:
+                log_warning(log_file, f"Model '{name}' failed to load: {e}")
+
+
+def warm_up(names=None, log_file=None) -> threading.Thread:
+    """Load models in a background thread; get_model() blocks only if still loading."""
+    thread = threading.Thread(target=preload_models, args=(names, log_file),
+                              name="model-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def worker_initializer(names=None, log_file=None):
+    """ProcessPoolExecutor initializer: warm up in each worker as soon as it starts."""
+    warm_up(names, log_file)
+
+
+class PageBatcher:
+    """
+    Collects per-page inference requests and runs them through the model in batches.
+    submit() returns a Future. Batches are per process: requests from other threads
+    share one only if they arrive within max_wait of each other.
+    """
+
+    def __init__(self, model_name: str, max_batch: int = 16, max_wait: float = 0.05):
+        self.model_name = model_name
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._pending = []
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=f"batcher-{model_name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, item) -> Future:
+        future = Future()
+        with self._cond:
+            self._pending.append((item, future))
+            self._cond.notify()
+        return future
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            # Give concurrent documents a moment to fill the batch
+            deadline = time.monotonic() + self.max_wait
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                results = list(get_model(self.model_name)([item for item, _ in batch]))
+                if len(results) != len(batch):
+                    # zip() would leave the extra requests waiting forever
+                    raise RuntimeError(f"Model '{self.model_name}' returned {len(results)} results "
+                                       f"for {len(batch)} inputs")
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+
+def get_batcher(name: str) -> PageBatcher:
+    with _lock:
+        if name not in _batchers:
+            _batchers[name] = PageBatcher(name)
+        return _batchers[name]
+
+
+# ---------------------------------------------------------------------------
+# Built-in loaders
+# ---------------------------------------------------------------------------
+
+def _load_ocr_from_env():
+    module_name, _, factory = os.environ[OCR_MODEL_ENV].partition(":")
+    return getattr(importlib.import_module(module_name), factory or "load")()
+
+
+if os.environ.get(OCR_MODEL_ENV):
+    register_model("ocr", _load_ocr_from_env)
@@ -0,0 +1,222 @@
+# netio.py
+# Hides filesystem latency on network shares (SMB/NFS), where every stat, open and
+# mkdir is a round trip, so converter threads never wait on one:
+# - DirCache:    folders already created this run; each mkdir happens once
+# - WriteBehind: DirectorySink writes run on I/O threads while the converter moves on;
+#                writes to the same path stay in order; flush() waits for one
+#                document's paths (and raises its failures) before it counts as done
+# - read_ahead:  upcoming folder sources on a network share are copied to local temp
+#                files on I/O threads while earlier documents convert
+# I/O threads: OHHIMARKITDOWN_IO_WORKERS (default 8, 0 = write synchronously).
+# Read-ahead: OHHIMARKITDOWN_READ_AHEAD = auto (network sources only, default), 1 or 0.
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+from pathlib import Path
+
+IO_WORKERS = int(os.environ.get("OHHIMARKITDOWN_IO_WORKERS", "8"))
+READ_AHEAD = os.environ.get("OHHIMARKITDOWN_READ_AHEAD", "auto").lower()
+
+# Writes queued but not yet done; bounds the Markdown held in memory and lets slow
+# shares push back on the converters (and the adaptive controller) as before
+WRITE_QUEUE = 64
+
+# Sources copied ahead of the one being handed out, and the largest file worth copying
+READ_AHEAD_FILES = 16
+READ_AHEAD_MAX_BYTES = 256 * 1024 * 1024
+COPY_CHUNK = 1024 * 1024
+
+NETWORK_FS_TYPES = {"cifs", "smb3", "smbfs", "nfs", "nfs4", "afpfs", "fuse.sshfs", "9p", "davfs", "fuse.rclone"}
+
+
+def is_network_path(path) -> bool:
+    """Best effort: is path on an SMB/NFS share? (UNC/mapped drive on Windows, /proc/mounts on Linux)"""
+    path = os.path.abspath(path)
+    if sys.platform == "win32":
+        if path.startswith("\\\\"):
+            return True
+        try:
+            import ctypes
+            return ctypes.windll.kernel32.GetDriveTypeW(os.path.splitdrive(path)[0] + "\\") == 4  # DRIVE_REMOTE
+        except (AttributeError, OSError):
+            return False
+    try:
+        with open("/proc/mounts", encoding="utf-8") as f:
+            mounts = [line.split()[1:3] for line in f if len(line.split()) > 2]
+    except OSError:
+        return False
+    best, fs_type = "", None
+    for mount_point, kind in mounts:
+        mount_point = mount_point.replace("\\040", " ")
+        if (path == mount_point or path.startswith(mount_point.rstrip("/") + "/")) and len(mount_point) > len(best):
+            best, fs_type = mount_point, kind
+    return fs_type in NETWORK_FS_TYPES
+
+
+class DirCache:
+    """Folders known to exist. ensure() is free after the first call for a folder."""
+
+    def __init__(self):
+        self.known = set()
+        self.lock = threading.Lock()
+
+    def ensure(self, path: Path):
+        if path in self.known:
+            return
+        path.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            self.known.update((path, *path.parents))
+
+    def forget(self, path: Path):
+        """Someone removed it (e.g. watch deleting a document's media folder)."""
+        with self.lock:
+            self.known.discard(path)
+
+
+class WriteBehind:
+    """
+    Runs writes on I/O threads. A path's failure is raised by wait()/flush() for that
+    path; close() raises the failures nobody flushed.
+    """
+
+    def __init__(self, workers: int = IO_WORKERS, queue: int = WRITE_QUEUE):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="io")
+        self.slots = threading.BoundedSemaphore(queue)
+        self.lock = threading.Lock()
+        self.pending = {}       # key -> future of its latest write
+        self.failed = {}        # key -> error of its latest write, until flushed
+
+    def submit(self, key, fn, *args):
+        """Queue fn(*args) after any earlier write to the same key; returns its Future."""
+        self.slots.acquire()
+        with self.lock:
+            previous = self.pending.get(key)
+            future = self.pool.submit(self._run, key, previous, fn, args)
+            self.pending[key] = future
+        future.add_done_callback(lambda done: self._forget(key, done))
+        return future
+
+    def _run(self, key, previous, fn, args):
+        try:
+            if previous is not None:
+                # Submitted earlier to a FIFO pool, so it is running or done
+                wait_futures([previous])
+            fn(*args)
+        except Exception as e:
+            with self.lock:
+                self.failed[key] = e
+        else:
+            # The path now holds this write, whatever happened to earlier ones
+            with self.lock:
+                self.failed.pop(key, None)
+        finally:
+            self.slots.release()
+
+    def _forget(self, key, future):
+        with self.lock:
+            if self.pending.get(key) is future:
+                del self.pending[key]
+
+    def wait(self, key):
+        """Block until the writes queued for key are done; raise if the last one failed."""
+        with self.lock:
+            future = self.pending.get(key)
+        if future is not None:
+            wait_futures([future])
+        with self.lock:
+            error = self.failed.get(key)
+        if error is not None:
+            raise error
+
+    def flush(self, keys):
+        """wait() for every key. Failures raised here are not raised again by close()."""
+        errors = []
+        for key in keys:
+            try:
+                self.wait(key)
+            except Exception as e:
+                errors.append((key, e))
+            with self.lock:
+                self.failed.pop(key, None)
+        _raise_failed(errors)
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        with self.lock:
+            errors = list(self.failed.items())
+            self.failed.clear()
+        _raise_failed(errors)
+
+
+def _raise_failed(errors: list):
+    if errors:
+        key, error = errors[0]
+        raise OSError(f"{len(errors)} write(s) failed; first: {key}: {error}") from error
+
+
+def _spool(source) -> tuple:
+    """Copy a source to a local temp file; (temp path, size) or None when not worth it."""
+    size = os.stat(source.path).st_size
+    if size > READ_AHEAD_MAX_BYTES:
+        return None
+    fd, tmp = tempfile.mkstemp(prefix="ohhimarkitdown_ahead_", suffix=source.suffix)
+    try:
+        with os.fdopen(fd, "wb") as out, open(source.path, "rb") as src:
+            shutil.copyfileobj(src, out, COPY_CHUNK)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return Path(tmp), size
+
+
+def read_ahead(sources, source_root, workers: int = IO_WORKERS, ahead: int = READ_AHEAD_FILES):
+    """
+    Yield sources in order while copying the next `ahead` folder sources to local
+    temp files. A copied source reads from the local file (removed by discard()).
+    Passes sources through untouched when read-ahead is off or not needed.
+    """
+    enabled = READ_AHEAD in ("1", "true", "yes", "on") or (
+        READ_AHEAD == "auto" and not os.path.isfile(source_root) and is_network_path(source_root))
+    if not enabled or workers < 1:
+        yield from sources
+        return
+
+    def result(item):
+        source, future = item
+        if future is None:
+            return source
+        try:
+            spooled = future.result()
+        except OSError:
+            spooled = None  # the converter will report it when it reads the file itself
+        if spooled is not None:
+            source.path, source.size = spooled
+            source.temporary = True
+        return source
+
+    window = deque()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="read-ahead") as pool:
+        try:
+            for source in sources:
+                if source.path is None or source.temporary:
+                    window.append((source, None))
+                else:
+                    window.append((source, pool.submit(_spool, source)))
+                while len(window) > ahead or (window and window[0][1] is None):
+                    yield result(window.popleft())
+            while window:
+                yield result(window.popleft())
+        finally:
+            # Consumer stopped early: drop copies nobody will convert
+            for source, future in window:
+                if future is not None and not future.cancel():
+                    try:
+                        spooled = future.result()
+                    except OSError:
+                        spooled = None
+                    if spooled is not None:
+                        os.unlink(spooled[0])
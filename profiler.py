@@ -0,0 +1,274 @@
+# profiler.py
+# Per-document profiling for `cli.py convert --profile`:
+# - cProfile for each document on its worker thread -> <n>-<name>.pstats
+# - a sampling thread (like py-spy, 100 Hz) that reads every converting thread's
+#   stack and writes Brendan Gregg collapsed stacks -> <n>-<name>.collapsed
+#   (feed to flamegraph.pl, speedscope or inferno)
+# - work sent to the PDF process pool goes through submit(), which profiles and
+#   samples inside the worker process and merges the result into the document
+# Files go to logs/runs/<run id>.profile/ next to the run ledger, with run.pstats /
+# run.collapsed for the whole run and index.json listing documents by time.
+# Keep only the N slowest documents with keep=N. One RunProfiler is active at a time.
+import cProfile
+import heapq
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from contextlib import contextmanager
+from pathlib import Path
+
+SAMPLE_INTERVAL = 0.01
+
+_active = None
+_local = threading.local()
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame) -> str:
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class _Sampler:
+    """Samples the stacks of registered threads every `interval` seconds."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.threads = {}          # thread ident -> Counter of collapsed stacks
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def watch(self, ident: int, stacks: Counter):
+        with self.lock:
+            self.threads[ident] = stacks
+
+    def unwatch(self, ident: int):
+        with self.lock:
+            self.threads.pop(ident, None)
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            # Hold the lock while counting so unwatch() returns a finished Counter
+            with self.lock:
+                if not self.threads:
+                    continue
+                frames = sys._current_frames()
+                for ident, stacks in self.threads.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        stacks[_collapse(frame)] += 1
+                del frames
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread.is_alive():
+            self.thread.join()
+
+
+class _LoadedStats:
+    """Lets pstats.Stats.add() take a raw stats dict from a worker process."""
+
+    def __init__(self, stats: dict):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class DocumentProfile:
+
+    def __init__(self, source: str):
+        self.source = source
+        self.seconds = 0.0
+        self.stats = None
+        self.stacks = Counter()
+        self.lock = threading.Lock()
+
+    def add_stats(self, stats):
+        with self.lock:
+            if self.stats is None:
+                self.stats = pstats.Stats(stats)
+            else:
+                self.stats.add(stats)
+
+    def merge(self, stats: dict, stacks: dict):
+        """Fold in what a pool worker recorded for this document."""
+        if stats:
+            self.add_stats(_LoadedStats(stats))
+        with self.lock:
+            self.stacks.update(stacks)
+
+
+class RunProfiler:
+
+    def __init__(self, out_dir, keep: int = None, interval: float = SAMPLE_INTERVAL):
+        self.out_dir = Path(out_dir)
+        self.keep = keep
+        self.interval = interval
+        self.sampler = _Sampler(interval)
+        self.lock = threading.Lock()
+        self.kept = []             # keep=N: heap of (seconds, seq, DocumentProfile)
+        self.index = []            # files written so far
+        self.documents = 0
+        self.run_stats = None
+        self.run_stacks = Counter()
+        self.seq = 0
+
+    def start(self):
+        global _active
+        self.sampler.start()
+        _active = self
+        return self
+
+    @contextmanager
+    def document(self, source: str):
+        profile = DocumentProfile(source)
+        previous = getattr(_local, "profile", None)
+        _local.profile = profile
+        ident = threading.get_ident()
+        cprofile = cProfile.Profile()
+        try:
+            # Python 3.12+ allows one cProfile per process; other threads fall back to sampling
+            cprofile.enable()
+        except ValueError:
+            cprofile = None
+        self.sampler.watch(ident, profile.stacks)
+        start = time.perf_counter()
+        try:
+            yield profile
+        finally:
+            profile.seconds = time.perf_counter() - start
+            self.sampler.unwatch(ident)
+            if cprofile is not None:
+                cprofile.disable()
+                profile.add_stats(cprofile)
+            _local.profile = previous
+            self._finish(profile)
+
+    def _finish(self, profile: DocumentProfile):
+        with self.lock:
+            self.seq += 1
+            self.documents += 1
+            if profile.stats is not None:
+                if self.run_stats is None:
+                    self.run_stats = pstats.Stats(_LoadedStats(profile.stats.stats))
+                else:
+                    self.run_stats.add(_LoadedStats(profile.stats.stats))
+            self.run_stacks.update(profile.stacks)
+            if self.keep is None:
+                # Whole run: write as we go rather than holding every profile in memory
+                self.index.append(self._write(profile, f"{self.seq:05d}"))
+            else:
+                heapq.heappush(self.kept, (profile.seconds, self.seq, profile))
+                if len(self.kept) > self.keep:
+                    heapq.heappop(self.kept)
+
+    def _write(self, profile: DocumentProfile, prefix: str) -> dict:
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        stem = f"{prefix}-{_safe_name(profile.source)}"
+        entry = {"source": profile.source, "seconds": round(profile.seconds, 4)}
+        if profile.stats is not None:
+            profile.stats.dump_stats(self.out_dir / f"{stem}.pstats")
+            entry["pstats"] = f"{stem}.pstats"
+        _write_collapsed(self.out_dir / f"{stem}.collapsed", profile.stacks)
+        entry["collapsed"] = f"{stem}.collapsed"
+        return entry
+
+    def close(self) -> Path:
+        """Stop sampling and write the remaining profiles. Returns the output folder."""
+        global _active
+        if _active is self:
+            _active = None
+        self.sampler.stop()
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        ranked = sorted(self.kept, key=lambda item: item[0], reverse=True)
+        for rank, (_, _, profile) in enumerate(ranked, 1):
+            self.index.append(self._write(profile, f"slowest-{rank:03d}"))
+        if self.run_stats is not None:
+            self.run_stats.dump_stats(self.out_dir / "run.pstats")
+        _write_collapsed(self.out_dir / "run.collapsed", self.run_stacks)
+        (self.out_dir / "index.json").write_text(json.dumps({
+            "documents": self.documents,
+            "profiles": sorted(self.index, key=lambda entry: entry["seconds"], reverse=True),
+            "sample_interval": self.interval,
+        }, indent=2, ensure_ascii=False), encoding="utf-8")
+        return self.out_dir
+
+
+def _safe_name(source: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", Path(source).name)[:80] or "document"
+
+
+def _write_collapsed(path: Path, stacks: Counter):
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def document(source: str):
+    """Profile the block as one document when a RunProfiler is active; otherwise a no-op."""
+    profiler = _active
+    if profiler is None:
+        yield None
+        return
+    with profiler.document(source) as profile:
+        yield profile
+
+
+# -- process pool workers ------------------------------------------------------
+
+def _profiled_call(fn, interval: float, args: tuple):
+    """Runs in the worker process: call fn under cProfile and the sampler."""
+    cprofile = cProfile.Profile()
+    stacks = Counter()
+    sampler = _Sampler(interval).start()
+    sampler.watch(threading.get_ident(), stacks)
+    cprofile.enable()
+    try:
+        result = fn(*args)
+    finally:
+        cprofile.disable()
+        sampler.stop()
+    cprofile.create_stats()
+    return result, cprofile.stats, dict(stacks)
+
+
+def submit(pool, fn, *args) -> Future:
+    """pool.submit(fn, *args), profiled in the worker when this thread is profiling a document."""
+    profile = getattr(_local, "profile", None)
+    if profile is None or _active is None:
+        return pool.submit(fn, *args)
+    inner = pool.submit(_profiled_call, fn, _active.interval, args)
+    outer = Future()
+    outer.set_running_or_notify_cancel()
+
+    def done(future):
+        try:
+            result, stats, stacks = future.result()
+        except BaseException as e:
+            outer.set_exception(e)
+            return
+        profile.merge(stats, stacks)
+        outer.set_result(result)
+
+    inner.add_done_callback(done)
+    return outer
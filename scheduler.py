@@ -0,0 +1,181 @@
+# scheduler.py
+# Runs conversions in two lanes: a wide lane for cheap formats and a narrow lane
+# for expensive ones, so a batch of huge PDFs can't starve the DOCX backlog.
+# Each converter's own concurrency limit is enforced on top of its lane: a task
+# whose converter is at its limit waits in that converter's queue without holding
+# a lane thread, and is run by the task that frees the slot.
+# With adaptive=True a ConcurrencyController (adaptive.py) resizes the lanes
+# between LANE_WORKERS_MIN and LANE_WORKERS_MAX while the run is going.
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import exporter
+from converters import CHEAP, EXPENSIVE
+
+LANE_WORKERS = {
+    CHEAP: 8,
+    EXPENSIVE: 2,
+}
+
+LANE_WORKERS_MIN = {
+    CHEAP: 1,
+    EXPENSIVE: 1,
+}
+
+LANE_WORKERS_MAX = {
+    CHEAP: max(LANE_WORKERS[CHEAP], min(32, (os.cpu_count() or 1) * 4)),
+    EXPENSIVE: max(LANE_WORKERS[EXPENSIVE], min(8, os.cpu_count() or 1)),
+}
+
+# submit() blocks once this many tasks are queued or running, so walking a huge
+# tree (or spooling a TAR) never runs far ahead of the workers
+MAX_PENDING = 256
+
+
+class LaneLimit:
+    """A semaphore whose capacity can be changed while tasks hold it."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.active = 0
+        self.waiting = 0
+        self.cond = threading.Condition()
+
+    def __enter__(self):
+        with self.cond:
+            self.waiting += 1
+            while self.active >= self.capacity:
+                self.cond.wait()
+            self.waiting -= 1
+            self.active += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        with self.cond:
+            self.active -= 1
+            self.cond.notify()
+
+    def resize(self, capacity: int):
+        with self.cond:
+            self.capacity = capacity
+            self.cond.notify_all()
+
+
+class Scheduler:
+
+    def __init__(self, lane_workers=None, max_pending: int = MAX_PENDING, adaptive: bool = False):
+        lane_workers = lane_workers or LANE_WORKERS
+        self.pending = threading.BoundedSemaphore(max_pending)
+        # Threads for the most a lane may grow to; LaneLimit decides how many actually run
+        self.limits = {lane: LaneLimit(workers) for lane, workers in lane_workers.items()}
+        self.lanes = {
+            lane: ThreadPoolExecutor(
+                max_workers=max(workers, LANE_WORKERS_MAX.get(lane, workers)) if adaptive else workers,
+                thread_name_prefix=f"{lane}-lane")
+            for lane, workers in lane_workers.items()
+        }
+        # Tasks submitted to each lane that have not started yet (exported as queue depth)
+        self.queued = {lane: 0 for lane in lane_workers}
+        self.queued_lock = threading.Lock()
+        # converter -> tasks waiting for one of its slots; a slot is only released
+        # while holding slots_lock and with nothing waiting for it
+        self.waiting = {}
+        self.slots_lock = threading.Lock()
+        self.controller = None
+        exporter.track_scheduler(self)
+        if adaptive:
+            from adaptive import ConcurrencyController
+            self.controller = ConcurrencyController(self)
+            self.controller.start()
+
+    def submit(self, converter, fn, /, *args, should_run=None, **kwargs):
+        """
+        Queue fn on the converter's lane; the future resolves to fn's result.
+        should_run() is checked again when the task starts, so queued work is
+        dropped (result None) once a stop is requested.
+        """
+        cost = converter.cost if converter.cost in self.lanes else EXPENSIVE
+        limit = self.limits[cost]
+        future = Future()
+
+        def run():
+            # Holds one of converter.slots, or future was cancelled
+            with self.queued_lock:
+                self.queued[cost] -= 1
+            try:
+                if not future.set_running_or_notify_cancel():
+                    return
+                try:
+                    if should_run is not None and not should_run():
+                        future.set_result(None)
+                    else:
+                        with limit:
+                            future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+            finally:
+                self.pending.release()
+
+        def start():
+            with self.slots_lock:
+                if not converter.slots.acquire(blocking=False):
+                    self.waiting.setdefault(converter, deque()).append((future, run))
+                    return
+            task = run
+            while task is not None:
+                task()
+                task = self._hand_over(converter)
+
+        def lane_done(lane_future):
+            if lane_future.cancelled():
+                # Lane shut down before start() ran
+                future.cancel()
+                run()
+
+        lane = self.lanes[cost]
+        self.pending.acquire()
+        with self.queued_lock:
+            self.queued[cost] += 1
+        try:
+            lane.submit(start).add_done_callback(lane_done)
+        except BaseException:
+            with self.queued_lock:
+                self.queued[cost] -= 1
+            self.pending.release()
+            raise
+        return future
+
+    def _hand_over(self, converter):
+        """Pass a finished task's converter slot to the next waiting task, or release it."""
+        with self.slots_lock:
+            waiting = self.waiting.get(converter)
+            if waiting:
+                return waiting.popleft()[1]
+            converter.slots.release()
+            return None
+
+    def shutdown(self, cancel_pending: bool = False):
+        if cancel_pending:
+            with self.slots_lock:
+                waiting = [task for tasks in self.waiting.values() for task in tasks]
+                self.waiting.clear()
+            for future, run in waiting:
+                future.cancel()
+                run()
+        # Waiting tasks still queued run on the threads that hand them their slot
+        for lane in self.lanes.values():
+            lane.shutdown(wait=True, cancel_futures=cancel_pending)
+        # Cancelled tasks never started
+        with self.queued_lock:
+            self.queued = {lane: 0 for lane in self.queued}
+        exporter.untrack_scheduler(self)
+        if self.controller is not None:
+            self.controller.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown(cancel_pending=exc_type is not None)
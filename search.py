@@ -0,0 +1,248 @@
+# search.py
+# Full-text search over the converted Markdown, built as documents are written
+# rather than by re-reading the output afterwards. One SQLite database:
+#   documents  root (the destination written to), md_path, source_path, uuid and a
+#              digest of the indexed Markdown; docs.rowid = documents.id
+#   docs       FTS5 table: title, headings, body, source_path (uuid, md_path unindexed)
+# e.g.  SELECT md_path, snippet(docs, 2, '[', ']', '…', 12) FROM docs
+#       WHERE docs MATCH 'headings:budget AND travel' ORDER BY rank
+# SearchIndex.sink() wraps one document's sink and indexes its .md on the way
+# through. On re-runs a document whose Markdown hasn't changed is left alone, and
+# prune() drops documents whose source has gone. Several destinations can share
+# one database: an index only reads, replaces and prunes its own root's documents.
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path, PurePosixPath
+
+from utils import log_info
+
+# Commit after this many changed documents or seconds, whichever comes first
+COMMIT_DOCUMENTS = 500
+COMMIT_SECONDS = 5.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    root TEXT NOT NULL,
+    md_path TEXT NOT NULL,
+    source_path TEXT,
+    uuid TEXT,
+    digest TEXT NOT NULL,
+    indexed_at REAL NOT NULL,
+    UNIQUE (root, md_path)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS docs USING fts5(
+    title, headings, body, source_path, uuid UNINDEXED, md_path UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+HEADING_RE = re.compile(r"^ {0,3}(#{1,6})\s+(.*?)(?:\s+#+)?\s*$")
+FENCE_RE = re.compile(r"^ {0,3}(```|~~~)")
+IMAGE_RE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+LINK_TARGET_RE = re.compile(r"(\[[^\]]*\])\([^)]*\)")
+
+
+def _fields(text: str, md_path) -> tuple:
+    """(title, headings, body) for one document's Markdown."""
+    headings = []
+    title = None
+    in_fence = False
+    for line in text.splitlines():
+        if FENCE_RE.match(line):
+            in_fence = not in_fence
+            continue
+        match = None if in_fence else HEADING_RE.match(line)
+        if match and match.group(2):
+            headings.append(match.group(2))
+            if title is None or (len(match.group(1)) == 1 and title[0] > 1):
+                title = (len(match.group(1)), match.group(2))
+    # Image links and link targets are paths and IDs, not words anyone searches for
+    body = LINK_TARGET_RE.sub(r"\1", IMAGE_RE.sub(" ", text))
+    return (title[1] if title else PurePosixPath(md_path).stem), "\n".join(headings), body
+
+
+def index_root(dest_root) -> str:
+    """How a destination is recorded in the documents table."""
+    return str(Path(dest_root).resolve()) if dest_root is not None else ""
+
+
+class SearchIndex:
+    """
+    One SQLite FTS5 index shared by a run's worker threads. `root` is the
+    destination this index writes for (see index_root); other roots' documents
+    in the same database are left alone.
+    """
+
+    def __init__(self, db_path, root: str = ""):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.root = root
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+        self.conn.executescript(SCHEMA)
+        self.indexed = 0
+        self.unchanged = 0
+        self.removed = 0
+        self.pending = 0
+        self.last_commit = time.monotonic()
+
+    def _migrate(self):
+        # Databases from before roots were recorded held a single destination's
+        # documents (md_path was unique); they become this index's root
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(documents)")]
+        if not columns or "root" in columns:
+            return
+        self.conn.execute("ALTER TABLE documents RENAME TO documents_legacy")
+        self.conn.executescript(SCHEMA)
+        self.conn.execute("INSERT INTO documents (id, root, md_path, source_path, uuid, digest, indexed_at) "
+                          "SELECT id, ?, md_path, source_path, uuid, digest, indexed_at FROM documents_legacy",
+                          (self.root,))
+        self.conn.execute("DROP TABLE documents_legacy")
+        self.conn.commit()
+
+    def sink(self, sink, md_path, source_path, file_uuid):
+        """Wrap a document's sink so its Markdown is indexed as it is written."""
+        return _IndexingSink(sink, self, md_path, source_path, file_uuid)
+
+    def add(self, md_path, text: str, source_path, file_uuid: str) -> bool:
+        """Index one document. Returns False when it is already indexed as it is."""
+        md_path, source_path = PurePosixPath(md_path).as_posix(), str(source_path)
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+        with self.lock:
+            row = self.conn.execute("SELECT id, digest, source_path, uuid FROM documents "
+                                    "WHERE root = ? AND md_path = ?", (self.root, md_path)).fetchone()
+            if row is not None and row[1:] == (digest, source_path, file_uuid):
+                self.unchanged += 1
+                return False
+        fields = _fields(text, md_path)
+        with self.lock:
+            self._store(md_path, source_path, file_uuid, digest, fields)
+        return True
+
+    def copy(self, src_md, dst_md, source_path) -> bool:
+        """Index dst_md as a copy of the already indexed src_md (a duplicate document)."""
+        src_md, dst_md = PurePosixPath(src_md).as_posix(), PurePosixPath(dst_md).as_posix()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT d.uuid, d.digest, f.title, f.headings, f.body FROM documents d "
+                "JOIN docs f ON f.rowid = d.id WHERE d.root = ? AND d.md_path = ?", (self.root, src_md)).fetchone()
+            if row is None:
+                return False
+            file_uuid, digest = row[0], row[1]
+            current = self.conn.execute("SELECT digest, source_path, uuid FROM documents "
+                                        "WHERE root = ? AND md_path = ?", (self.root, dst_md)).fetchone()
+            if current == (digest, str(source_path), file_uuid):
+                self.unchanged += 1
+                return False
+            self._store(dst_md, str(source_path), file_uuid, digest, row[2:])
+        return True
+
+    def _store(self, md_path: str, source_path: str, file_uuid: str, digest: str, fields: tuple):
+        # Caller holds the lock
+        row = self.conn.execute("SELECT id FROM documents WHERE root = ? AND md_path = ?",
+                                (self.root, md_path)).fetchone()
+        if row is None:
+            doc_id = self.conn.execute(
+                "INSERT INTO documents (root, md_path, source_path, uuid, digest, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)", (self.root, md_path, source_path, file_uuid, digest, time.time())).lastrowid
+        else:
+            doc_id = row[0]
+            self.conn.execute("DELETE FROM docs WHERE rowid = ?", (doc_id,))
+            self.conn.execute("UPDATE documents SET source_path = ?, uuid = ?, digest = ?, indexed_at = ? "
+                              "WHERE id = ?", (source_path, file_uuid, digest, time.time(), doc_id))
+        self.conn.execute("INSERT INTO docs (rowid, title, headings, body, source_path, uuid, md_path) "
+                          "VALUES (?, ?, ?, ?, ?, ?, ?)", (doc_id, *fields, source_path, file_uuid, md_path))
+        self.indexed += 1
+        self._changed()
+
+    def remove(self, md_path) -> bool:
+        md_path = PurePosixPath(md_path).as_posix()
+        with self.lock:
+            row = self.conn.execute("SELECT id FROM documents WHERE root = ? AND md_path = ?",
+                                    (self.root, md_path)).fetchone()
+            if row is None:
+                return False
+            self.conn.execute("DELETE FROM docs WHERE rowid = ?", (row[0],))
+            self.conn.execute("DELETE FROM documents WHERE id = ?", (row[0],))
+            self.removed += 1
+            self._changed()
+        return True
+
+    def prune(self, keep) -> int:
+        """Remove this root's documents whose .md path isn't in `keep`. Returns how many went."""
+        keep = {PurePosixPath(md_path).as_posix() for md_path in keep}
+        with self.lock:
+            stale = [md_path for (md_path,) in self.conn.execute("SELECT md_path FROM documents WHERE root = ?",
+                                                                 (self.root,))
+                     if md_path not in keep]
+        for md_path in stale:
+            self.remove(md_path)
+        return len(stale)
+
+    def _changed(self):
+        # Caller holds the lock. Batched commits: one per document would dominate small files
+        self.pending += 1
+        if self.pending >= COMMIT_DOCUMENTS or time.monotonic() - self.last_commit >= COMMIT_SECONDS:
+            self._commit()
+
+    def _commit(self):
+        self.conn.commit()
+        self.pending = 0
+        self.last_commit = time.monotonic()
+
+    def commit(self):
+        with self.lock:
+            self._commit()
+
+    def summary(self) -> str:
+        return (f"Search index {self.db_path}: {self.indexed} documents indexed, "
+                f"{self.unchanged} unchanged, {self.removed} removed")
+
+    def close(self, log_file=None):
+        with self.lock:
+            self._commit()
+            # Keeps the index compact across many incremental runs
+            self.conn.execute("INSERT INTO docs (docs) VALUES ('optimize')")
+            self.conn.commit()
+            self.conn.close()
+        if log_file:
+            log_info(log_file, self.summary())
+
+
+class _IndexingSink:
+    """Forwards to a sink and indexes the one .md path it is given as it is written."""
+
+    def __init__(self, sink, index: SearchIndex, md_path, source_path, file_uuid):
+        self._sink = sink
+        self._index = index
+        self._md_path = PurePosixPath(md_path)
+        self._source_path = source_path
+        self._uuid = file_uuid
+
+    def write_text(self, rel_path, text: str):
+        self._sink.write_text(rel_path, text)
+        if PurePosixPath(rel_path) == self._md_path:
+            self._index.add(rel_path, text, self._source_path, self._uuid)
+
+    def write_bytes(self, rel_path, data: bytes):
+        self._sink.write_bytes(rel_path, data)
+        if PurePosixPath(rel_path) == self._md_path:
+            self._index.add(rel_path, data.decode("utf-8", errors="replace"), self._source_path, self._uuid)
+
+    def move_file(self, src, rel_path):
+        if PurePosixPath(rel_path) != self._md_path:
+            return self._sink.move_file(src, rel_path)
+        # Read before the move: the sink takes ownership of (and may delete) src
+        text = Path(src).read_text(encoding="utf-8", errors="replace")
+        self._sink.move_file(src, rel_path)
+        self._index.add(rel_path, text, self._source_path, self._uuid)
+
+    def __getattr__(self, name):
+        return getattr(self._sink, name)
@@ -0,0 +1,261 @@
+# service.py
+# Local HTTP conversion service for other internal tools.
+#   POST /convert?filename=report.docx[&format=zip|json]   body: the raw document
+#       zip  (default): application/zip holding <name>.md and .media/<UUID>/...
+#       json:           {"uuid", "markdown", "media_bundle": <base64 zip>}
+#   GET  /health    worker/queue status (JSON)
+#   GET  /metrics   Prometheus metrics: service counters plus conversion metrics (exporter.py)
+# Conversions run on a fixed pool of pre-warmed worker threads behind a bounded
+# queue; when the queue is full the service answers 503 with Retry-After.
+import base64
+import io
+import json
+import queue
+import threading
+import time
+import zipfile
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path, PurePosixPath
+from urllib.parse import parse_qs, urlparse
+
+import exporter
+import ids
+from converters import converter_for
+from extract_markitdown import get_markitdown
+from main import convert_file, conversion_log, image_warnings_log, image_processing_log, logs_dir
+from sinks import FIXED_MTIME, ArchiveSink
+from sources import SourceFile
+from utils import log_info, log_warning
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 4
+DEFAULT_QUEUE_SIZE = 16
+REQUEST_TIMEOUT = 300
+MAX_UPLOAD_BYTES = 256 * 1024 * 1024
+
+
+class ConversionService:
+    """Worker pool + bounded queue. Each worker thread keeps its own warm converters."""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, queue_size: int = DEFAULT_QUEUE_SIZE):
+        self.workers = workers
+        self.jobs = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.busy = 0
+        self.threads = []
+        # Per-service instruments; per-document metrics come from exporter.REGISTRY
+        self.registry = exporter.Registry()
+        self.counters = {
+            name: self.registry.register(exporter.Counter(f"service_{name}", help_text))
+            for name, help_text in (
+                ("requests_total", "POST /convert requests received."),
+                ("conversions_ok_total", "Uploads converted successfully."),
+                ("conversions_failed_total", "Uploads that failed to convert."),
+                ("rejected_queue_full_total", "Requests answered 503 because the queue was full."),
+                ("request_bytes_total", "Upload bytes received."),
+                ("response_bytes_total", "Response bytes sent."),
+                ("conversion_seconds_total", "Worker time spent converting."),
+            )
+        }
+        self.registry.register(exporter.Gauge(
+            "service_workers", "Pre-warmed conversion workers.", collect=lambda: {(): self.workers}))
+        self.registry.register(exporter.Gauge(
+            "service_workers_busy", "Workers converting right now.", collect=lambda: {(): self.busy}))
+        self.registry.register(exporter.Gauge(
+            "service_queue_depth", "Uploads waiting for a worker.", collect=lambda: {(): self.jobs.qsize()}))
+        self.registry.register(exporter.Gauge(
+            "service_queue_capacity", "Uploads allowed to wait before requests get 503.",
+            collect=lambda: {(): self.jobs.maxsize}))
+
+    def start(self):
+        ready = threading.Barrier(self.workers + 1)
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, args=(ready,), name=f"convert-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        # Don't accept traffic until every worker has its converters loaded
+        ready.wait()
+
+    def count(self, name: str, amount=1):
+        self.counters[name].inc(amount)
+
+    def submit(self, filename: str, data: bytes) -> Future:
+        """Queue a conversion; raises queue.Full when the service is saturated."""
+        future = Future()
+        self.jobs.put_nowait((filename, data, future))
+        return future
+
+    def _worker(self, ready):
+        get_markitdown()
+        ready.wait()
+        while True:
+            filename, data, future = self.jobs.get()
+            if not future.set_running_or_notify_cancel():
+                # The client already gave up (timed out) while the job was queued
+                self.jobs.task_done()
+                continue
+            with self.lock:
+                self.busy += 1
+            start = time.perf_counter()
+            try:
+                future.set_result(convert_upload(filename, data))
+                self.count("conversions_ok_total")
+            except Exception as e:
+                future.set_exception(e)
+                self.count("conversions_failed_total")
+            finally:
+                self.count("conversion_seconds_total", time.perf_counter() - start)
+                with self.lock:
+                    self.busy -= 1
+                self.jobs.task_done()
+
+    def health(self) -> dict:
+        with self.lock:
+            busy = self.busy
+        return {"status": "ok", "workers": self.workers, "busy": busy,
+                "queued": self.jobs.qsize(), "queue_capacity": self.jobs.maxsize}
+
+    def metrics_text(self) -> str:
+        return self.registry.render() + exporter.REGISTRY.render()
+
+
+def convert_upload(filename: str, data: bytes):
+    """Convert one uploaded document. Returns (uuid, markdown, media-bundle zip bytes)."""
+    name = PurePosixPath(filename.replace("\\", "/")).name or "document.docx"
+    source = SourceFile(PurePosixPath(name), opener=lambda: io.BytesIO(data), size=len(data),
+                        label=f"upload:{name}")
+    converter = converter_for(source)
+    if converter is None:
+        raise ValueError(f"Unsupported document type: {name}")
+
+    # Uploads have no meaningful path: identical documents get identical bundles
+    # (content ID, and entries stamped with a fixed time rather than the clock)
+    file_uuid = ids.document_id(source, scheme="content")
+    buffer = io.BytesIO()
+    with ArchiveSink(buffer, "zip", mtime=FIXED_MTIME, label=f"upload:{name}.zip") as sink:
+        result = convert_file(source, None, None, None, conversion_log, image_warnings_log,
+                              image_processing_log, converter=converter, sink=sink, file_uuid=file_uuid)
+    if result is None:
+        raise ValueError(f"Conversion failed: {name}")
+    file_uuid, md_path = result
+
+    bundle = buffer.getvalue()
+    with zipfile.ZipFile(io.BytesIO(bundle)) as zf:
+        try:
+            markdown = zf.read(md_path.as_posix()).decode("utf-8")
+        except KeyError:
+            raise ValueError(f"Converter produced no Markdown for {name}")
+    return file_uuid, markdown, bundle
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service: ConversionService = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        log_info(conversion_log, f"[service] {self.address_string()} {fmt % args}")
+
+    def _send(self, status: int, body: bytes, content_type: str, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.service.count("response_bytes_total", len(body))
+
+    def _send_json(self, status: int, payload: dict, headers=None):
+        self._send(status, json.dumps(payload).encode("utf-8"), "application/json", headers)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/health":
+            self._send_json(200, self.service.health())
+        elif path == "/metrics":
+            self._send(200, self.service.metrics_text().encode("utf-8"), exporter.CONTENT_TYPE)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/convert":
+            self._send_json(404, {"error": "not found"})
+            return
+        self.service.count("requests_total")
+        params = parse_qs(url.query)
+        filename = params.get("filename", ["document.docx"])[0]
+        fmt = params.get("format", ["zip"])[0]
+
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0:
+            self._send_json(411, {"error": "request body (the document) is required"})
+            return
+        if length > MAX_UPLOAD_BYTES:
+            self.close_connection = True
+            self._send_json(413, {"error": f"upload exceeds {MAX_UPLOAD_BYTES} bytes"})
+            return
+        data = self.rfile.read(length)
+        self.service.count("request_bytes_total", len(data))
+
+        try:
+            future = self.service.submit(filename, data)
+        except queue.Full:
+            self.service.count("rejected_queue_full_total")
+            self._send_json(503, {"error": "conversion queue full"}, {"Retry-After": "2"})
+            return
+
+        try:
+            file_uuid, markdown, bundle = future.result(timeout=REQUEST_TIMEOUT)
+        except FutureTimeout:
+            future.cancel()
+            self._send_json(504, {"error": "conversion timed out"})
+            return
+        except ValueError as e:
+            self._send_json(422, {"error": str(e)})
+            return
+        except Exception as e:
+            log_warning(conversion_log, f"[service] {filename}: {e}")
+            self._send_json(500, {"error": str(e)})
+            return
+
+        if fmt == "json":
+            self._send_json(200, {
+                "uuid": file_uuid,
+                "markdown": markdown,
+                "media_bundle": base64.b64encode(bundle).decode("ascii"),
+            })
+        else:
+            stem = Path(filename).stem or "document"
+            self._send(200, bundle, "application/zip", {
+                "Content-Disposition": f'attachment; filename="{stem}.zip"',
+                "X-Document-UUID": file_uuid,
+            })
+
+
+def make_server(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, workers: int = DEFAULT_WORKERS,
+                queue_size: int = DEFAULT_QUEUE_SIZE) -> ThreadingHTTPServer:
+    """Start the worker pool and bind the HTTP server (port 0 picks a free port)."""
+    logs_dir.mkdir(exist_ok=True)
+    service = ConversionService(workers, queue_size)
+    service.start()
+    handler = type("Handler", (_Handler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, workers: int = DEFAULT_WORKERS,
+          queue_size: int = DEFAULT_QUEUE_SIZE):
+    server = make_server(host, port, workers, queue_size)
+    log_info(conversion_log, f"[service] Listening on http://{host}:{server.server_address[1]} "
+                             f"({workers} workers, queue {queue_size})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
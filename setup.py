@@ -3,6 +3,10 @@
 # - Create virtual environment
 # - Install dependencies
 # - Clone and install MarkItDown (local editable install)
+# - Skip all of the above when the recorded setup lock still matches
+# - Or: build / provision from an offline bundle (--bundle / --from-bundle)
+
+import argparse
 
 import subprocess
 import sys
@@ -14,8 +18,12 @@ from utils import (
     log_and_print,
     clone_repo,
     install_packages,
-    install_local_package
+    compute_lock_hash,
+    read_lock,
+    run_git,
+    write_lock
 )
+from bundle import build_bundle, extract_bundle, bundle_install_targets, BUNDLE_WHEELHOUSE, MARKITDOWN_EXTRAS
 
 #from torch_setup import install_torch_stack
 #from marker_setup import initialize_marker
@@ -35,6 +43,34 @@ setup_log = logs_dir / "setup.log"
 
 markitdown_repo_path = Path("markitdown")
 markitdown_pkg_path = markitdown_repo_path / "packages" / "markitdown"
+markitdown_version = Path("markitdown_version.txt")
+
+# Local wheel cache; lets re-provisioning run offline once it has been filled
+wheelhouse_dir = Path("wheelhouse")
+# Fingerprint of the inputs of the last successful setup
+setup_lock = venv_dir / "setup.lock"
+
+# Extracted offline bundle (--from-bundle)
+bundle_dir = Path("bundle")
+
+# MarkItDown's build backend; kept in the wheelhouse so the editable install works offline
+build_backends = ["hatchling"]
+
+
+def markitdown_commit():
+    """Commit of the MarkItDown checkout that gets installed (None without a checkout)."""
+    try:
+        return run_git(["rev-parse", "HEAD"], cwd=markitdown_repo_path).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def setup_lock_hash():
+    # What gets installed: the requirements, the interpreter and the MarkItDown commit
+    return compute_lock_hash(
+        [requirements, markitdown_version],
+        extra=[sys.version, markitdown_commit()]
+    )
 
 
 # ---------------------------------------------------------------------------
@@ -42,36 +78,33 @@ markitdown_pkg_path = markitdown_repo_path / "packages" / "markitdown"
 # ---------------------------------------------------------------------------
 
 def create_venv():
-    log_and_print(setup_log, "[*] Creating virtual environment...")
-    subprocess.run([sys.executable, "-m", "venv", str(venv_dir)], check=True)
-
     python_exe = venv_dir / "Scripts" / "python.exe"
     pip_exe = venv_dir / "Scripts" / "pip.exe"
 
-    # Upgrade pip
-    log_and_print(setup_log, "[*] Upgrading pip in the virtual environment...")
-    result = subprocess.run(
-        [str(python_exe), "-m", "pip", "install", "--upgrade", "pip"],
-        capture_output=True,
-        text=True
-    )
-    log_info(setup_log, f"pip upgrade stdout:\n{result.stdout.strip()}")
-    log_warning(setup_log, f"pip upgrade stderr:\n{result.stderr.strip()}")
-    if result.returncode != 0:
-        raise subprocess.CalledProcessError(result.returncode, result.args)
+    lock_hash = setup_lock_hash()
+    if python_exe.exists() and read_lock(setup_lock) == lock_hash:
+        log_and_print(setup_log, "[*] Setup lock matches. Skipping venv, clone and install.")
+        return
+
+    if not python_exe.exists():
+        log_and_print(setup_log, "[*] Creating virtual environment...")
+        subprocess.run([sys.executable, "-m", "venv", str(venv_dir)], check=True)
+
+        # Upgrade pip
+        log_and_print(setup_log, "[*] Upgrading pip in the virtual environment...")
+        result = subprocess.run(
+            [str(python_exe), "-m", "pip", "install", "--upgrade", "pip"],
+            capture_output=True,
+            text=True
+        )
+        log_info(setup_log, f"pip upgrade stdout:\n{result.stdout.strip()}")
+        log_warning(setup_log, f"pip upgrade stderr:\n{result.stderr.strip()}")
+        if result.returncode != 0:
+            raise subprocess.CalledProcessError(result.returncode, result.args)
     
     # Install correct PyTorch stack (GPU or CPU)
     #log_and_print(setup_log, "[*] Installing PyTorch stack (GPU-aware)...")
     #install_torch_stack(python_exe, pip_exe, setup_log)
-    
-    # Install requirements.txt
-    with requirements.open() as f:
-        packages = [
-            line.strip()
-            for line in f
-            if line.strip() and not line.startswith("#")
-        ]
-    install_packages(pip_exe, packages, setup_log)
 
     # Clone MarkItDown repo
     clone_repo(
@@ -81,18 +114,62 @@ def create_venv():
         setup_log
     )
 
-    # Install MarkItDown (editable)
-    install_local_package(
-        pip_exe,
-        markitdown_pkg_path,
-        extras="docx",
-        setup_log=setup_log
-    )
+    if not markitdown_pkg_path.exists():
+        log_and_print(setup_log, f"[!] Local package path not found: {markitdown_pkg_path}")
+        raise FileNotFoundError("Local package path missing")
 
+    # Install requirements.txt and MarkItDown (editable) in one resolve
+    with requirements.open() as f:
+        packages = [
+            line.strip()
+            for line in f
+            if line.strip() and not line.startswith("#")
+        ]
+    packages += build_backends
+    packages += ["-e", f"{markitdown_pkg_path}[{MARKITDOWN_EXTRAS}]"]
+    install_packages(pip_exe, packages, setup_log, wheelhouse=wheelhouse_dir)
 
+    write_lock(setup_lock, setup_lock_hash())
     log_info(setup_log, "Setup complete.")
 
 
+# ---------------------------------------------------------------------------
+# Offline bundles
+# ---------------------------------------------------------------------------
+
+def make_bundle(bundle_path: Path):
+    """Provision normally (network required), then package wheels + pinned MarkItDown."""
+    create_venv()
+    pip_exe = venv_dir / "Scripts" / "pip.exe"
+    version = markitdown_version.read_text(encoding="utf-8").strip()
+    build_bundle(pip_exe, bundle_path, requirements, markitdown_repo_path, version, setup_log)
+
+
+def provision_from_bundle(bundle_path: Path):
+    """Create the venv using only the contents of an offline bundle. No network access."""
+    python_exe = venv_dir / "Scripts" / "python.exe"
+    pip_exe = venv_dir / "Scripts" / "pip.exe"
+
+    lock_hash = compute_lock_hash([bundle_path], extra=[sys.version])
+    if python_exe.exists() and read_lock(setup_lock) == lock_hash:
+        log_and_print(setup_log, "[*] Setup lock matches bundle. Skipping install.")
+        return
+
+    extract_bundle(bundle_path, bundle_dir, setup_log)
+    wheelhouse = bundle_dir / BUNDLE_WHEELHOUSE
+
+    if not python_exe.exists():
+        log_and_print(setup_log, "[*] Creating virtual environment...")
+        subprocess.run([sys.executable, "-m", "venv", str(venv_dir)], check=True)
+        install_packages(pip_exe, ["--upgrade", "pip"], setup_log, wheelhouse=wheelhouse, allow_index=False)
+
+    install_packages(pip_exe, bundle_install_targets(bundle_dir), setup_log,
+                     wheelhouse=wheelhouse, allow_index=False)
+
+    write_lock(setup_lock, lock_hash)
+    log_info(setup_log, "Setup from bundle complete.")
+
+
 # ---------------------------------------------------------------------------
 # Launch application
 # ---------------------------------------------------------------------------
@@ -108,5 +185,21 @@ def run_app():
 # ---------------------------------------------------------------------------
 
 if __name__ == "__main__":
-    create_venv()
-    run_app()
+    parser = argparse.ArgumentParser(description="Set up and launch OhHiMarkItDown.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--bundle", type=Path, metavar="ARCHIVE",
+                      help="build an offline bundle (.tar.gz) and exit")
+    mode.add_argument("--from-bundle", type=Path, metavar="ARCHIVE",
+                      help="provision the venv from an offline bundle, without network access")
+    parser.add_argument("--no-launch", action="store_true", help="set up only; don't start the app")
+    args = parser.parse_args()
+
+    if args.bundle:
+        make_bundle(args.bundle)
+    else:
+        if args.from_bundle:
+            provision_from_bundle(args.from_bundle)
+        else:
+            create_venv()
+        if not args.no_launch:
+            run_app()
@@ -0,0 +1,468 @@
+# sinks.py
+# Output backends. Converters write through a sink using POSIX paths relative to
+# the destination root (e.g. "team/doc.md", ".media/<UUID>/<UUID>-001.png"):
+# - DirectorySink: plain folder (the original behaviour); writes can run behind the
+#                  converters on I/O threads for network shares (netio.py)
+# - ArchiveSink:   one streamed .tar/.tar.gz/.zip (or a tar stream on stdout)
+# - StagingSink:   local staging folder, copied to the real destination in bulk on close
+# - GitSink:       commits straight into a local git repository via git fast-import
+import abc
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+
+from netio import IO_WORKERS, DirCache, WriteBehind
+from utils import run_git
+
+# Folder (under the destination root) that holds every document's images
+MEDIA_ROOT = ".media"
+
+TAR_MODES = {".tar": "w|", ".tgz": "w|gz", ".tar.gz": "w|gz", ".tar.bz2": "w|bz2", ".tar.xz": "w|xz"}
+
+# Parallel copies when a staging folder is synced to a network share
+SYNC_WORKERS = 16
+
+# GitSink commits once this many files are pending or this many seconds have passed,
+# and makes its progress visible (refs updated, pack flushed) every CHECKPOINT seconds
+GIT_BATCH_FILES = 2000
+GIT_BATCH_SECONDS = 30.0
+GIT_CHECKPOINT_SECONDS = 300.0
+GIT_FALLBACK_IDENT = "OhHiMarkItDown <ohhimarkitdown@localhost>"
+
+# 1980-01-01 UTC, the earliest date a ZIP entry can carry. Archives stamped with it
+# (ArchiveSink(mtime=...)) have the same bytes whenever the same content goes in
+FIXED_MTIME = 315532800
+
+
+def media_path(uuid: str, name: str = "") -> PurePosixPath:
+    """Sink path of a document's media folder (or of one file in it)."""
+    return PurePosixPath(MEDIA_ROOT, uuid, name) if name else PurePosixPath(MEDIA_ROOT, uuid)
+
+
+def media_link(uuid: str, name: str) -> str:
+    """Root-relative Markdown link to a media file."""
+    return f"/{MEDIA_ROOT}/{uuid}/{name}"
+
+
+class OutputSink(abc.ABC):
+    """Base class. Paths are POSIX-style and relative to the destination root."""
+
+    def write_text(self, rel_path, text: str):
+        self.write_bytes(rel_path, text.encode("utf-8"))
+
+    @abc.abstractmethod
+    def write_bytes(self, rel_path, data: bytes):
+        """Store data at rel_path, replacing what is there."""
+
+    def move_file(self, src: Path, rel_path):
+        """Take ownership of a local file (e.g. an extracted image) and store it at rel_path."""
+        self.write_bytes(rel_path, Path(src).read_bytes())
+        os.unlink(src)
+
+    def copy_file(self, src_rel, dst_rel, link: bool = False) -> bool:
+        """
+        Duplicate a file already written through this sink (hard link if asked and possible).
+        Returns False when the sink can't read back its own output.
+        """
+        return False
+
+    def describe(self, rel_path) -> str:
+        """Human-readable location for logs."""
+        return str(rel_path)
+
+    def flush(self, rel_paths):
+        """Wait until these paths are written; raise OSError if any write failed."""
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class DirectorySink(OutputSink):
+    """
+    Plain folder. Each folder is created once per run; with io_workers the writes
+    themselves run on I/O threads and flush() waits for a document's (see netio.py).
+    on_write, if set, is called with the seconds each write took on the destination.
+    """
+
+    def __init__(self, root: Path, io_workers: int = 0):
+        self.root = Path(root)
+        self.dirs = DirCache()
+        self.io = WriteBehind(io_workers) if io_workers > 0 else None
+        self.on_write = None
+
+    def path_for(self, rel_path) -> Path:
+        return self.root / PurePosixPath(rel_path)
+
+    def _write(self, rel_path, fn, *args):
+        if self.io is None:
+            self._write_now(rel_path, fn, *args)
+        else:
+            self.io.submit(PurePosixPath(rel_path), self._write_now, rel_path, fn, *args)
+
+    def _write_now(self, rel_path, fn, *args):
+        start = time.perf_counter()
+        path = self.path_for(rel_path)
+        try:
+            self.dirs.ensure(path.parent)
+            try:
+                fn(path, *args)
+            except FileNotFoundError:
+                # The folder was removed after it was cached (watch deletes media folders)
+                self.dirs.forget(path.parent)
+                self.dirs.ensure(path.parent)
+                fn(path, *args)
+        finally:
+            if self.on_write is not None:
+                self.on_write(time.perf_counter() - start)
+
+    def write_bytes(self, rel_path, data: bytes):
+        self._write(rel_path, Path.write_bytes, data)
+
+    def write_text(self, rel_path, text: str):
+        self._write(rel_path, _write_text, text)
+
+    def move_file(self, src: Path, rel_path):
+        if self.io is not None:
+            # Callers delete their temp folders as soon as this returns
+            src = _take_file(src)
+        self._write(rel_path, _move_into, src)
+
+    def copy_file(self, src_rel, dst_rel, link: bool = False) -> bool:
+        if self.io is not None:
+            self.io.wait(PurePosixPath(src_rel))
+        self._write(dst_rel, _copy_into, self.path_for(src_rel), link)
+        return True
+
+    def describe(self, rel_path) -> str:
+        return str(self.path_for(rel_path))
+
+    def flush(self, rel_paths):
+        if self.io is not None:
+            self.io.flush([PurePosixPath(p) for p in rel_paths])
+
+    def close(self):
+        if self.io is not None:
+            self.io.close()
+
+
+def _write_text(path: Path, text: str):
+    path.write_text(text, encoding="utf-8")
+
+
+def _move_into(path: Path, src):
+    shutil.move(str(src), path)
+
+
+def _copy_into(dst: Path, src: Path, link: bool):
+    if link:
+        try:
+            dst.unlink(missing_ok=True)
+            os.link(src, dst)
+            return
+        except OSError:
+            pass  # e.g. cross-device or a share without hard links
+    shutil.copyfile(src, dst)
+
+
+def _take_file(src) -> str:
+    """Move a caller's temp file to one the sink owns (a local rename)."""
+    fd, owned = tempfile.mkstemp(prefix="ohhimarkitdown_out_", suffix=Path(src).suffix)
+    os.close(fd)
+    try:
+        os.replace(src, owned)
+    except OSError:
+        shutil.move(str(src), owned)
+    return owned
+
+
+class ArchiveSink(OutputSink):
+    """
+    Streams everything into one archive. TAR output is written strictly sequentially
+    ("w|" modes), so it can go to a pipe or stdout; ZIP needs a seekable file.
+    mtime stamps every entry (default: the time it is written). label names the
+    archive in logs (default: the target's path or file name, "<memory>.<fmt>" otherwise).
+    """
+
+    def __init__(self, target, fmt: str = "tar", tar_mode: str = "w|", mtime: int = None, label: str = None):
+        self.lock = threading.Lock()
+        self.fmt = fmt
+        self.mtime = mtime
+        if label is None:
+            name = str(target) if isinstance(target, (str, Path)) else getattr(target, "name", None)
+            label = name if isinstance(name, str) else f"<memory>.{fmt}"
+        self.name = label
+        if fmt == "zip":
+            self.archive = zipfile.ZipFile(target, "w", compression=zipfile.ZIP_DEFLATED)
+        elif isinstance(target, (str, Path)):
+            self.archive = tarfile.open(str(target), mode=tar_mode, format=tarfile.PAX_FORMAT)
+        else:
+            self.archive = tarfile.open(fileobj=target, mode=tar_mode, format=tarfile.PAX_FORMAT)
+
+    def _add(self, rel_path, fileobj, size: int):
+        arcname = PurePosixPath(rel_path).as_posix()
+        with self.lock:
+            if self.fmt == "zip":
+                # Images are already compressed; only deflate the Markdown
+                compress = zipfile.ZIP_DEFLATED if arcname.endswith(".md") else zipfile.ZIP_STORED
+                stamp = time.gmtime(self.mtime) if self.mtime is not None else time.localtime()
+                info = zipfile.ZipInfo(arcname, date_time=stamp[:6])
+                info.compress_type = compress
+                with self.archive.open(info, "w") as out:
+                    shutil.copyfileobj(fileobj, out, 1024 * 1024)
+            else:
+                info = tarfile.TarInfo(arcname)
+                info.size = size
+                info.mtime = self._mtime()
+                info.mode = 0o644
+                self.archive.addfile(info, fileobj)
+
+    def _mtime(self) -> int:
+        return self.mtime if self.mtime is not None else int(time.time())
+
+    def write_bytes(self, rel_path, data: bytes):
+        self._add(rel_path, io.BytesIO(data), len(data))
+
+    def move_file(self, src: Path, rel_path):
+        with open(src, "rb") as f:
+            self._add(rel_path, f, os.fstat(f.fileno()).st_size)
+        os.unlink(src)
+
+    def copy_file(self, src_rel, dst_rel, link: bool = False) -> bool:
+        if self.fmt == "zip":
+            return False
+        # Tar can't re-read a streamed member, but a hard-link entry needs no data
+        info = tarfile.TarInfo(PurePosixPath(dst_rel).as_posix())
+        info.type = tarfile.LNKTYPE
+        info.linkname = PurePosixPath(src_rel).as_posix()
+        info.mtime = self._mtime()
+        info.mode = 0o644
+        with self.lock:
+            self.archive.addfile(info)
+        return True
+
+    def describe(self, rel_path) -> str:
+        return f"{self.name}!/{PurePosixPath(rel_path).as_posix()}"
+
+    def close(self):
+        with self.lock:
+            self.archive.close()
+
+
+class StagingSink(DirectorySink):
+    """
+    Writes to a fast local folder during the run and copies the finished tree to the
+    real destination (typically a network share) in one bulk pass on close.
+    """
+
+    def __init__(self, final_root: Path, staging_dir: Path = None):
+        self.final_root = Path(final_root)
+        super().__init__(Path(staging_dir) if staging_dir else Path(tempfile.mkdtemp(prefix="ohhimarkitdown_stage_")))
+
+    def describe(self, rel_path) -> str:
+        return str(self.final_root / PurePosixPath(rel_path))
+
+    def close(self):
+        files = []
+        for dirpath, _, filenames in os.walk(self.root):
+            rel_dir = Path(dirpath).relative_to(self.root)
+            (self.final_root / rel_dir).mkdir(parents=True, exist_ok=True)
+            files.extend(rel_dir / name for name in filenames)
+
+        # Each copy is a few round trips on SMB; overlap them
+        with ThreadPoolExecutor(max_workers=SYNC_WORKERS) as pool:
+            list(pool.map(lambda rel: shutil.copyfile(self.root / rel, self.final_root / rel), files))
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+class GitSink(OutputSink):
+    """
+    Streams every file into a local git repository through one `git fast-import`
+    process: blobs are sent as they are written and committed on `branch` in
+    batches, so there is no working-tree copy and no `git add` afterwards.
+    If the branch is checked out in a non-bare repository, its working tree is
+    brought up to date on close.
+    """
+
+    def __init__(self, repo: Path, branch: str = "main", prefix: str = "",
+                 batch_files: int = GIT_BATCH_FILES, batch_seconds: float = GIT_BATCH_SECONDS,
+                 message: str = "Convert documents to Markdown"):
+        self.repo = Path(repo)
+        self.branch = branch
+        self.ref = f"refs/heads/{branch}"
+        self.prefix = PurePosixPath(prefix) if prefix else None
+        self.batch_files = batch_files
+        self.batch_seconds = batch_seconds
+        self.message = message
+        self.lock = threading.Lock()
+        self.marks = {}             # path in the repo -> blob mark (every file this run)
+        self.pending = {}           # path -> mark, not yet committed
+        self.next_mark = 1
+        self.batches = 0
+        self.last_commit = self.last_checkpoint = time.monotonic()
+
+        if not self.repo.exists() or not any(self.repo.iterdir()):
+            self.repo.mkdir(parents=True, exist_ok=True)
+            run_git(["init", "-q", "-b", branch], cwd=self.repo)
+        # Never fall through to a repository that merely encloses the destination
+        try:
+            git_dir = (self.repo / run_git(["rev-parse", "--git-dir"], cwd=self.repo).stdout.strip()).resolve()
+        except subprocess.CalledProcessError:
+            git_dir = None
+        if git_dir not in (self.repo.resolve(), (self.repo / ".git").resolve()):
+            raise ValueError(f"{self.repo} is not the root of a git repository")
+        self.bare = run_git(["rev-parse", "--is-bare-repository"], cwd=self.repo).stdout.strip() == "true"
+        try:
+            self.start_commit = run_git(["rev-parse", "--verify", "-q", f"{self.ref}^{{commit}}"],
+                                        cwd=self.repo).stdout.strip()
+        except subprocess.CalledProcessError:
+            self.start_commit = None
+        try:
+            ident = run_git(["var", "GIT_COMMITTER_IDENT"], cwd=self.repo).stdout.strip()
+            self.ident = ident.rsplit(" ", 2)[0]
+        except subprocess.CalledProcessError:
+            self.ident = GIT_FALLBACK_IDENT
+        self.process = subprocess.Popen(["git", "fast-import", "--quiet", "--done"], cwd=self.repo,
+                                        stdin=subprocess.PIPE, stdout=subprocess.DEVNULL)
+        self.stream = self.process.stdin
+
+    def _path(self, rel_path) -> str:
+        rel_path = PurePosixPath(rel_path)
+        return (self.prefix / rel_path if self.prefix else rel_path).as_posix()
+
+    def _blob(self, path: str, fileobj, size: int):
+        with self.lock:
+            mark = self.next_mark
+            self.next_mark += 1
+            self.stream.write(b"blob\nmark :%d\ndata %d\n" % (mark, size))
+            shutil.copyfileobj(fileobj, self.stream, 1024 * 1024)
+            self.stream.write(b"\n")
+            self._stage(path, mark)
+
+    def _stage(self, path: str, mark: int):
+        self.marks[path] = mark
+        self.pending[path] = mark
+        if (len(self.pending) >= self.batch_files
+                or time.monotonic() - self.last_commit >= self.batch_seconds):
+            self._commit()
+
+    def _commit(self):
+        """Commit the pending files (caller holds the lock)."""
+        if not self.pending:
+            return
+        self.batches += 1
+        message = f"{self.message} (batch {self.batches}, {len(self.pending)} files)\n".encode("utf-8")
+        header = f"commit {self.ref}\ncommitter {self.ident} {int(time.time())} +0000\n".encode("utf-8")
+        self.stream.write(header + b"data %d\n" % len(message) + message)
+        if self.batches == 1 and self.start_commit:
+            self.stream.write(f"from {self.start_commit}\n".encode("utf-8"))
+        for path, mark in self.pending.items():
+            self.stream.write(b"M 100644 :%d %s\n" % (mark, _git_quote(path)))
+        self.stream.write(b"\n")
+        self.pending.clear()
+        now = time.monotonic()
+        self.last_commit = now
+        if now - self.last_checkpoint >= GIT_CHECKPOINT_SECONDS:
+            self.stream.write(b"checkpoint\n\n")
+            self.last_checkpoint = now
+        self.stream.flush()
+
+    def write_bytes(self, rel_path, data: bytes):
+        self._blob(self._path(rel_path), io.BytesIO(data), len(data))
+
+    def move_file(self, src: Path, rel_path):
+        with open(src, "rb") as f:
+            self._blob(self._path(rel_path), f, os.fstat(f.fileno()).st_size)
+        os.unlink(src)
+
+    def copy_file(self, src_rel, dst_rel, link: bool = False) -> bool:
+        # Same blob, new path: no data is sent again
+        with self.lock:
+            mark = self.marks.get(self._path(src_rel))
+            if mark is None:
+                return False
+            self._stage(self._path(dst_rel), mark)
+        return True
+
+    def describe(self, rel_path) -> str:
+        return f"{self.repo}@{self.branch}:{self._path(rel_path)}"
+
+    def close(self):
+        with self.lock:
+            if self.stream.closed:
+                return
+            self._commit()
+            self.stream.write(b"done\n")
+            self.stream.close()
+        if self.process.wait() != 0:
+            raise RuntimeError(f"git fast-import failed in {self.repo} (exit {self.process.returncode})")
+        if self.batches and not self.bare:
+            self._update_worktree()
+
+    def _update_worktree(self):
+        """Check out the new commits if `branch` is the repository's current branch."""
+        try:
+            head = run_git(["symbolic-ref", "-q", "HEAD"], cwd=self.repo).stdout.strip()
+        except subprocess.CalledProcessError:
+            return
+        if head != self.ref:
+            return
+        # Two-tree merge: files changed by the run are updated, local edits elsewhere are kept
+        if self.start_commit:
+            run_git(["read-tree", "-m", "-u", self.start_commit, self.ref], cwd=self.repo)
+        else:
+            run_git(["read-tree", "-m", "-u", self.ref], cwd=self.repo)
+
+
+def _git_quote(path: str) -> bytes:
+    """A path as fast-import expects it: C-style quoted when it needs to be."""
+    if not path.startswith('"') and "\n" not in path:
+        return path.encode("utf-8")
+    escaped = path.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'"{escaped}"'.encode("utf-8")
+
+
+def _tar_mode(name: str):
+    lowered = name.lower()
+    for suffix, mode in sorted(TAR_MODES.items(), key=lambda item: -len(item[0])):
+        if lowered.endswith(suffix):
+            return mode
+    return None
+
+
+def open_sink(dest, staging_dir: Path = None, stage: bool = False, git: bool = False,
+              git_branch: str = "main", git_prefix: str = "") -> OutputSink:
+    """
+    Pick a sink for a destination: "-" streams a tar to stdout, *.tar[.gz|.bz2|.xz]
+    and *.zip write one archive, anything else is a folder (staged first if asked,
+    or committed into the git repository there with git=True).
+    """
+    if git:
+        return GitSink(dest, git_branch, git_prefix)
+    if str(dest) == "-":
+        return ArchiveSink(sys.stdout.buffer, "tar", "w|", label="<stdout>")
+    dest = Path(dest)
+    mode = _tar_mode(dest.name)
+    if mode:
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        return ArchiveSink(dest, "tar", mode)
+    if dest.suffix.lower() == ".zip":
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        return ArchiveSink(dest, "zip")
+    if stage or staging_dir:
+        return StagingSink(dest, staging_dir)
+    return DirectorySink(dest, io_workers=IO_WORKERS)
@@ -0,0 +1,208 @@
+# sources.py
+# Source roots: a folder, or a ZIP/TAR export (e.g. SharePoint / OneDrive bulk
+# downloads) read in place without unpacking it to disk first.
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path, PurePosixPath
+
+ZIP_SUFFIXES = {".zip"}
+TAR_SUFFIXES = {".tar", ".tgz", ".tar.gz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz"}
+
+COPY_CHUNK = 1024 * 1024
+
+
+def _archive_suffix(path: Path) -> str:
+    suffixes = [s.lower() for s in path.suffixes[-2:]]
+    if len(suffixes) == 2 and "".join(suffixes) in TAR_SUFFIXES:
+        return "".join(suffixes)
+    return suffixes[-1] if suffixes else ""
+
+
+def is_archive(path: Path) -> bool:
+    path = Path(path)
+    return path.is_file() and _archive_suffix(path) in ZIP_SUFFIXES | TAR_SUFFIXES
+
+
+def _safe_relative(name: str) -> PurePosixPath:
+    """Archive member name -> relative path, dropping drive/absolute/'..' parts."""
+    parts = [p for p in name.replace("\\", "/").split("/") if p not in ("", ".", "..")]
+    return PurePosixPath(*parts)
+
+
+class SourceFile:
+    """
+    One document under a source root. `relative_path` mirrors what
+    file.relative_to(source_root) gives for a folder source.
+    Duck-types the bits of Path that the converters use (name, suffix, open, is_file).
+    """
+
+    def __init__(self, relative_path: PurePosixPath, path: Path = None, opener=None,
+                 size: int = None, label: str = None, temporary: bool = False):
+        self.relative_path = PurePosixPath(relative_path)
+        self.path = Path(path) if path is not None else None
+        self._opener = opener
+        self.size = size
+        self.label = label or str(path or relative_path)
+        self.temporary = temporary
+
+    @classmethod
+    def from_path(cls, path: Path, source_root: Path):
+        path = Path(path)
+        return cls(PurePosixPath(path.relative_to(source_root).as_posix()), path=path)
+
+    @property
+    def name(self) -> str:
+        return self.relative_path.name
+
+    @property
+    def suffix(self) -> str:
+        return self.relative_path.suffix
+
+    @property
+    def stem(self) -> str:
+        return self.relative_path.stem
+
+    def is_file(self) -> bool:
+        return True
+
+    def open(self, mode: str = "rb"):
+        if "b" not in mode:
+            raise ValueError("SourceFile only opens in binary mode")
+        if self.path is not None:
+            return open(self.path, "rb")
+        return self._opener()
+
+    @contextmanager
+    def local_path(self):
+        """
+        Yield a filesystem path for converters that need one. Archive members are
+        spooled into a private temp file that is removed as soon as the caller is done.
+        """
+        if self.path is not None and not self.temporary:
+            yield self.path
+            return
+        if self.path is not None:
+            try:
+                yield self.path
+            finally:
+                self.discard()
+            return
+        fd, tmp = tempfile.mkstemp(prefix="ohhimarkitdown_", suffix=self.suffix)
+        try:
+            with os.fdopen(fd, "wb") as out, self.open() as src:
+                shutil.copyfileobj(src, out, COPY_CHUNK)
+            yield Path(tmp)
+        finally:
+            os.unlink(tmp)
+
+    def discard(self):
+        if self.temporary and self.path is not None:
+            try:
+                self.path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def __str__(self):
+        return self.label
+
+
+def _iter_folder(root: Path, keep=None):
+    # scandir gets each entry's type with the listing, so on a network share there is
+    # no stat round trip per file (rglob + is_file() costs one for every entry)
+    folders = [str(root)]
+    while folders:
+        try:
+            entries = list(os.scandir(folders.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    folders.append(entry.path)
+                    continue
+                if keep is not None and not keep(Path(entry.path)):
+                    continue
+                if entry.is_file():
+                    yield SourceFile.from_path(Path(entry.path), root)
+            except OSError:
+                continue
+
+
+def _iter_zip(archive: Path, zf: zipfile.ZipFile, keep=None):
+    # ZipFile shares one handle behind a lock, so members can be read from worker threads
+    for info in zf.infolist():
+        if info.is_dir():
+            continue
+        rel = _safe_relative(info.filename)
+        if not rel.parts:
+            continue
+        source = SourceFile(
+            rel,
+            opener=lambda info=info: zf.open(info),
+            size=info.file_size,
+            label=f"{archive}!/{rel}",
+        )
+        if keep is None or keep(source):
+            yield source
+
+
+def _iter_tar(archive: Path, keep=None):
+    # Tar members can only be read in order (and compressed tars can't seek), so each
+    # wanted member is spooled to a temp file as the stream passes over it
+    with tarfile.open(archive, "r:*") as tar:
+        for info in tar:
+            if not info.isfile():
+                continue
+            rel = _safe_relative(info.name)
+            if not rel.parts:
+                continue
+            label = f"{archive}!/{rel}"
+            if keep is not None and not keep(SourceFile(rel, label=label)):
+                continue
+            fd, tmp = tempfile.mkstemp(prefix="ohhimarkitdown_", suffix=rel.suffix)
+            with os.fdopen(fd, "wb") as out, tar.extractfile(info) as src:
+                shutil.copyfileobj(src, out, COPY_CHUNK)
+            yield SourceFile(rel, path=Path(tmp), size=info.size, label=label, temporary=True)
+
+
+@contextmanager
+def open_sources(source_root: Path, keep=None):
+    """
+    Yield an iterator of SourceFile for every file under source_root, which may be a
+    folder or a .zip/.tar(.gz|.bz2|.xz) archive. The archive stays open until the
+    with-block ends, so queued conversions can still read their members.
+    keep(source) is a cheap name-only filter applied before any I/O on the file.
+    """
+    source_root = Path(source_root)
+    if not is_archive(source_root):
+        yield _iter_folder(source_root, keep)
+    elif _archive_suffix(source_root) in ZIP_SUFFIXES:
+        with zipfile.ZipFile(source_root) as zf:
+            yield _iter_zip(source_root, zf, keep)
+    else:
+        yield _iter_tar(source_root, keep)
+
+
+def list_relative_paths(source_root: Path, keep=None):
+    """
+    Relative paths of the files under source_root from the directory listing (or ZIP
+    central directory) alone. None for TAR sources, which can only be listed by
+    reading them through.
+    """
+    source_root = Path(source_root)
+    if not is_archive(source_root):
+        paths = []
+        for dirpath, _, filenames in os.walk(source_root):
+            rel_dir = PurePosixPath(Path(dirpath).relative_to(source_root).as_posix())
+            paths.extend(rel_dir / name for name in filenames)
+    elif _archive_suffix(source_root) in ZIP_SUFFIXES:
+        with zipfile.ZipFile(source_root) as zf:
+            paths = [_safe_relative(info.filename) for info in zf.infolist() if not info.is_dir()]
+        paths = [rel for rel in paths if rel.parts]
+    else:
+        return None
+    return [rel for rel in paths if keep is None or keep(rel)]
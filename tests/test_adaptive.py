@@ -0,0 +1,96 @@
+# tests/test_adaptive.py
+import threading
+import time
+
+import adaptive
+import sinks
+from converters import CHEAP, EXPENSIVE
+from scheduler import LaneLimit
+from sinks import DirectorySink
+
+GB = 1024 ** 3
+
+
+class FakeScheduler:
+    def __init__(self, **capacity):
+        self.limits = {lane: LaneLimit(workers) for lane, workers in capacity.items()}
+
+
+def _controller(cheap=4, expensive=2):
+    scheduler = FakeScheduler(**{CHEAP: cheap, EXPENSIVE: expensive})
+    controller = adaptive.ConcurrencyController(scheduler, rss_budget=10 * GB)
+    controller.max_workers = {CHEAP: 8, EXPENSIVE: 2}
+    return scheduler, controller
+
+
+def test_grow_only_a_saturated_lane_with_a_backlog():
+    scheduler, controller = _controller()
+    cheap = scheduler.limits[CHEAP]
+    cheap.active, cheap.waiting = 4, 3
+    assert controller.decide(cpu=30, iowait=1, rss=1 * GB, slow=False) == {CHEAP: 5}
+    # Busy CPU, high I/O wait or memory near the budget: hold
+    assert controller.decide(cpu=90, iowait=1, rss=1 * GB, slow=False) == {}
+    assert controller.decide(cpu=30, iowait=20, rss=1 * GB, slow=False) == {}
+    assert controller.decide(cpu=30, iowait=1, rss=8 * GB, slow=False) == {}
+    # Already at the lane maximum
+    expensive = scheduler.limits[EXPENSIVE]
+    expensive.active, expensive.waiting = 2, 5
+    assert EXPENSIVE not in controller.decide(cpu=30, iowait=1, rss=1 * GB, slow=False)
+
+
+def test_shrink_on_memory_pressure_or_slow_destination():
+    _, controller = _controller(cheap=8, expensive=2)
+    assert controller.decide(cpu=10, iowait=0, rss=int(9.5 * GB), slow=False) == {CHEAP: 5, EXPENSIVE: 1}
+    assert controller.decide(cpu=10, iowait=0, rss=1 * GB, slow=True) == {CHEAP: 5, EXPENSIVE: 1}
+
+
+def test_destination_is_slow_relative_to_its_best_latency():
+    _, controller = _controller()
+    assert not controller._destination_slow()
+    controller.observe_write(0.2)
+    assert not controller._destination_slow()       # under the floor
+    controller.latency = 0.9
+    assert controller._destination_slow()           # > 4x the best seen
+
+
+def test_timed_sink_reports_writes(tmp_path):
+    _, controller = _controller()
+    with DirectorySink(tmp_path / "out") as sink:
+        timed = controller.timed(sink)
+        timed.write_text("a.md", "x")
+        assert timed.describe("a.md") == sink.describe("a.md")
+    assert controller.latency is not None
+
+
+def test_slow_destination_behind_write_behind_is_seen(tmp_path, monkeypatch):
+    _, controller = _controller()
+    controller.observe_write(0.01)
+    assert not controller._destination_slow()
+
+    def slow_write(path, text):
+        time.sleep(0.4)
+        path.write_text(text, encoding="utf-8")
+
+    monkeypatch.setattr(sinks, "_write_text", slow_write)
+    controller.latency = None
+    with DirectorySink(tmp_path / "out", io_workers=2) as sink:
+        timed = controller.timed(sink)
+        start = time.perf_counter()
+        timed.write_text("a.md", "x")
+        assert time.perf_counter() - start < 0.2        # only queued
+        timed.flush(["a.md"])
+    assert controller.latency >= 0.4
+    assert controller._destination_slow()
+
+
+def test_resize_wakes_waiting_tasks():
+    limit = LaneLimit(1)
+    limit.__enter__()
+    entered = threading.Event()
+    thread = threading.Thread(target=lambda: (limit.__enter__(), entered.set()))
+    thread.start()
+    time.sleep(0.05)
+    assert not entered.is_set() and limit.waiting == 1
+    limit.resize(2)
+    assert entered.wait(2)
+    thread.join()
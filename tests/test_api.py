@@ -0,0 +1,53 @@
+# tests/test_api.py
+import asyncio
+import zipfile
+
+import api
+
+
+def _pages(folder, *names):
+    folder.mkdir(parents=True, exist_ok=True)
+    for name in names:
+        (folder / name).write_text(f"<h1>{name}</h1><p>body</p>", encoding="utf-8")
+    return [folder / name for name in names]
+
+
+def test_submit_resolves_futures_in_submission_order(tmp_path):
+    paths = _pages(tmp_path / "src", "a.html", "b.html") + [tmp_path / "src" / "notes.txt"]
+    paths[2].write_text("plain")
+    job = api.submit(paths, tmp_path / "out")
+    a, b, notes = job.results()
+    assert a.ok and a.md_path.as_posix() == "a.md" and len(a.uuid) == 12
+    assert b.ok and (tmp_path / "out" / "b.md").is_file()
+    assert notes.error == "unsupported format"
+    assert a.record["status"] == "ok" and job.done
+
+
+def test_submit_tree_reads_a_zip_export_and_streams_results(tmp_path):
+    export = tmp_path / "export.zip"
+    with zipfile.ZipFile(export, "w") as zf:
+        zf.writestr("team/a.html", "<h1>A</h1>")
+        zf.writestr("team/b.html", "<h1>B</h1>")
+    job = api.submit_tree(export, tmp_path / "out")
+    results = sorted(result.relative_path.as_posix() for result in job if result.ok)
+    assert results == ["team/a.html", "team/b.html"]
+    assert (tmp_path / "out" / "team" / "a.md").is_file()
+    assert job.summary["by_status"] == {"ok": 2}
+
+
+def test_async_iteration(tmp_path):
+    job = api.submit(_pages(tmp_path / "src", "a.html"), tmp_path / "out")
+
+    async def collect():
+        return [result async for result in job]
+
+    assert [result.ok for result in asyncio.run(collect())] == [True]
+
+
+def test_cancel_resolves_everything(tmp_path):
+    job = api.submit(_pages(tmp_path / "src", *(f"{i}.html" for i in range(20))), tmp_path / "out")
+    job.cancel()
+    assert job.wait(30)
+    results = job.results()
+    assert len(results) == 20
+    assert all(result.ok or result.error in ("stopped", "not converted", "cancelled") for result in results)
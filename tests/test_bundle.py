@@ -0,0 +1,88 @@
+# tests/test_bundle.py
+import json
+import tarfile
+from pathlib import Path
+
+import pytest
+
+import bundle
+import utils
+
+
+def _markitdown_repo(path):
+    package = path / "packages" / "markitdown"
+    package.mkdir(parents=True)
+    (package / "pyproject.toml").write_text("[project]\nname = 'markitdown'\n")
+    for args in (["init", "-q", "-b", "main"], ["add", "."],
+                 ["-c", "user.name=t", "-c", "user.email=t@t", "commit", "-q", "-m", "v"], ["tag", "v1"]):
+        utils.run_git(args, cwd=path)
+    return path
+
+
+def _fake_pip_wheel(pip_exe, args, setup_log):
+    # Stands in for `pip wheel`: one wheel per target, named after the MarkItDown source dir
+    wheelhouse = Path(args[args.index("--wheel-dir") + 1])
+    (wheelhouse / "psutil-1.0-py3-none-any.whl").write_bytes(b"psutil")
+    source = Path(args[-1].split("[")[0])
+    (wheelhouse / "markitdown-1.0-py3-none-any.whl").write_bytes((source / "pyproject.toml").read_bytes())
+
+
+@pytest.fixture
+def built(tmp_path, monkeypatch):
+    monkeypatch.setattr(bundle, "run_pip", _fake_pip_wheel)
+    requirements = tmp_path / "requirements.txt"
+    requirements.write_text("# deps\npsutil\n")
+    repo = _markitdown_repo(tmp_path / "markitdown")
+    archive = tmp_path / "dist" / "bundle.tar.gz"
+    manifest = bundle.build_bundle("pip", archive, requirements, repo, "v1", tmp_path / "setup.log")
+    return archive, manifest, requirements, repo
+
+
+def test_bundle_ships_wheels_not_the_checkout(built):
+    archive, manifest, _, repo = built
+    with tarfile.open(archive) as tar:
+        names = tar.getnames()
+    assert not any(name.startswith("markitdown") for name in names)
+    assert sorted(manifest["files"]) == ["requirements.txt", "wheelhouse/markitdown-1.0-py3-none-any.whl",
+                                         "wheelhouse/psutil-1.0-py3-none-any.whl"]
+    assert manifest["markitdown_commit"] == utils.run_git(["rev-parse", "v1"], cwd=repo).stdout.strip()
+
+
+def test_archive_layout_is_deterministic(built, tmp_path):
+    archive, _, requirements, repo = built
+    again = tmp_path / "again.tar.gz"
+    bundle.build_bundle("pip", again, requirements, repo, "v1", tmp_path / "setup.log")
+    # Same files in: same bytes out (real wheels built from sdists may still differ)
+    assert again.read_bytes() == archive.read_bytes()
+
+
+def test_extract_verifies_and_lists_targets(built, tmp_path):
+    archive, manifest, _, _ = built
+    dest = tmp_path / "extracted"
+    assert bundle.extract_bundle(archive, dest, tmp_path / "setup.log") == manifest
+    assert bundle.bundle_install_targets(dest) == ["psutil", f"markitdown[{bundle.MARKITDOWN_EXTRAS}]"]
+
+    (dest / "wheelhouse" / "psutil-1.0-py3-none-any.whl").write_bytes(b"tampered")
+    staging = tmp_path / "tampered"
+    staging.mkdir()
+    for path in dest.rglob("*"):
+        if path.is_file():
+            target = staging / path.relative_to(dest)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(path.read_bytes())
+    bundle._write_archive(staging, tmp_path / "tampered.tar.gz")
+    with pytest.raises(ValueError, match="psutil"):
+        bundle.extract_bundle(tmp_path / "tampered.tar.gz", tmp_path / "out", tmp_path / "setup.log")
+
+
+def test_install_packages_counts_packages_not_options(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(utils, "run_pip", lambda pip, args, log: calls.append(args))
+    log = tmp_path / "setup.log"
+    utils.install_packages("pip", ["--upgrade", "pip"], log, wheelhouse=tmp_path, allow_index=False)
+    utils.install_packages("pip", ["psutil", "-e", "pkg[docx]"], log)
+    text = log.read_text(encoding="utf-8")
+    assert "Installing 1 package(s): --upgrade pip" in text
+    assert "Installing 2 package(s): psutil -e pkg[docx]" in text
+    assert calls == [["install", "--no-index", "--find-links", str(tmp_path), "--upgrade", "pip"],
+                     ["install", "psutil", "-e", "pkg[docx]"]]
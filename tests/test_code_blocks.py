@@ -0,0 +1,39 @@
+# tests/test_code_blocks.py
+from code_blocks import fence_code, normalize
+
+
+def test_xml_lines_are_fenced_with_a_language():
+    text = "Answer file:\n<?xml version=\"1.0\"?>\n<unattend>\n  <setting>x</setting>\n</unattend>\nDone."
+    fenced, blocks = fence_code(text)
+    assert blocks == 1
+    assert fenced.split("\n") == ["Answer file:", "```xml", "<?xml version=\"1.0\"?>", "<unattend>",
+                                  "  <setting>x</setting>", "</unattend>", "```", "Done."]
+
+
+def test_html_snippet_and_prose_inside_an_open_element():
+    text = "<div>\nsome text\n</div>\nafter"
+    fenced, blocks = fence_code(text)
+    assert blocks == 1
+    assert fenced.split("\n") == ["```html", "<div>", "some text", "</div>", "```", "after"]
+
+
+def test_prose_after_a_closed_element_is_not_swallowed():
+    fenced, _ = fence_code("<br/>\nplain prose")
+    assert fenced.split("\n") == ["```html", "<br/>", "```", "plain prose"]
+
+
+def test_existing_fences_and_inline_tags_are_left_alone():
+    text = "```\n<a>\n```\nUse <b>bold</b> here"
+    assert fence_code(text) == (text, 0)
+
+
+def test_monospace_hints_and_escapes():
+    code_lines = {normalize(r"run\_setup --quiet")}
+    fenced, blocks = fence_code("Run:\nrun\\_setup --quiet\nThen reboot.", code_lines)
+    assert blocks == 1
+    assert fenced.split("\n") == ["Run:", "```", "run_setup --quiet", "```", "Then reboot."]
+
+
+def test_backticks_inside_a_block_get_a_longer_fence():
+    fenced, _ = fence_code("<a>```</a>")
+    assert fenced.split("\n")[0] == "````html"
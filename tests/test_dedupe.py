@@ -0,0 +1,55 @@
+# tests/test_dedupe.py
+import io
+import json
+import zipfile
+from pathlib import Path
+
+import main
+
+
+def _records():
+    ledger_file = next(Path("logs/runs").glob("*.jsonl"))
+    return {r["relative_path"]: r for r in map(json.loads, ledger_file.read_text().splitlines())}
+
+
+def _tree(root: Path, files: dict) -> Path:
+    for rel, data in files.items():
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    return root
+
+
+def test_duplicates_get_the_originals_markdown(tmp_path):
+    page = b"<h1>Same</h1><p>text</p>"
+    src = _tree(tmp_path / "src", {"a/page.html": page, "b/page.html": page, "c.html": b"<p>other</p>"})
+    out = tmp_path / "out"
+    assert main.convert_all(src, out) == 3
+    assert (out / "a" / "page.md").read_text() == (out / "b" / "page.md").read_text()
+    statuses = sorted(r["status"] for r in _records().values())
+    assert statuses == ["duplicate", "ok", "ok"]
+
+
+def test_failed_original_is_not_counted_or_copied(tmp_path):
+    # A ZIP with no Word parts: MarkItDown fails, so the converter logs and writes nothing
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr("[Content_Types].xml", "<Types/>")
+    broken = buffer.getvalue()
+    src = _tree(tmp_path / "src", {"a/bad.docx": broken, "b/bad.docx": broken,
+                                   "good.html": b"<h1>Good</h1>"})
+    out = tmp_path / "out"
+    assert main.convert_all(src, out) == 1
+    records = _records()
+    # The duplicate went through the normal converter instead of copying a missing .md
+    assert records["a/bad.docx"]["status"] == "failed"
+    assert records["b/bad.docx"]["status"] == "failed"
+    assert records["good.html"]["status"] == "ok"
+    assert not (out / "a" / "bad.md").exists() and not (out / "b" / "bad.md").exists()
+
+
+def test_no_dedupe_converts_every_copy(tmp_path):
+    page = b"<h1>Same</h1>"
+    src = _tree(tmp_path / "src", {"a.html": page, "b.html": page})
+    assert main.convert_all(src, tmp_path / "out", dedupe=False) == 2
+    assert sorted(r["status"] for r in _records().values()) == ["ok", "ok"]
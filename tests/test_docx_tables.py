@@ -0,0 +1,66 @@
+# tests/test_docx_tables.py
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+
+from conftest import W_NS
+from extract_docx_tables import W, TableBuilder
+
+
+def _row(*cells, before=0):
+    """cells: text, or (text, gridSpan, vMerge) where vMerge is None, "restart" or "continue"."""
+    trpr = f'<w:trPr><w:gridBefore w:val="{before}"/></w:trPr>' if before else ""
+    xml = []
+    for cell in cells:
+        text, span, vmerge = (cell, 1, None) if isinstance(cell, str) else cell
+        props = (f'<w:gridSpan w:val="{span}"/>' if span > 1 else "") + \
+                ('<w:vMerge/>' if vmerge == "continue" else f'<w:vMerge w:val="{vmerge}"/>' if vmerge else "")
+        xml.append(f'<w:tc><w:tcPr>{props}</w:tcPr><w:p><w:r><w:t>{escape(text)}</w:t></w:r></w:p></w:tc>')
+    return ET.fromstring(f'<w:tr xmlns:w="{W_NS}">{trpr}{"".join(xml)}</w:tr>')
+
+
+def _text(tc):
+    return "".join(t.text or "" for t in tc.iter(W + "t"))
+
+
+def _table(*rows):
+    table = TableBuilder()
+    for row in rows:
+        table.add_row(row, _text)
+    return table.render()
+
+
+def test_plain_table_is_gfm_with_escaped_pipes():
+    assert _table(_row("A", "B"), _row("1", "x|y")) == "| A | B |\n| --- | --- |\n| 1 | x\\|y |"
+
+
+def test_grid_before_leaves_an_empty_leading_cell():
+    assert _table(_row("A", "B"), _row("2", before=1)) == "| A | B |\n| --- | --- |\n|  | 2 |"
+
+
+def test_grid_span_becomes_colspan():
+    assert _table(_row(("Wide", 2, None)), _row("1", "2")) == \
+        '<table>\n<tr><th colspan="2">Wide</th></tr>\n<tr><td>1</td><td>2</td></tr>\n</table>'
+
+
+def test_vertical_merge_becomes_rowspan():
+    html = _table(_row("H1", "H2"),
+                  _row(("Tall", 1, "restart"), "a"),
+                  _row(("", 1, "continue"), "b"),
+                  _row("c", "d"))
+    assert html.split("\n") == ["<table>",
+                                "<tr><th>H1</th><th>H2</th></tr>",
+                                '<tr><td rowspan="2">Tall</td><td>a</td></tr>',
+                                "<tr><td>b</td></tr>",
+                                "<tr><td>c</td><td>d</td></tr>",
+                                "</table>"]
+
+
+def test_merged_span_continues_only_under_the_same_width():
+    # A 2-wide continue under a 1-wide cell can't extend it: it starts its own cell
+    html = _table(_row(("Top", 1, "restart"), "x"), _row(("Below", 2, "continue")))
+    assert '<td colspan="2">Below</td>' in html and "rowspan" not in html
+
+
+def test_html_cells_render_inline_markdown():
+    html = _table(_row(("**b** [l](/x.md) <i>", 2, None)))
+    assert '<th colspan="2"><strong>b</strong> <a href="/x.md">l</a> &lt;i&gt;</th>' in html
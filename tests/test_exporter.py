@@ -0,0 +1,48 @@
+# tests/test_exporter.py
+import urllib.request
+
+import exporter
+
+
+def test_exposition_format():
+    registry = exporter.Registry()
+    counter = registry.register(exporter.Counter("docs_total", "Documents.", labels=("status",)))
+    counter.inc(2, 'o"k')
+    histogram = registry.register(exporter.Histogram("seconds", "Time.", buckets=(1, 5)))
+    histogram.observe(0.5)
+    histogram.observe(3.0)
+    registry.register(exporter.Gauge("up", "Up.", collect=lambda: {(): 1}))
+    assert registry.render().split("\n") == [
+        "# HELP ohhimarkitdown_docs_total Documents.",
+        "# TYPE ohhimarkitdown_docs_total counter",
+        'ohhimarkitdown_docs_total{status="o\\"k"} 2',
+        "# HELP ohhimarkitdown_seconds Time.",
+        "# TYPE ohhimarkitdown_seconds histogram",
+        'ohhimarkitdown_seconds_bucket{le="1"} 1',
+        'ohhimarkitdown_seconds_bucket{le="5"} 2',
+        'ohhimarkitdown_seconds_bucket{le="+Inf"} 2',
+        "ohhimarkitdown_seconds_sum 3.5",
+        "ohhimarkitdown_seconds_count 2",
+        "# HELP ohhimarkitdown_up Up.",
+        "# TYPE ohhimarkitdown_up gauge",
+        "ohhimarkitdown_up 1",
+        "",
+    ]
+
+
+def test_http_server_and_textfile(tmp_path):
+    registry = exporter.Registry()
+    registry.register(exporter.Counter("runs_total", "Runs.")).inc()
+    server = exporter.start_http_server(0, registry=registry)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics", timeout=10) as r:
+            assert r.headers["Content-Type"] == exporter.CONTENT_TYPE
+            assert "ohhimarkitdown_runs_total 1" in r.read().decode("utf-8")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    path = tmp_path / "textfile" / "ohhimarkitdown.prom"
+    with exporter.TextfileWriter(path, interval=60, registry=registry):
+        assert path.read_text(encoding="utf-8") == registry.render()
+    assert [p.name for p in path.parent.iterdir()] == ["ohhimarkitdown.prom"]
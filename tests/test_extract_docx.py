@@ -0,0 +1,60 @@
+# tests/test_extract_docx.py
+import re
+import zipfile
+
+from conftest import build_docx, image, paragraph, png_bytes
+import extract_docx
+from sinks import DirectorySink
+
+
+def test_scan_document_in_one_pass():
+    xml = (
+        b'<w:body><w:tbl><w:tr><w:tc><w:tbl></w:tbl></w:tc></w:tr></w:tbl>'
+        b'<w:p><w:pPr><w:pStyle w:val="HTMLCode"/></w:pPr>'
+        b'<w:r><w:rPr><w:rStyle w:val="Strong"/><w:rFonts w:ascii="Consolas" w:hAnsi="Consolas"/></w:rPr></w:r></w:p>'
+        b'<a:blip r:embed="rId1"/>'
+        b'<mc:AlternateContent><mc:Choice Requires="wps"><a:blip r:embed="rId2"/></mc:Choice>'
+        b'<mc:Fallback><v:imagedata r:id="rId3"/></mc:Fallback></mc:AlternateContent></w:body>')
+    scan = extract_docx.scan_document(xml)
+    assert scan.tables == 2
+    # The Choice copy of a drawing is skipped; MarkItDown renders the Fallback
+    assert scan.image_rids == ["rId1", "rId3"]
+    assert scan.styles == {"HTMLCode", "Strong"}
+    assert scan.fonts == {"Consolas"}
+
+
+def test_image_refs_resolve_through_relationships(tmp_path):
+    path = build_docx(tmp_path / "a.docx", image("rId1") + image("rId9") + image("rId1"),
+                      media={"rId1": ("image1.png", png_bytes())})
+    scan = extract_docx.scan_docx(path)
+    with zipfile.ZipFile(path) as zf:
+        refs = extract_docx.docx_image_refs(zf, scan.image_rids)
+    assert refs == ["word/media/image1.png", None, "word/media/image1.png"]
+
+
+def test_code_lines_skip_the_parse_without_code_formatting(tmp_path, monkeypatch):
+    plain = build_docx(tmp_path / "plain.docx", paragraph("just text"))
+    monkeypatch.setattr(extract_docx.ET, "iterparse", None)     # would fail if called
+    assert extract_docx.docx_code_lines(plain, extract_docx.scan_docx(plain)) == set()
+
+
+def test_code_lines_from_monospace_runs(tmp_path):
+    path = build_docx(tmp_path / "code.docx", paragraph("prose") + paragraph("x = 1", font="Consolas"))
+    assert extract_docx.docx_code_lines(path, extract_docx.scan_docx(path)) == {"x = 1"}
+
+
+def test_process_docx_places_images_and_skips_rewrite_without_them(tmp_path, monkeypatch):
+    path = build_docx(tmp_path / "pics.docx", paragraph("before") + image("rId1") + paragraph("after"),
+                      media={"rId1": ("image1.png", png_bytes())})
+    sink = DirectorySink(tmp_path / "out")
+    extract_docx.process_docx(path, sink, "abc", "pics.md", tmp_path / "w.log", tmp_path / "i.log")
+    text = (tmp_path / "out" / "pics.md").read_text()
+    assert re.search(r"before.*!\[\]\(/\.media/abc/abc-001\.png\).*after", text, re.S)
+    assert (tmp_path / "out" / ".media" / "abc" / "abc-001.png").is_file()
+
+    calls = []
+    monkeypatch.setattr(extract_docx, "rewrite_markdown_images", lambda text, *a: calls.append(1) or text)
+    plain = build_docx(tmp_path / "plain.docx", paragraph("no pictures"))
+    extract_docx.process_docx(plain, sink, "def", "plain.md", tmp_path / "w.log", tmp_path / "i.log")
+    assert "no pictures" in (tmp_path / "out" / "plain.md").read_text()
+    assert calls == []
@@ -0,0 +1,48 @@
+# tests/test_extract_docx_stream.py
+from conftest import build_docx, image, paragraph, png_bytes
+import extract_docx
+from extract_docx_stream import stream_docx
+from sinks import DirectorySink
+
+STYLES = ('<w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/></w:style>'
+          '<w:style w:type="paragraph" w:styleId="Title"><w:name w:val="Title"/></w:style>')
+
+
+def _stream(tmp_path, body, media=None, styles=STYLES):
+    path = build_docx(tmp_path / "big.docx", body, media, styles)
+    stream_docx(path, DirectorySink(tmp_path / "out"), "abc", "big.md", tmp_path / "w.log", tmp_path / "i.log")
+    return (tmp_path / "out" / "big.md").read_text(encoding="utf-8")
+
+
+def test_headings_formatting_and_links(tmp_path):
+    body = (paragraph("Report", style="Title") + paragraph("Intro", style="Heading1")
+            + '<w:p><w:r><w:rPr><w:b/></w:rPr><w:t>bold</w:t></w:r><w:r><w:t xml:space="preserve"> and </w:t>'
+              '</w:r><w:r><w:rPr><w:i/></w:rPr><w:t>italic</w:t></w:r>'
+              '<w:r><w:rPr><w:del/></w:rPr></w:r><w:del><w:r><w:t>deleted</w:t></w:r></w:del></w:p>')
+    assert _stream(tmp_path, body).split("\n") == ["# Report", "", "# Intro", "", "**bold** and *italic*", ""]
+
+
+def test_images_are_copied_once_per_relationship(tmp_path):
+    body = paragraph("see") + image("rId1") + image("rId1") + image("rId2")
+    media = {"rId1": ("image1.png", png_bytes()), "rId2": ("image2.png", png_bytes((0, 255, 0)))}
+    text = _stream(tmp_path, body, media)
+    assert text.count("![](/.media/abc/abc-001.png)") == 2
+    assert "![](/.media/abc/abc-002.png)" in text
+    assert sorted(p.name for p in (tmp_path / "out/.media/abc").iterdir()) == ["abc-001.png", "abc-002.png"]
+
+
+def test_tables_and_monospace_paragraphs(tmp_path):
+    cell = lambda text: f'<w:tc><w:p><w:r><w:t>{text}</w:t></w:r></w:p></w:tc>'
+    body = (f'<w:tbl><w:tr>{cell("A")}{cell("B")}</w:tr><w:tr>{cell("1")}{cell("2")}</w:tr></w:tbl>'
+            + paragraph("x = 1", font="Consolas") + paragraph("after"))
+    assert _stream(tmp_path, body).split("\n") == [
+        "| A | B |", "| --- | --- |", "| 1 | 2 |", "", "```", "x = 1", "```", "", "after", ""]
+
+
+def test_process_docx_streams_over_the_memory_budget(tmp_path, monkeypatch):
+    monkeypatch.setattr(extract_docx, "DOCX_RSS_BUDGET", 1)
+    monkeypatch.setattr(extract_docx, "get_markitdown", None)     # would fail if called
+    path = build_docx(tmp_path / "a.docx", paragraph("streamed"))
+    extract_docx.process_docx(path, DirectorySink(tmp_path / "out"), "abc", "a.md",
+                              tmp_path / "w.log", tmp_path / "i.log")
+    assert (tmp_path / "out" / "a.md").read_text(encoding="utf-8") == "streamed\n"
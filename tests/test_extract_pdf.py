@@ -0,0 +1,81 @@
+# tests/test_extract_pdf.py
+import os
+
+import pymupdf
+
+import extract_pdf
+from conftest import png_bytes
+from sinks import DirectorySink
+
+
+def _noisy_png() -> bytes:
+    # Random pixels so the PNG stays above MIN_IMAGE_BYTES
+    from PIL import Image
+    import io
+    img = Image.frombytes("RGB", (32, 32), os.urandom(32 * 32 * 3))
+    buffer = io.BytesIO()
+    img.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def _pdf(path, pages):
+    """pages: list of [("text", y, str) | ("image", y, png bytes)]."""
+    doc = pymupdf.open()
+    for items in pages:
+        page = doc.new_page()
+        for kind, y, value in items:
+            if kind == "text":
+                page.insert_text((72, y), value)
+            else:
+                page.insert_image(pymupdf.Rect(72, y, 136, y + 64), stream=value)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def _convert(tmp_path, pdf):
+    out = tmp_path / "out"
+    extract_pdf.process_pdf(pdf, DirectorySink(out), "abc", "doc.md", tmp_path / "w.log", tmp_path / "i.log")
+    return (out / "doc.md").read_text(encoding="utf-8")
+
+
+def test_images_are_placed_by_position_and_numbered_once(tmp_path):
+    photo, spacer = _noisy_png(), png_bytes()
+    pdf = _pdf(tmp_path / "a.pdf", [
+        [("text", 72, "Above"), ("image", 100, photo), ("text", 200, "Below"), ("image", 300, spacer)],
+        [("image", 72, photo), ("text", 200, "Second page")],
+    ])
+    assert _convert(tmp_path, pdf).split("\n\n") == [
+        "Above", "![](/.media/abc/abc-001.png)", "Below",
+        "![](/.media/abc/abc-001.png)", "Second page\n"]
+    # The tiny spacer image is dropped, the repeated photo stored once
+    assert [p.name for p in (tmp_path / "out/.media/abc").iterdir()] == ["abc-001.png"]
+
+
+def test_page_ranges_cover_every_page():
+    ranges = extract_pdf.page_ranges(100, 3)
+    assert ranges[0][0] == 0 and ranges[-1][1] == 100
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+    assert extract_pdf.page_ranges(10, 8) == [(0, 10)]
+
+
+def test_parallel_ranges_match_the_serial_output(tmp_path, monkeypatch):
+    pdf = _pdf(tmp_path / "long.pdf", [[("text", 72, f"Page {n}")] for n in range(12)])
+    serial = _convert(tmp_path, pdf)
+    monkeypatch.setattr(extract_pdf, "PARALLEL_MIN_PAGES", 2)
+    monkeypatch.setattr(extract_pdf, "MIN_PAGES_PER_RANGE", 1)
+    monkeypatch.setattr(extract_pdf, "MAX_PDF_WORKERS", 2)
+    try:
+        assert _convert(tmp_path, pdf) == serial
+    finally:
+        extract_pdf.reset_pool()
+    assert "parallel ranges" in (tmp_path / "i.log").read_text(encoding="utf-8")
+    assert serial.split("\n\n")[:2] == ["Page 0", "Page 1"]
+
+
+def test_unreadable_pdf_writes_nothing(tmp_path):
+    bad = tmp_path / "bad.pdf"
+    bad.write_bytes(b"not a pdf")
+    extract_pdf.process_pdf(bad, DirectorySink(tmp_path / "out"), "abc", "doc.md",
+                            tmp_path / "w.log", tmp_path / "i.log")
+    assert not (tmp_path / "out" / "doc.md").exists()
@@ -0,0 +1,52 @@
+# tests/test_git_sink.py
+import pytest
+
+from sinks import GitSink
+from utils import run_git
+
+
+def _git(repo, *args):
+    return run_git(list(args), cwd=repo).stdout.strip()
+
+
+def _existing_repo(path):
+    path.mkdir()
+    _git(path, "init", "-q", "-b", "main")
+    (path / "README.md").write_text("readme")
+    _git(path, "add", "README.md")
+    _git(path, "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-q", "-m", "init")
+    return path
+
+
+def test_batches_prefix_and_copies_on_top_of_existing_history(tmp_path):
+    repo = _existing_repo(tmp_path / "kb")
+    with GitSink(repo, "main", prefix="docs", batch_files=2) as sink:
+        sink.write_text("a.md", "A")
+        sink.write_text("b.md", "B")
+        sink.write_text('odd "name".md', "C")
+        assert sink.copy_file("a.md", "copy/a.md")
+        assert not sink.copy_file("never-written.md", "x.md")
+    log = _git(repo, "log", "--format=%s", "main").split("\n")
+    assert log[-1] == "init" and len(log) == 3
+    assert "(batch 2, 2 files)" in log[0]
+    assert _git(repo, "show", "main:docs/copy/a.md") == "A"
+    assert _git(repo, "show", 'main:docs/odd "name".md') == "C"
+    # The checked-out branch's working tree is brought up to date; other files stay
+    assert (repo / "docs" / "b.md").read_text() == "B"
+    assert (repo / "README.md").read_text() == "readme"
+
+
+def test_other_branch_leaves_the_working_tree_alone(tmp_path):
+    repo = _existing_repo(tmp_path / "kb")
+    with GitSink(repo, "converted") as sink:
+        sink.write_text("a.md", "A")
+    assert _git(repo, "show", "converted:a.md") == "A"
+    assert not (repo / "a.md").exists()
+
+
+def test_refuses_a_folder_inside_another_repository(tmp_path):
+    repo = _existing_repo(tmp_path / "kb")
+    (repo / "sub").mkdir()
+    (repo / "sub" / "keep").write_text("")
+    with pytest.raises(ValueError):
+        GitSink(repo / "sub")
@@ -0,0 +1,58 @@
+# tests/test_ids.py
+from pathlib import PurePosixPath
+
+import pytest
+
+import ids
+import main
+from sources import SourceFile
+
+
+def _source(tmp_path, rel, data=b"same bytes"):
+    path = tmp_path / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return SourceFile.from_path(path, tmp_path)
+
+
+def test_path_ids_are_stable_and_sized():
+    source = SourceFile(PurePosixPath("team/doc.docx"))
+    assert ids.document_id(source) == ids.document_id(source)
+    assert len(ids.document_id(source, length=20)) == 20
+    with pytest.raises(ValueError):
+        ids.document_id(source, length=4)
+
+
+def test_prefix_collision_lengthens_the_later_id():
+    registry = ids.IdRegistry("path", 6)
+    a, b = SourceFile(PurePosixPath("a.docx")), SourceFile(PurePosixPath("b.docx"))
+    registry.owners[ids.full_hash(b)[:6]] = "someone else"
+    assert registry.assign(a) == ids.full_hash(a)[:6]
+    assert registry.assign(b) == ids.full_hash(b)[:7]
+    assert registry.collisions == 1
+
+
+def test_identical_content_at_two_paths_gets_two_ids(tmp_path):
+    registry = ids.IdRegistry("content", 12)
+    first, second = _source(tmp_path, "a/x.docx"), _source(tmp_path, "b/x.docx")
+    first_id = registry.assign(first)
+    assert registry.assign(second) == f"{first_id}-2"
+    # The same document asked for again keeps its ID
+    assert registry.assign(first) == first_id
+    assert registry.assign(second) == f"{first_id}-2"
+
+
+def test_content_ids_without_dedupe_keep_media_apart(tmp_path, monkeypatch):
+    from conftest import build_docx, image, paragraph, png_bytes
+    src, out = tmp_path / "src", tmp_path / "out"
+    media = {"rId1": ("image1.png", png_bytes())}
+    build_docx(src / "a" / "doc.docx", paragraph("x") + image("rId1"), media=media)
+    (src / "b").mkdir()
+    (src / "b" / "doc.docx").write_bytes((src / "a" / "doc.docx").read_bytes())
+    # The digest comes from the parallel hashing pass, not a read in the walk loop
+    monkeypatch.setattr(ids, "content_digest", None)
+    assert main.convert_all(src, out, dedupe=False, id_scheme="content") == 2
+    folders = sorted(p.name for p in (out / ".media").iterdir())
+    assert len(folders) == 2 and folders[1] == f"{folders[0]}-2"
+    links = {rel: (out / rel).read_text().split("/.media/")[1].split("/")[0] for rel in ("a/doc.md", "b/doc.md")}
+    assert sorted(links.values()) == folders
@@ -0,0 +1,53 @@
+# tests/test_ledger.py
+import json
+from pathlib import PurePosixPath
+
+import ledger
+from sinks import DirectorySink
+
+
+def test_helpers_record_only_inside_a_tracked_document():
+    ledger.count("images")      # no current document: ignored
+    metrics = ledger.DocumentMetrics("src/a.docx", "a.docx")
+    with ledger.track_document(metrics):
+        ledger.count("image_refs", 3)
+        ledger.note("image_mapping", "positional")
+        with ledger.stage("scan"):
+            pass
+        with ledger.stage("scan"):
+            pass
+    assert ledger.current() is None
+    assert metrics.image_refs == 3 and metrics.image_mapping == "positional"
+    assert list(metrics.stages) == ["scan"]
+
+
+def test_metered_sink_counts_bytes_and_media(tmp_path):
+    metrics = ledger.DocumentMetrics("a.docx", "a.docx")
+    image = tmp_path / "img.png"
+    image.write_bytes(b"12345")
+    with DirectorySink(tmp_path / "out") as sink:
+        metered = ledger.MeteredSink(sink, metrics)
+        metered.write_text("a.md", "é")
+        metered.move_file(image, ".media/abc/abc-001.png")
+        assert metered.describe("a.md") == sink.describe("a.md")
+    assert metrics.bytes_out == 7 and metrics.images == 1
+    assert metrics.written == {PurePosixPath("a.md"), PurePosixPath(".media/abc/abc-001.png")}
+
+
+def test_run_ledger_writes_records_and_summary(tmp_path):
+    run = ledger.RunLedger("src", "out", runs_dir=tmp_path / "logs" / "runs")
+    for name, status, seconds in (("a.docx", "ok", 2.0), ("b.pdf", "failed", 1.0)):
+        metrics = ledger.DocumentMetrics(name, name, converter=name.split(".")[1], bytes_in=10)
+        metrics.status, metrics.seconds = status, seconds
+        run.add(metrics)
+    summary = run.close(converted=1)
+
+    records = [json.loads(line) for line in run.path.read_text(encoding="utf-8").splitlines()]
+    assert [r["relative_path"] for r in records] == ["a.docx", "b.pdf"]
+    assert summary["by_status"] == {"ok": 1, "failed": 1}
+    assert summary["totals"]["documents"] == 2 and summary["totals"]["bytes_in"] == 20
+    assert summary["slowest"][0]["source"] == "a.docx"
+    assert summary["converted"] == 1
+    saved = json.loads((run.runs_dir / f"{run.run_id}.summary.json").read_text(encoding="utf-8"))
+    assert saved["run_id"] == run.run_id
+    assert (tmp_path / "logs" / "runs.jsonl").read_text(encoding="utf-8").count("\n") == 1
@@ -0,0 +1,58 @@
+# tests/test_links.py
+from pathlib import PurePosixPath
+
+import links
+from sinks import DirectorySink
+
+
+def _md(rel):
+    return PurePosixPath(rel).with_suffix(".md")
+
+
+def _index():
+    return links.LinkIndex.build(["team/a/Report.docx", "team/b/Report.docx", "plan.docx", "notes.txt"],
+                                 _md, keep=lambda rel: rel.suffix == ".docx")
+
+
+def test_relative_links_resolve_against_the_linking_document():
+    index = _index()
+    assert index.resolve("../b/Report.docx", "team/a/x.docx") == PurePosixPath("team/b/Report.md")
+    assert index.resolve("Report.docx", "team/a/x.docx") == PurePosixPath("team/a/Report.md")
+
+
+def test_sharepoint_unc_and_drive_links_resolve_by_name_and_suffix():
+    index = _index()
+    assert index.resolve("https://contoso.sharepoint.com/sites/x/Shared%20Documents/plan.docx",
+                         "doc.docx") == PurePosixPath("plan.md")
+    assert index.resolve("https://contoso.sharepoint.com/_layouts/15/Doc.aspx?sourcedoc={1}&file=plan.docx",
+                         "doc.docx") == PurePosixPath("plan.md")
+    assert index.resolve(r"\\server\share\team\b\Report.docx", "doc.docx") == PurePosixPath("team/b/Report.md")
+    assert index.resolve(r"C:\work\a\Report.docx", "doc.docx") == PurePosixPath("team/a/Report.md")
+    # Two folders, nothing to tell them apart: left alone
+    assert index.resolve(r"C:\Report.docx", "doc.docx") is None
+
+
+def test_other_links_are_left_alone():
+    index = _index()
+    for target in ("https://example.com/plan.docx", "mailto:a@b.c", "#section", "/.media/abc/1.png",
+                   "notes.txt", "missing.docx"):
+        assert index.resolve(target, "doc.docx") is None
+
+
+def test_rewrite_keeps_titles_and_images():
+    text = '[Plan](plan.docx "the plan") ![img](plan.docx) [web](https://example.com)'
+    assert _index().rewrite(text, "doc.docx") == \
+        '[Plan](/plan.md "the plan") ![img](plan.docx) [web](https://example.com)'
+
+
+def test_rewriter_rewrites_written_and_moved_markdown(tmp_path):
+    index = _index()
+    streamed = tmp_path / "streamed.md"
+    streamed.write_text("see [plan](plan.docx)\n", encoding="utf-8")
+    with DirectorySink(tmp_path / "out") as sink:
+        links.LinkRewriter(sink, index, "a.md", "a.docx").write_text("a.md", "[plan](plan.docx)")
+        links.LinkRewriter(sink, index, "b.md", "b.docx").move_file(streamed, "b.md")
+        links.LinkRewriter(sink, index, "c.md", "c.docx").write_text("other.md", "[plan](plan.docx)")
+    assert (tmp_path / "out/a.md").read_text(encoding="utf-8") == "[plan](/plan.md)"
+    assert (tmp_path / "out/b.md").read_text(encoding="utf-8") == "see [plan](/plan.md)\n"
+    assert (tmp_path / "out/other.md").read_text(encoding="utf-8") == "[plan](plan.docx)"
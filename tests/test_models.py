@@ -0,0 +1,65 @@
+# tests/test_models.py
+import threading
+import time
+
+import pytest
+
+import models
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    # A clean registry per test; the built-in loaders stay untouched
+    for name in ("_loaders", "_models", "_loading", "_batchers"):
+        monkeypatch.setattr(models, name, {})
+    return models
+
+
+def test_model_loads_once_across_threads(registry):
+    loads = []
+
+    def loader():
+        loads.append(1)
+        time.sleep(0.05)
+        return object()
+
+    registry.register_model("slow", loader)
+    registry.warm_up(["slow"])
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get_model("slow"))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(loads) == 1 and len({id(model) for model in results}) == 1
+    with pytest.raises(KeyError):
+        registry.get_model("missing")
+
+
+def test_batcher_groups_requests_and_propagates_errors(registry):
+    batches = []
+
+    def model(items):
+        batches.append(list(items))
+        if "bad" in items:
+            raise ValueError("model failed")
+        return [item.upper() for item in items]
+
+    registry.register_model("ocr", lambda: model)
+    batcher = models.PageBatcher("ocr", max_batch=3, max_wait=0.2)
+    futures = [batcher.submit(item) for item in ("a", "b", "c", "d")]
+    assert [future.result(timeout=5) for future in futures] == ["A", "B", "C", "D"]
+    assert batches == [["a", "b", "c"], ["d"]]
+
+    with pytest.raises(ValueError):
+        batcher.submit("bad").result(timeout=5)
+    assert registry.get_batcher("ocr") is registry.get_batcher("ocr")
+
+
+def test_short_result_list_fails_every_request(registry):
+    registry.register_model("ocr", lambda: lambda items: ["only one"])
+    batcher = models.PageBatcher("ocr", max_batch=3, max_wait=0.2)
+    futures = [batcher.submit(item) for item in ("a", "b", "c")]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="1 results for 3 inputs"):
+            future.result(timeout=5)
@@ -0,0 +1,119 @@
+# tests/test_netio.py
+import pytest
+
+import api
+import netio
+from sinks import DirectorySink, OutputSink
+from sources import SourceFile
+
+
+def test_write_behind_keeps_order_per_key():
+    io = netio.WriteBehind(workers=4)
+    seen = []
+    for i in range(20):
+        io.submit("a", seen.append, i)
+    io.wait("a")
+    io.close()
+    assert seen == list(range(20))
+
+
+def test_flush_raises_a_paths_failure_once(tmp_path):
+    sink = DirectorySink(tmp_path / "out", io_workers=2)
+    (tmp_path / "out" / "bad.md").mkdir(parents=True)
+    sink.write_text("good.md", "fine")
+    sink.write_text("bad.md", "never")
+    sink.flush(["good.md"])
+    assert (tmp_path / "out" / "good.md").read_text() == "fine"
+    with pytest.raises(OSError, match="bad.md"):
+        sink.flush(["bad.md"])
+    sink.close()    # already reported by flush
+
+
+def test_close_raises_unflushed_failures(tmp_path):
+    sink = DirectorySink(tmp_path / "out", io_workers=2)
+    (tmp_path / "out" / "bad.md").mkdir(parents=True)
+    sink.write_text("bad.md", "never")
+    with pytest.raises(OSError, match="1 write"):
+        sink.close()
+
+
+def test_later_write_clears_earlier_failure(tmp_path):
+    io = netio.WriteBehind(workers=2)
+
+    def fail():
+        raise OSError("disk full")
+
+    io.submit("a", fail)
+    io.submit("a", lambda: None)
+    io.flush(["a"])
+    io.close()
+
+
+def test_move_file_owns_source_before_returning(tmp_path):
+    sink = DirectorySink(tmp_path / "out", io_workers=2)
+    src = tmp_path / "img.png"
+    src.write_bytes(b"png")
+    sink.move_file(src, ".media/x/img.png")
+    assert not src.exists()
+    sink.copy_file(".media/x/img.png", ".media/y/img.png")
+    sink.close()
+    assert (tmp_path / "out" / ".media" / "y" / "img.png").read_bytes() == b"png"
+
+
+def test_read_ahead_spools_to_local_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(netio, "READ_AHEAD", "1")
+    root = tmp_path / "src"
+    root.mkdir()
+    for i in range(5):
+        (root / f"{i}.txt").write_text(str(i))
+    sources = [SourceFile.from_path(root / f"{i}.txt", root) for i in range(5)]
+    out = list(netio.read_ahead(iter(sources), root, workers=2, ahead=2))
+    assert [s.relative_path.name for s in out] == [f"{i}.txt" for i in range(5)]
+    for i, source in enumerate(out):
+        assert source.temporary and source.path.parent != root
+        with source.open() as f:
+            assert f.read() == str(i).encode()
+        source.discard()
+        assert not source.path.exists()
+
+
+def test_read_ahead_off_passes_sources_through(tmp_path, monkeypatch):
+    monkeypatch.setattr(netio, "READ_AHEAD", "0")
+    sources = [object(), object()]
+    assert list(netio.read_ahead(iter(sources), tmp_path)) == sources
+
+
+def test_job_reports_failed_write_and_finishes(tmp_path, monkeypatch):
+    monkeypatch.setattr("sinks.IO_WORKERS", 2)
+    src, out = tmp_path / "src", tmp_path / "out"
+    src.mkdir()
+    (src / "page.html").write_text("<h1>Page</h1><p>text</p>")
+    (src / "other.html").write_text("<h1>Other</h1>")
+    (out / "page.md").mkdir(parents=True)     # the .md can't be written
+    job = api.submit_tree(src, out)
+    assert job.wait(10)
+    results = {r.relative_path.name: r for r in job}
+    assert not results["page.html"].ok and "page.md" in results["page.html"].error
+    assert results["other.html"].ok and (out / "other.md").is_file()
+    assert job.summary["by_status"] == {"failed": 1, "ok": 1}
+
+
+class _FailingCloseSink(OutputSink):
+    def __init__(self):
+        self.files = {}
+
+    def write_bytes(self, rel_path, data: bytes):
+        self.files[str(rel_path)] = data
+
+    def close(self):
+        raise OSError("share went away")
+
+
+def test_job_finishes_when_sink_close_fails(tmp_path, monkeypatch):
+    monkeypatch.setattr(api, "open_sink", lambda dest: _FailingCloseSink())
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "page.html").write_text("<h1>Page</h1>")
+    job = api.submit_tree(src, tmp_path / "out")
+    assert job.wait(10) and job.summary is not None
+    assert [r.ok for r in job] == [True]
@@ -0,0 +1,44 @@
+# tests/test_profiler.py
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import profiler
+
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+    return seconds
+
+
+def test_document_is_a_no_op_without_a_run():
+    with profiler.document("a.docx") as profile:
+        assert profile is None
+
+
+def test_keep_writes_only_the_slowest_documents(tmp_path):
+    run = profiler.RunProfiler(tmp_path / "profile", keep=1, interval=0.002).start()
+    try:
+        for name, seconds in (("fast.docx", 0.01), ("slow.docx", 0.08)):
+            with profiler.document(f"src/{name}"):
+                _busy(seconds)
+    finally:
+        out = run.close()
+    index = json.loads((out / "index.json").read_text(encoding="utf-8"))
+    assert index["documents"] == 2
+    assert [entry["source"] for entry in index["profiles"]] == ["src/slow.docx"]
+    assert (out / index["profiles"][0]["collapsed"]).is_file()
+    assert (out / "run.collapsed").is_file()
+    assert "_busy" in (out / "run.collapsed").read_text(encoding="utf-8")
+
+
+def test_pool_work_is_merged_into_the_document(tmp_path):
+    run = profiler.RunProfiler(tmp_path / "profile", interval=0.002).start()
+    try:
+        with ThreadPoolExecutor(1) as pool, profiler.document("big.pdf") as profile:
+            assert profiler.submit(pool, _busy, 0.02).result() == 0.02
+            assert profile.stats is not None
+    finally:
+        run.close()
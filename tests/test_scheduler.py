@@ -0,0 +1,73 @@
+# tests/test_scheduler.py
+import threading
+import time
+
+from converters import CHEAP, EXPENSIVE
+from scheduler import Scheduler
+
+
+class FakeConverter:
+    def __init__(self, name, slots, cost=CHEAP):
+        self.name = name
+        self.cost = cost
+        self.slots = threading.BoundedSemaphore(slots)
+
+
+def test_converter_limit_does_not_hold_lane_threads():
+    docx, pptx = FakeConverter("docx", 1), FakeConverter("pptx", 4)
+    release = threading.Event()
+    with Scheduler(lane_workers={CHEAP: 2, EXPENSIVE: 1}) as scheduler:
+        blocked = [scheduler.submit(docx, release.wait, 5) for _ in range(4)]
+        # Both lane threads would be stuck on the DOCX semaphore without the waiting queue
+        assert scheduler.submit(pptx, lambda: "pptx").result(timeout=2) == "pptx"
+        release.set()
+        assert all(f.result(timeout=5) for f in blocked)
+    assert scheduler.queued == {CHEAP: 0, EXPENSIVE: 0}
+
+
+def test_converter_limit_is_enforced():
+    docx = FakeConverter("docx", 2)
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def work():
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+
+    with Scheduler(lane_workers={CHEAP: 6, EXPENSIVE: 1}) as scheduler:
+        futures = [scheduler.submit(docx, work) for _ in range(10)]
+    assert all(f.done() and not f.cancelled() for f in futures)
+    assert peak[0] == 2
+
+
+def test_cancel_and_should_run():
+    docx = FakeConverter("docx", 1)
+    release = threading.Event()
+    with Scheduler(lane_workers={CHEAP: 2, EXPENSIVE: 1}) as scheduler:
+        first = scheduler.submit(docx, release.wait, 5)
+        waiting = scheduler.submit(docx, lambda: "ran")
+        skipped = scheduler.submit(docx, lambda: "ran", should_run=lambda: False)
+        assert waiting.cancel()
+        release.set()
+    assert first.result() is True
+    assert waiting.cancelled()
+    assert skipped.result() is None
+    assert scheduler.pending._value == 256
+
+
+def test_exception_exit_cancels_waiting_tasks():
+    docx = FakeConverter("docx", 1)
+    futures = []
+    try:
+        with Scheduler(lane_workers={CHEAP: 2, EXPENSIVE: 1}) as scheduler:
+            futures = [scheduler.submit(docx, time.sleep, 0.1) for _ in range(4)]
+            time.sleep(0.02)
+            raise KeyError
+    except KeyError:
+        pass
+    assert not futures[0].cancelled()
+    assert all(f.cancelled() for f in futures[1:])
+    assert scheduler.queued == {CHEAP: 0, EXPENSIVE: 0}
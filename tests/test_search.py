@@ -0,0 +1,72 @@
+# tests/test_search.py
+import sqlite3
+
+import search
+
+
+def _index(tmp_path, root):
+    return search.SearchIndex(tmp_path / "kb.sqlite", search.index_root(tmp_path / root))
+
+
+def _matches(db_path, query):
+    with sqlite3.connect(db_path) as conn:
+        return sorted(conn.execute("SELECT d.root, d.md_path FROM docs f JOIN documents d ON d.id = f.rowid "
+                                   "WHERE docs MATCH ?", (query,)).fetchall())
+
+
+def test_fields_title_headings_and_link_free_body():
+    text = "intro\n# Budget\n```\n# not a heading\n```\n## Travel ##\n![x](.media/abc/1.png) [see](b.md)"
+    title, headings, body = search._fields(text, "doc.md")
+    assert title == "Budget"
+    assert headings == "Budget\nTravel"
+    assert ".media" not in body and "b.md" not in body and "[see]" in body
+    assert search._fields("no headings", "dir/name.md")[0] == "name"
+
+
+def test_unchanged_documents_are_not_reindexed(tmp_path):
+    index = _index(tmp_path, "out")
+    assert index.add("a.md", "# A\nalpha", "a.docx", "id1")
+    assert not index.add("a.md", "# A\nalpha", "a.docx", "id1")
+    assert index.add("a.md", "# A\nbeta", "a.docx", "id1")
+    assert index.copy("a.md", "copy/a.md", "copy/a.docx")
+    index.close()
+    assert _matches(tmp_path / "kb.sqlite", "beta") == [(str((tmp_path / "out").resolve()), "a.md"),
+                                                        (str((tmp_path / "out").resolve()), "copy/a.md")]
+    assert _matches(tmp_path / "kb.sqlite", "alpha") == []
+
+
+def test_prune_only_touches_its_own_root(tmp_path):
+    first = _index(tmp_path, "one")
+    first.add("a.md", "shared words", "a.docx", "id1")
+    first.add("gone.md", "shared words", "gone.docx", "id2")
+    first.close()
+    second = _index(tmp_path, "two")
+    # Same relative path under another destination is a separate document
+    second.add("a.md", "shared words", "a.docx", "id3")
+    assert second.prune({"a.md"}) == 0
+    second.close()
+
+    first = _index(tmp_path, "one")
+    assert first.prune({"a.md"}) == 1
+    first.close()
+    roots = [(tmp_path / name).resolve() for name in ("one", "two")]
+    assert _matches(tmp_path / "kb.sqlite", "shared") == [(str(roots[0]), "a.md"), (str(roots[1]), "a.md")]
+
+
+def test_legacy_database_is_adopted_by_the_first_root(tmp_path):
+    db_path = tmp_path / "kb.sqlite"
+    with sqlite3.connect(db_path) as conn:
+        conn.executescript("""
+            CREATE TABLE documents (id INTEGER PRIMARY KEY, md_path TEXT NOT NULL UNIQUE, source_path TEXT,
+                                    uuid TEXT, digest TEXT NOT NULL, indexed_at REAL NOT NULL);
+            CREATE VIRTUAL TABLE docs USING fts5(title, headings, body, source_path, uuid UNINDEXED,
+                                                 md_path UNINDEXED, tokenize = 'unicode61 remove_diacritics 2');
+            INSERT INTO documents VALUES (7, 'old.md', 'old.docx', 'id0', 'digest', 0);
+            INSERT INTO docs (rowid, title, headings, body, source_path, uuid, md_path)
+                VALUES (7, 'Old', '', 'legacy text', 'old.docx', 'id0', 'old.md');
+        """)
+    index = _index(tmp_path, "out")
+    assert _matches(db_path, "legacy") == [(index.root, "old.md")]
+    assert index.prune(set()) == 1
+    index.close()
+    assert _matches(db_path, "legacy") == []
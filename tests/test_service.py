@@ -0,0 +1,75 @@
+# tests/test_service.py
+import base64
+import io
+import json
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
+import zipfile
+
+import pytest
+
+import service
+
+PAGE = b"<h1>Upload</h1><p>text</p>"
+
+
+def test_convert_upload_is_deterministic():
+    uuid, markdown, bundle = service.convert_upload("dir\\page.html", PAGE)
+    assert "Upload" in markdown
+    with zipfile.ZipFile(io.BytesIO(bundle)) as zf:
+        assert zf.namelist() == ["page.md"]
+    # Byte-identical bundle, even once the clock has moved past a ZIP timestamp's 2 s step
+    time.sleep(2.1)
+    assert service.convert_upload("page.html", PAGE) == (uuid, markdown, bundle)
+    with pytest.raises(ValueError):
+        service.convert_upload("notes.txt", b"plain")
+
+
+def test_full_queue_raises():
+    svc = service.ConversionService(workers=1, queue_size=1)
+    svc.submit("a.html", PAGE)      # no workers started: stays queued
+    with pytest.raises(queue.Full):
+        svc.submit("b.html", PAGE)
+    assert svc.health()["queued"] == 1
+
+
+@pytest.fixture
+def server():
+    server = service.make_server(port=0, workers=1, queue_size=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def _post(url, data):
+    request = urllib.request.Request(url, data=data, method="POST")
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.status, dict(response.headers), response.read()
+
+
+def test_http_convert_health_and_metrics(server):
+    status, headers, body = _post(f"{server}/convert?filename=page.html", PAGE)
+    assert status == 200 and headers["Content-Type"] == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(body)) as zf:
+        assert "Upload" in zf.read("page.md").decode("utf-8")
+
+    status, _, body = _post(f"{server}/convert?filename=page.html&format=json", PAGE)
+    payload = json.loads(body)
+    assert payload["uuid"] == headers["X-Document-UUID"] and "Upload" in payload["markdown"]
+    assert zipfile.ZipFile(io.BytesIO(base64.b64decode(payload["media_bundle"]))).namelist() == ["page.md"]
+
+    with pytest.raises(urllib.error.HTTPError) as error:
+        _post(f"{server}/convert?filename=notes.txt", b"plain")
+    assert error.value.code == 422
+
+    with urllib.request.urlopen(f"{server}/health", timeout=10) as response:
+        assert json.loads(response.read())["workers"] == 1
+    with urllib.request.urlopen(f"{server}/metrics", timeout=10) as response:
+        metrics = response.read().decode("utf-8")
+    assert "service_conversions_ok_total 2" in metrics
+    assert "service_conversions_failed_total 1" in metrics
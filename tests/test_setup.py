@@ -0,0 +1,47 @@
+# tests/test_setup.py
+import importlib
+
+import utils
+
+
+def _git(cwd, *args):
+    return utils.run_git(list(args), cwd=cwd).stdout.strip()
+
+
+def _repo(path):
+    path.mkdir()
+    _git(path, "init", "-q", "-b", "main")
+    _commit(path, "one")
+    return path
+
+
+def _commit(repo, text):
+    (repo / "file.txt").write_text(text)
+    _git(repo, "add", "file.txt")
+    _git(repo, "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-q", "-m", text)
+
+
+def test_lock_hash_follows_the_markitdown_commit(tmp_path):
+    # Imported here, inside the temp dir: setup.py creates logs/ when imported
+    setup = importlib.import_module("setup")
+    assert setup.markitdown_commit() is None
+    without = setup.setup_lock_hash()
+    repo = _repo(tmp_path / "markitdown")
+    first = setup.setup_lock_hash()
+    _commit(repo, "two")
+    assert len({without, first, setup.setup_lock_hash()}) == 3
+    assert setup.markitdown_commit() == _git(repo, "rev-parse", "HEAD")
+
+
+def test_diverged_checkout_is_kept(tmp_path):
+    origin = _repo(tmp_path / "origin")
+    log = tmp_path / "setup.log"
+    checkout = tmp_path / "checkout"
+    utils.clone_repo("MarkItDown", str(origin), checkout, log)
+    _commit(origin, "upstream")
+    _commit(checkout, "local")
+    local_head = _git(checkout, "rev-parse", "HEAD")
+
+    utils.clone_repo("MarkItDown", str(origin), checkout, log)
+    assert _git(checkout, "rev-parse", "HEAD") == local_head
+    assert "could not be fast-forwarded to origin/main" in log.read_text(encoding="utf-8")
@@ -0,0 +1,91 @@
+# tests/test_sinks.py
+import io
+import tarfile
+import zipfile
+from pathlib import PurePosixPath
+
+import pytest
+
+from sinks import ArchiveSink, DirectorySink, OutputSink, StagingSink, media_link, media_path, open_sink
+
+
+def test_output_sink_requires_write_bytes():
+    with pytest.raises(TypeError):
+        OutputSink()
+
+    class MemorySink(OutputSink):
+        def __init__(self):
+            self.files = {}
+
+        def write_bytes(self, rel_path, data: bytes):
+            self.files[PurePosixPath(rel_path)] = data
+
+    sink = MemorySink()
+    sink.write_text("a.md", "é")
+    assert sink.files == {PurePosixPath("a.md"): "é".encode("utf-8")}
+
+
+def test_media_paths():
+    assert media_path("abc") == PurePosixPath(".media/abc")
+    assert media_path("abc", "abc-001.png") == PurePosixPath(".media/abc/abc-001.png")
+    assert media_link("abc", "abc-001.png") == "/.media/abc/abc-001.png"
+
+
+def test_directory_sink_writes_moves_and_copies(tmp_path):
+    dest = tmp_path / "out"
+    image = tmp_path / "image.png"
+    image.write_bytes(b"png")
+    with DirectorySink(dest) as sink:
+        sink.write_text("team/doc.md", "# Doc")
+        sink.move_file(image, ".media/abc/abc-001.png")
+        assert sink.copy_file("team/doc.md", "copy/doc.md")
+    assert (dest / "team/doc.md").read_text(encoding="utf-8") == "# Doc"
+    assert (dest / ".media/abc/abc-001.png").read_bytes() == b"png"
+    assert (dest / "copy/doc.md").read_text(encoding="utf-8") == "# Doc"
+    assert not image.exists()
+
+
+def test_directory_sink_write_behind_flushes(tmp_path):
+    dest = tmp_path / "out"
+    with DirectorySink(dest, io_workers=2) as sink:
+        for i in range(20):
+            sink.write_text(f"d{i}/doc.md", str(i))
+        sink.flush([PurePosixPath(f"d{i}/doc.md") for i in range(20)])
+        assert (dest / "d19/doc.md").read_text(encoding="utf-8") == "19"
+
+
+@pytest.mark.parametrize("suffix", [".zip", ".tar.gz"])
+def test_archive_sink_round_trip(tmp_path, suffix):
+    archive = tmp_path / f"out{suffix}"
+    with open_sink(archive) as sink:
+        assert isinstance(sink, ArchiveSink)
+        sink.write_text("doc.md", "# Doc")
+        sink.write_bytes(".media/abc/abc-001.png", b"png")
+    if suffix == ".zip":
+        with zipfile.ZipFile(archive) as zf:
+            files = {name: zf.read(name) for name in zf.namelist()}
+    else:
+        with tarfile.open(archive) as tar:
+            files = {m.name: tar.extractfile(m).read() for m in tar.getmembers() if m.isfile()}
+    assert files == {"doc.md": b"# Doc", ".media/abc/abc-001.png": b"png"}
+
+
+def test_archive_sink_to_buffer():
+    buffer = io.BytesIO()
+    with ArchiveSink(buffer, "zip") as sink:
+        sink.write_text("doc.md", "x")
+        assert sink.describe("doc.md") == "<memory>.zip!/doc.md"
+    with ArchiveSink(io.BytesIO(), "zip", label="upload:a.docx.zip") as sink:
+        assert sink.describe("a.md") == "upload:a.docx.zip!/a.md"
+    with zipfile.ZipFile(io.BytesIO(buffer.getvalue())) as zf:
+        assert zf.read("doc.md") == b"x"
+
+
+def test_staging_sink_syncs_on_close(tmp_path):
+    dest = tmp_path / "share"
+    sink = StagingSink(dest)
+    sink.write_text("doc.md", "staged")
+    assert not (dest / "doc.md").exists()
+    sink.close()
+    assert (dest / "doc.md").read_text(encoding="utf-8") == "staged"
+
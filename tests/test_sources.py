@@ -0,0 +1,77 @@
+# tests/test_sources.py
+import io
+import tarfile
+import zipfile
+from pathlib import PurePosixPath
+
+import pytest
+
+from sources import SourceFile, is_archive, list_relative_paths, open_sources
+
+FILES = {"team/a.docx": b"A", "b.pdf": b"B", "notes.txt": b"N"}
+KEEP = lambda item: PurePosixPath(str(getattr(item, "relative_path", item))).suffix != ".txt"
+
+
+def _zip(path):
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("team/", b"")
+        zf.writestr("../team/a.docx", FILES["team/a.docx"])
+        for name in ("b.pdf", "notes.txt"):
+            zf.writestr(name, FILES[name])
+    return path
+
+
+def _tar(path):
+    with tarfile.open(path, "w:gz") as tar:
+        for name, data in FILES.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return path
+
+
+def _folder(path):
+    for name, data in FILES.items():
+        (path / name).parent.mkdir(parents=True, exist_ok=True)
+        (path / name).write_bytes(data)
+    return path
+
+
+@pytest.mark.parametrize("make, name", [(_folder, "src"), (_zip, "export.zip"), (_tar, "export.tar.gz")])
+def test_every_kind_of_source_yields_the_same_documents(tmp_path, make, name):
+    root = tmp_path / name
+    if make is _folder:
+        root.mkdir()
+    make(root)
+    assert is_archive(root) == (make is not _folder)
+    with open_sources(root, keep=KEEP) as sources:
+        read = {}
+        for source in sources:
+            with source.local_path() as local:
+                read[source.relative_path.as_posix()] = local.read_bytes()
+            source.discard()
+    assert read == {"team/a.docx": b"A", "b.pdf": b"B"}
+
+
+def test_listing_without_reading(tmp_path):
+    assert sorted(map(str, list_relative_paths(_zip(tmp_path / "e.zip"), keep=KEEP))) == ["b.pdf", "team/a.docx"]
+    folder = tmp_path / "src"
+    folder.mkdir()
+    assert sorted(map(str, list_relative_paths(_folder(folder)))) == ["b.pdf", "notes.txt", "team/a.docx"]
+    assert list_relative_paths(_tar(tmp_path / "e.tar.gz")) is None
+
+
+def test_tar_members_are_spooled_and_removed(tmp_path):
+    with open_sources(_tar(tmp_path / "e.tar.gz")) as sources:
+        source = next(iter(sources))
+        assert source.temporary and source.path.is_file()
+        with source.local_path():
+            pass
+        assert not source.path.exists()
+
+
+def test_source_file_is_binary_only(tmp_path):
+    source = SourceFile(PurePosixPath("a.docx"), opener=lambda: io.BytesIO(b"x"))
+    assert source.open().read() == b"x" and source.name == "a.docx" and source.stem == "a"
+    with pytest.raises(ValueError):
+        source.open("r")
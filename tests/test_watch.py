@@ -0,0 +1,120 @@
+# tests/test_watch.py
+import io
+import os
+import zipfile
+
+from conftest import build_docx, image, paragraph, png_bytes
+import ids
+from sinks import media_path
+from sources import SourceFile
+from watch import Watcher
+
+
+def _two_images(path, count):
+    media = {f"rId{i}": (f"image{i}.png", png_bytes((i * 40, 0, 0))) for i in range(1, count + 1)}
+    return build_docx(path, paragraph("text") + "".join(image(rid) for rid in media), media=media)
+
+
+def _broken(path):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr("[Content_Types].xml", "<Types/>")
+    path.write_bytes(buffer.getvalue())
+    os.utime(path, (1, 1))
+
+
+def test_convert_edit_rename_delete(tmp_path):
+    src, out = tmp_path / "src", tmp_path / "out"
+    src.mkdir()
+    (src / "a.html").write_text("<h1>A</h1>")
+    watcher = Watcher(src, out, force_polling=True)
+    assert watcher.reconcile() == 1
+    uuid = watcher.manifest.entries["a.html"]["uuid"]
+    assert (out / "a.md").read_text().startswith("# A")
+
+    (src / "a.html").rename(src / "b.html")
+    watcher.reconcile()
+    assert watcher.manifest.entries["b.html"]["uuid"] == uuid
+    assert not (out / "a.md").exists() and (out / "b.md").exists()
+
+    (src / "b.html").unlink()
+    watcher.reconcile()
+    assert watcher.manifest.entries == {} and not (out / "b.md").exists()
+
+
+def test_old_images_removed_only_after_success(tmp_path):
+    src, out = tmp_path / "src", tmp_path / "out"
+    doc = _two_images(src / "doc.docx", 2)
+    watcher = Watcher(src, out, force_polling=True)
+    watcher.reconcile()
+    uuid = watcher.manifest.entries["doc.docx"]["uuid"]
+    media_dir = out / media_path(uuid)
+    assert len(list(media_dir.iterdir())) == 2
+
+    _broken(doc)
+    watcher.reconcile()
+    # The failed reconversion left the previous output alone
+    assert len(list(media_dir.iterdir())) == 2
+    assert f"/.media/{uuid}/{uuid}-002.png" in (out / "doc.md").read_text()
+
+    _two_images(doc, 1)
+    watcher.reconcile()
+    assert [f.name for f in media_dir.iterdir()] == [f"{uuid}-001.png"]
+
+
+def test_failed_reconversion_restores_overwritten_images(tmp_path, monkeypatch):
+    src, out = tmp_path / "src", tmp_path / "out"
+    doc = _two_images(src / "doc.docx", 2)
+    watcher = Watcher(src, out, force_polling=True)
+    watcher.reconcile()
+    uuid = watcher.manifest.entries["doc.docx"]["uuid"]
+    before = {f.name: f.read_bytes() for f in (out / media_path(uuid)).iterdir()}
+    markdown = (out / "doc.md").read_text()
+
+    # New images under the same names, then the .md write fails
+    media = {"rId1": ("image1.png", png_bytes((0, 0, 200)))}
+    build_docx(doc, paragraph("edited") + image("rId1"), media=media)
+    os.utime(doc, (2, 2))
+
+    def fail(rel_path, text):
+        raise OSError("share went away")
+
+    monkeypatch.setattr(watcher.sink, "write_text", fail)
+    watcher.reconcile()
+    assert {f.name: f.read_bytes() for f in (out / media_path(uuid)).iterdir()} == before
+    assert (out / "doc.md").read_text() == markdown
+    assert not (out / ".ohhimarkitdown" / "previous" / uuid).exists()
+
+    del watcher.sink.write_text
+    watcher.reconcile()
+    assert [f.name for f in (out / media_path(uuid)).iterdir()] == [f"{uuid}-001.png"]
+    assert "edited" in (out / "doc.md").read_text()
+    assert not (out / ".ohhimarkitdown" / "previous" / uuid).exists()
+
+
+def test_polling_waits_for_a_stable_size_and_mtime(tmp_path):
+    src, out = tmp_path / "src", tmp_path / "out"
+    src.mkdir()
+    watcher = Watcher(src, out, force_polling=True)
+    watcher.reconcile()
+    (src / "a.html").write_text("<h1>Half")
+    assert watcher.reconcile(previous_scan=watcher.last_scan) == 0    # first seen: still copying?
+    (src / "a.html").write_text("<h1>Half written</h1>")
+    os.utime(src / "a.html", (5, 5))
+    assert watcher.reconcile(previous_scan=watcher.last_scan) == 0    # changed since the last poll
+    assert watcher.reconcile(previous_scan=watcher.last_scan) == 1    # unchanged for a poll
+    assert "Half written" in (out / "a.md").read_text()
+
+
+def test_new_ids_avoid_the_manifests(tmp_path):
+    src, out = tmp_path / "src", tmp_path / "out"
+    src.mkdir()
+    (src / "new.html").write_text("<p>x</p>")
+    taken = ids.document_id(SourceFile.from_path(src / "new.html", src))
+    watcher = Watcher(src, out, force_polling=True)
+    watcher.manifest.entries["gone.html"] = {"uuid": taken, "md": "gone.md", "mtime": 0, "size": 0}
+    watcher.id_registry.reserve(taken, "manifest:gone.html")
+    watcher.reconcile(["new.html"])
+    new_id = watcher.manifest.entries["new.html"]["uuid"]
+    assert new_id != taken and new_id.startswith(taken)
+    assert watcher.id_registry.collisions == 1
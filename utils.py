@@ -1,8 +1,15 @@
 # utils.py
 import datetime
+import hashlib
 import os
 import sys
 import subprocess
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+# Per-thread list that log_warning also appends to (see capture_warnings)
+_captured = threading.local()
 
 def timestamp() -> str:
     """Return a UTC timestamp string for logs."""
@@ -17,11 +24,27 @@ def log_info(log_file, message: str):
 
 def log_warning(log_file, message: str):
     """Log warning messages to file and stdout."""
+    collected = getattr(_captured, "warnings", None)
+    if collected is not None:
+        collected.append(message)
     line = f"[WARN] {timestamp()} {message}"
     print(line, file=sys.stderr)
     with open(log_file, "a", encoding="utf-8") as f:
         f.write(line + "\n")
 
+@contextmanager
+def capture_warnings():
+    """Collect the messages passed to log_warning on this thread while the block runs."""
+    previous = getattr(_captured, "warnings", None)
+    collected = _captured.warnings = []
+    try:
+        yield collected
+    finally:
+        _captured.warnings = previous
+        if previous is not None:
+            # An enclosing capture sees them too
+            previous.extend(collected)
+
 def log_and_print(log_file, message: str):
     """Log and print a message (neutral severity)."""
     line = f"{timestamp()} {message}"
@@ -30,19 +53,72 @@ def log_and_print(log_file, message: str):
         f.write(line + "\n")
 
 
-def install_packages(pip_exe, packages, setup_log):
-    for pkg in packages:
-        log_and_print(setup_log, f"[*] Installing package: {pkg}")
-        result = subprocess.run(
-            [str(pip_exe), "install", pkg],
-            capture_output=True,
-            text=True
-        )
-        log_info(setup_log, f"{pkg} stdout:\n{result.stdout.strip()}")
-        log_warning(setup_log, f"{pkg} stderr:\n{result.stderr.strip()}")
-        if result.returncode != 0:
-            raise subprocess.CalledProcessError(result.returncode, result.args)
-        
+def install_packages(pip_exe, packages, setup_log, wheelhouse=None, allow_index=True):
+    """
+    Install all packages in a single pip invocation so pip resolves the set once.
+    With a wheelhouse, installs offline from it first and only falls back to the
+    index (refilling the wheelhouse) when something is missing and allow_index is set.
+    """
+    packages = list(packages)
+    if not packages:
+        return
+
+    # Options such as --upgrade aren't packages
+    count = sum(1 for arg in packages if not arg.startswith("-"))
+    log_and_print(setup_log, f"[*] Installing {count} package(s): {' '.join(packages)}")
+    if wheelhouse is None:
+        run_pip(pip_exe, ["install"] + packages, setup_log)
+        return
+
+    offline_args = ["install", "--no-index", "--find-links", str(wheelhouse)] + packages
+    if not allow_index:
+        run_pip(pip_exe, offline_args, setup_log)
+        return
+
+    if Path(wheelhouse).exists():
+        try:
+            run_pip(pip_exe, offline_args, setup_log)
+            return
+        except subprocess.CalledProcessError:
+            log_and_print(setup_log, "[*] Wheelhouse incomplete. Refreshing from package index...")
+
+    fill_wheelhouse(pip_exe, packages, wheelhouse, setup_log)
+    run_pip(pip_exe, offline_args, setup_log)
+
+
+def fill_wheelhouse(pip_exe, packages, wheelhouse, setup_log):
+    """Build or download wheels for every package (and dependency) into the wheelhouse."""
+    Path(wheelhouse).mkdir(parents=True, exist_ok=True)
+    log_and_print(setup_log, f"[*] Filling wheelhouse: {wheelhouse}")
+    # -e targets build as regular wheels here; the editable install reuses their deps
+    targets = [pkg for pkg in packages if pkg != "-e"]
+    run_pip(pip_exe, ["wheel", "--wheel-dir", str(wheelhouse)] + targets, setup_log)
+
+
+def compute_lock_hash(paths, extra=()):
+    """Hash the contents of the given files plus extra strings into a lock fingerprint."""
+    digest = hashlib.sha256()
+    for path in paths:
+        path = Path(path)
+        digest.update(str(path).encode("utf-8"))
+        if path.exists():
+            digest.update(path.read_bytes())
+    for item in extra:
+        digest.update(str(item).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def read_lock(lock_file):
+    try:
+        return Path(lock_file).read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return None
+
+
+def write_lock(lock_file, lock_hash):
+    Path(lock_file).parent.mkdir(parents=True, exist_ok=True)
+    Path(lock_file).write_text(lock_hash + "\n", encoding="utf-8")
+
 
 def install_local_package(pip_exe, path, extras, setup_log):
     if not path.exists():
@@ -102,21 +178,19 @@ def clone_repo(name, url, dest_path, setup_log):
 
     log_and_print(setup_log, f"[INFO] {name} already exists at {dest_path}. Pulling updates...")
     try:
-        result = subprocess.run(
-            ["git", "remote", "show", "origin"],
-            cwd=dest_path,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-
+        # Resolve the default branch from the local origin/HEAD ref; no network round-trip
         default_branch = "main"
-        for line in result.stdout.splitlines():
-            if "HEAD branch:" in line:
-                default_branch = line.split(":")[1].strip()
-                break
-
-        run_git(["pull", "origin", default_branch], cwd=dest_path)
+        try:
+            result = run_git(["symbolic-ref", "--short", "refs/remotes/origin/HEAD"], cwd=dest_path)
+            default_branch = result.stdout.strip().split("/", 1)[-1] or default_branch
+        except subprocess.CalledProcessError:
+            pass
+
+        # Fast-forward only: local commits are never merged or rewritten
+        run_git(["pull", "--ff-only", "origin", default_branch], cwd=dest_path)
         log_and_print(setup_log, f"[INFO] Updated {name}.")
     except subprocess.CalledProcessError as e:
-        log_warning(setup_log, f"[ERROR] Git pull failed:\n{e.stderr}")
\ No newline at end of file
+        # e.g. the checkout has diverged from origin; keep installing what is there
+        log_warning(setup_log, f"[ERROR] Git pull failed:\n{e.stderr}")
+        log_and_print(setup_log, f"[!] {name} at {dest_path} could not be fast-forwarded to origin/{default_branch}; "
+                                 f"using it as it is. Rebase or re-clone it to update.")
@@ -0,0 +1,370 @@
+# watch.py
+# Continuous conversion of a live (e.g. OneDrive/SharePoint-synced) folder.
+# - Native change notifications via watchdog (inotify / ReadDirectoryChangesW),
+#   falling back to polling when watchdog isn't installed or --force-polling is set
+# - Bursts of events are debounced; only affected documents are reconverted.
+#   When polling, a new or changed file waits until its size and mtime are the
+#   same on two polls in a row, so files still being copied in aren't converted
+# - A manifest keeps each document's UUID, so edits and renames reuse it and
+#   deletes remove the orphaned .md and .media/<UUID> output. New documents get
+#   their ID from an ids.IdRegistry that knows the manifest's, so collisions are caught
+# - A reconverted document's .md and images are copied aside first and put back if
+#   the reconversion fails (it writes the same .media/<UUID>/<UUID>-NNN names), so the
+#   previous output stays whole; old images are pruned only once it converted
+# - With a search index, converted documents are reindexed and deleted ones dropped
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path, PurePosixPath
+
+import ids
+import ledger
+from converters import converter_for, may_convert
+from main import (convert_file, conversion_log, image_warnings_log,
+                  image_processing_log, logs_dir)
+from scheduler import Scheduler
+from search import SearchIndex, index_root
+from sinks import DirectorySink, media_path
+from sources import SourceFile
+from utils import log_info, log_warning
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # optional dependency
+    FileSystemEventHandler = object
+    Observer = None
+
+MANIFEST_PATH = PurePosixPath(".ohhimarkitdown", "watch-manifest.json")
+# A reconverted document's previous output, until the new one is written
+BACKUP_ROOT = PurePosixPath(".ohhimarkitdown", "previous")
+
+DEBOUNCE_SECONDS = 2.0
+POLL_SECONDS = 5.0
+
+
+def is_candidate(rel: PurePosixPath) -> bool:
+    # Office lock/owner files (~$name.docx) and sync temp files are never documents
+    return not rel.name.startswith(("~$", ".~")) and may_convert(rel)
+
+
+class Manifest:
+    """rel source path -> {"uuid", "md", "mtime", "size"}; stored under the destination root."""
+
+    def __init__(self, dest_root: Path):
+        self.path = Path(dest_root) / MANIFEST_PATH
+        try:
+            self.entries = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            self.entries = {}
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.entries, indent=1, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+class _ChangeHandler(FileSystemEventHandler):
+
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            # A renamed/removed folder can affect every document below it
+            self.watcher.mark_all()
+            return
+        self.watcher.mark(event.src_path)
+        if getattr(event, "dest_path", None):
+            self.watcher.mark(event.dest_path)
+
+
+class Watcher:
+
+    def __init__(self, source_root: Path, dest_root: Path, debounce: float = DEBOUNCE_SECONDS,
+                 poll_interval: float = POLL_SECONDS, force_polling: bool = False, search_index: Path = None):
+        self.source_root = Path(source_root).resolve()
+        self.dest_root = Path(dest_root)
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.use_polling = force_polling or Observer is None
+        self.manifest = Manifest(self.dest_root)
+        self.sink = DirectorySink(self.dest_root)
+        self.search_index = SearchIndex(search_index, index_root(self.dest_root)) if search_index else None
+        self.id_registry = ids.IdRegistry(log_file=conversion_log)
+        for rel, entry in self.manifest.entries.items():
+            self.id_registry.reserve(entry["uuid"], f"manifest:{rel}")
+        self.last_scan = None   # the previous full scan, for the polling stability check
+        self.stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._dirty = {}
+        self._rescan = False
+
+    # -- change tracking ---------------------------------------------------
+
+    def mark(self, path):
+        try:
+            rel = PurePosixPath(Path(path).resolve().relative_to(self.source_root).as_posix())
+        except ValueError:
+            return
+        if is_candidate(rel):
+            with self._lock:
+                self._dirty[rel.as_posix()] = time.monotonic()
+
+    def mark_all(self):
+        with self._lock:
+            self._rescan = True
+            self._dirty["*"] = time.monotonic()
+
+    def _take_settled(self):
+        """Pop paths whose last event is older than the debounce window."""
+        now = time.monotonic()
+        with self._lock:
+            settled = [rel for rel, t in self._dirty.items() if now - t >= self.debounce]
+            for rel in settled:
+                del self._dirty[rel]
+            rescan = self._rescan and "*" in settled
+            if rescan:
+                self._rescan = False
+        return None if rescan else [rel for rel in settled if rel != "*"]
+
+    # -- reconciliation ----------------------------------------------------
+
+    def _scan(self) -> dict:
+        current = {}
+        for file in self.source_root.rglob("*"):
+            rel = PurePosixPath(file.relative_to(self.source_root).as_posix())
+            if not is_candidate(rel):
+                continue
+            try:
+                st = file.stat()
+            except FileNotFoundError:
+                continue
+            if file.is_file():
+                current[rel.as_posix()] = (st.st_mtime, st.st_size)
+        return current
+
+    def _stat(self, rels) -> dict:
+        current = {}
+        for rel in rels:
+            try:
+                st = (self.source_root / rel).stat()
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            current[rel] = (st.st_mtime, st.st_size)
+        return current
+
+    def remove_output(self, entry: dict):
+        md = self.sink.path_for(entry["md"])
+        try:
+            md.unlink()
+        except FileNotFoundError:
+            pass
+        if self.search_index is not None:
+            self.search_index.remove(entry["md"])
+        shutil.rmtree(self.sink.path_for(media_path(entry["uuid"])), ignore_errors=True)
+        self.id_registry.release(entry["uuid"])
+
+    def backup_output(self, entry: dict) -> Path:
+        """Copy a document's .md and .media/<UUID> aside before it is reconverted."""
+        backup = self.sink.path_for(BACKUP_ROOT / entry["uuid"])
+        shutil.rmtree(backup, ignore_errors=True)   # left by an interrupted run
+        media_dir = self.sink.path_for(media_path(entry["uuid"]))
+        if media_dir.is_dir():
+            # Real copies: the converter overwrites images in place, hard links would follow
+            shutil.copytree(media_dir, backup / "media")
+        backup.mkdir(parents=True, exist_ok=True)
+        md = self.sink.path_for(entry["md"])
+        if md.is_file():
+            shutil.copy2(md, backup / "doc.md")
+        return backup
+
+    def restore_output(self, entry: dict, backup: Path):
+        """Put back what backup_output() saved, dropping a failed reconversion's files."""
+        media_dir = self.sink.path_for(media_path(entry["uuid"]))
+        shutil.rmtree(media_dir, ignore_errors=True)
+        if (backup / "media").is_dir():
+            os.replace(backup / "media", media_dir)
+        if (backup / "doc.md").is_file():
+            os.replace(backup / "doc.md", self.sink.path_for(entry["md"]))
+        shutil.rmtree(backup, ignore_errors=True)
+
+    def prune_media(self, file_uuid: str, written):
+        """Remove images in .media/<UUID> that the latest conversion didn't write."""
+        media_dir = self.sink.path_for(media_path(file_uuid))
+        if not media_dir.is_dir():
+            return
+        for file in media_dir.iterdir():
+            if media_path(file_uuid, file.name) not in written:
+                try:
+                    file.unlink()
+                except OSError:
+                    shutil.rmtree(file, ignore_errors=True)
+        try:
+            media_dir.rmdir()   # only if it is now empty
+        except OSError:
+            pass
+
+    def reconcile(self, rels=None, previous_scan: dict = None):
+        """
+        Bring the output in line with the source for the given paths (None = whole tree).
+        previous_scan (polling): the last poll's full scan; new or changed files whose
+        size or mtime differ from it are still being written and wait for the next poll.
+        Returns the number of documents converted or removed.
+        """
+        entries = self.manifest.entries
+        if rels is None:
+            current = self.last_scan = self._scan()
+            rels = set(current) | set(entries)
+        else:
+            current = self._stat(rels)
+
+        deleted = [rel for rel in rels if rel in entries and rel not in current]
+        changed = [
+            rel for rel in rels
+            if rel in current and (rel not in entries
+                                   or (entries[rel]["mtime"], entries[rel]["size"]) != current[rel])
+        ]
+        if previous_scan is not None:
+            # A file matching a deleted one's size and mtime is a finished file being renamed
+            deleted_stats = {(entries[rel]["mtime"], entries[rel]["size"]) for rel in deleted}
+            changed = [rel for rel in changed
+                       if previous_scan.get(rel) == current[rel] or current[rel] in deleted_stats]
+        if not deleted and not changed:
+            return 0
+
+        # A delete + create of an identical file in the same batch is a rename: keep its UUID
+        by_stat = {(entries[rel]["mtime"], entries[rel]["size"]): rel for rel in deleted}
+        renamed_from = {}
+        for rel in changed:
+            if rel not in entries and current[rel] in by_stat:
+                renamed_from[rel] = by_stat.pop(current[rel])
+        renamed_sources = set(renamed_from.values())
+
+        previous = {}
+        for rel in deleted:
+            entry = entries.pop(rel)
+            if rel in renamed_sources:
+                previous[rel] = entry
+                continue
+            self.remove_output(entry)
+            log_info(conversion_log, f"[{entry['uuid']}] Removed output for deleted source: {rel}")
+
+        work = []
+        with Scheduler() as scheduler:
+            for rel in changed:
+                file = self.source_root / rel
+                converter = converter_for(file)
+                if converter is None:
+                    continue
+                old = previous[renamed_from[rel]] if rel in renamed_from else entries.get(rel)
+                backup = None
+                if old:
+                    file_uuid = old["uuid"]
+                    if rel not in renamed_from:
+                        backup = self.backup_output(old)
+                else:
+                    file_uuid = self.id_registry.assign(SourceFile.from_path(file, self.source_root))
+                metrics = ledger.DocumentMetrics(str(file), PurePosixPath(rel))
+                future = scheduler.submit(
+                    converter, convert_file,
+                    file_path=file,
+                    source_root=self.source_root,
+                    dest_root=self.dest_root,
+                    status_callback=None,
+                    conv_log=conversion_log,
+                    warn_log=image_warnings_log,
+                    proc_log=image_processing_log,
+                    converter=converter,
+                    sink=self.sink,
+                    file_uuid=file_uuid,
+                    metrics=metrics,
+                    search_index=self.search_index,
+                )
+                work.append((rel, old, file_uuid, metrics, backup, future))
+
+        for rel, old, file_uuid, metrics, backup, future in work:
+            try:
+                result = future.result()
+            except Exception as e:
+                log_warning(conversion_log, f"Conversion failed: {rel}: {e}")
+                result = None
+            if result is None:
+                if rel in renamed_from:
+                    self.remove_output(old)
+                elif old is None:
+                    self.id_registry.release(file_uuid)
+                else:
+                    self.restore_output(old, backup)
+                continue
+            if backup is not None:
+                shutil.rmtree(backup, ignore_errors=True)
+            file_uuid, md_path = result
+            # Stale images would linger if the new version has fewer
+            self.prune_media(file_uuid, metrics.written)
+            if old and old["md"] != md_path.as_posix():
+                try:
+                    self.sink.path_for(old["md"]).unlink()
+                except FileNotFoundError:
+                    pass
+                if self.search_index is not None:
+                    self.search_index.remove(old["md"])
+            entries[rel] = {"uuid": file_uuid, "md": md_path.as_posix(),
+                            "mtime": current[rel][0], "size": current[rel][1]}
+
+        self.manifest.save()
+        if self.search_index is not None:
+            self.search_index.commit()
+        return len(deleted) + len(work) - len(renamed_from)
+
+    # -- main loop -----------------------------------------------------------
+
+    def run(self):
+        logs_dir.mkdir(exist_ok=True)
+        mode = "polling" if self.use_polling else "native notifications"
+        log_info(conversion_log, f"Watching {self.source_root} -> {self.dest_root} ({mode})")
+
+        # Catch up on anything that changed while we weren't running
+        self.reconcile()
+
+        observer = None
+        if not self.use_polling:
+            observer = Observer()
+            observer.schedule(_ChangeHandler(self), str(self.source_root), recursive=True)
+            observer.start()
+
+        try:
+            next_poll = time.monotonic() + self.poll_interval
+            while not self.stop_event.wait(min(0.5, self.debounce)):
+                if self.use_polling:
+                    if time.monotonic() >= next_poll:
+                        self.reconcile(previous_scan=self.last_scan)
+                        next_poll = time.monotonic() + self.poll_interval
+                    continue
+                settled = self._take_settled()
+                if settled is None:
+                    self.reconcile()
+                elif settled:
+                    self.reconcile(settled)
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+            if self.search_index is not None:
+                self.search_index.close(conversion_log)
+
+    def stop(self):
+        self.stop_event.set()
+
+
+def watch(source_root: Path, dest_root: Path, **kwargs):
+    """Convert source_root into dest_root and keep it up to date until interrupted."""
+    watcher = Watcher(source_root, dest_root, **kwargs)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    return watcher